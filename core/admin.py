@@ -2,4 +2,5 @@
 from django.contrib import admin
 from .models import *
 admin.site.register([Currency, User, Category, Account, Transaction, TransactionSplit,
-Attachment, Budget, RecurringBill, Notification, ExchangeRate, AuditLog])
\ No newline at end of file
+Attachment, Budget, SpendLedger, RecurringBill, Notification, ExchangeRate, AuditLog,
+TransactionImport, ArchivedMonth, DailyCashFlow, DailyAccountBalance, EmailOutbox])
\ No newline at end of file
@@ -1,9 +1,90 @@
 # core/audit.py
+import logging
+import threading
+import weakref
+
+from django.conf import settings
+from django.db import connection, transaction as dbtx
+
 from .models import AuditLog
 from ipware import get_client_ip
+
+logger = logging.getLogger(__name__)
+
+# Batch-yada audit entries ee transaction-ka hadda socda, savepoint-ka ay ku jiraan (thread kasta mid u gaar ah).
+# Weak references: rollback-gu marka uu on_commit callback-ka tuuro, batch-guna wuu la tagaa.
+_local = threading.local()
+
+
+class _AuditBatch:
+    """Entries recorded under one savepoint chain, written once the transaction commits."""
+
+    def __init__(self, key):
+        self.key = key
+        self.entries = []
+
+    def flush(self):
+        batches = _batches()
+        if batches.get(self.key) is self:
+            del batches[self.key]
+        if self.entries:
+            write_entries(self.entries)
+
+
+def _batches():
+    batches = getattr(_local, "batches", None)
+    if batches is None:
+        batches = _local.batches = weakref.WeakValueDictionary()
+    return batches
+
+
+def _buffer(entry):
+    # Django wuxuu tuuraa on_commit callbacks-ka savepoint rolled back ah (ama transaction dhan),
+    # sidaa darteed savepoint kasta batch u gaar ah ayuu helaa
+    key = tuple(connection.savepoint_ids)
+    batches = _batches()
+    batch = batches.get(key)
+    if batch is None:
+        batch = batches[key] = _AuditBatch(key)
+        dbtx.on_commit(batch.flush)
+    batch.entries.append(entry)
+
+
+def write_entries(entries):
+    """Insert committed audit entries: one bulk_create, or hand them to Celery."""
+    if getattr(settings, "AUDIT_WRITE_MODE", "buffered") == "celery":
+        from .tasks import write_audit_logs_task
+
+        try:
+            write_audit_logs_task.delay([_entry_payload(entry) for entry in entries])
+            return
+        except Exception as e:
+            # Broker-ku haddii uu dhacay, audit-ka ha lumin: toos u qor
+            logger.warning("Audit queue unavailable, writing inline: %s", e)
+    AuditLog.objects.bulk_create(entries, batch_size=500)
+
+
+def _entry_payload(entry):
+    return {
+        "id": str(entry.id),
+        "user_id": str(entry.user_id) if entry.user_id else None,
+        "table_name": entry.table_name,
+        "record_id": str(entry.record_id),
+        "action": entry.action,
+        "old_data": entry.old_data,
+        "new_data": entry.new_data,
+        "changed_at": entry.changed_at.isoformat(),
+        "ip_address": entry.ip_address,
+    }
+
+
 def create_audit(request=None, **kwargs):
     """
-    Helper function to create audit log entries
+    Helper function to create audit log entries.
+    Inside a DB transaction the entry is buffered and the entries are written
+    with one bulk_create per savepoint after commit (AUDIT_WRITE_MODE="buffered", default);
+    "celery" ships them to write_audit_logs_task instead, "sync" inserts at once.
+    Entries recorded inside a savepoint that is rolled back are dropped with it.
     """
     ip_address = None
     if request:
@@ -11,15 +92,17 @@ def create_audit(request=None, **kwargs):
         if client_ip:
             ip_address = client_ip
     
-    # Ensure we have the required fields
-    required_fields = ['user', 'table_name', 'record_id', 'action']
+    # Ensure we have the required fields (user ama user_id)
+    required_fields = ['table_name', 'record_id', 'action']
     for field in required_fields:
         if field not in kwargs:
             raise ValueError(f"Missing required field: {field}")
+    if 'user' not in kwargs and 'user_id' not in kwargs:
+        raise ValueError("Missing required field: user")
     
     # Create the audit log entry
     audit_data = {
-        'user': kwargs.get('user'),
+        'user_id': kwargs['user_id'] if 'user_id' in kwargs else getattr(kwargs['user'], 'pk', None),
         'table_name': kwargs.get('table_name'),
         'record_id': kwargs.get('record_id'),
         'action': kwargs.get('action'),
@@ -28,7 +111,13 @@ def create_audit(request=None, **kwargs):
         'ip_address': ip_address or kwargs.get('ip_address')
     }
     
-    AuditLog.objects.create(**audit_data)
+    entry = AuditLog(**audit_data)
+    mode = getattr(settings, "AUDIT_WRITE_MODE", "buffered")
+    if mode == "sync" or not connection.in_atomic_block:
+        entry.save(force_insert=True)
+    else:
+        _buffer(entry)
+    return entry
 
 # def get_budget_total_spent(budget):
 #     return (
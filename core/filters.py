@@ -1,6 +1,8 @@
 # core/filters.py
 import django_filters as df
 import django_filters
+from datetime import datetime, time, timedelta
+from django.utils import timezone
 from .models import Transaction, Budget, AuditLog, RecurringBill
 
 class TransactionFilter(df.FilterSet):
@@ -25,6 +27,59 @@ class AuditLogFilter(django_filters.FilterSet):
     class Meta:
         model = AuditLog
         fields = ["table_name", "action"]
+
+class AuditLogViewFilter(df.FilterSet):
+    # changed_at range-ku wuxuu Postgres u oggolaanayaa inuu partitions-ka kale ka boodo
+    changed_after = df.IsoDateTimeFilter(field_name="changed_at", lookup_expr="gte")
+    changed_before = df.IsoDateTimeFilter(field_name="changed_at", lookup_expr="lt")
+    start_date = df.DateFilter(method="filter_start_date")
+    end_date = df.DateFilter(method="filter_end_date")
+
+    class Meta:
+        model = AuditLog
+        fields = ["table_name", "record_id", "action", "user"]
+
+    @staticmethod
+    def _day_start(value):
+        return timezone.make_aware(datetime.combine(value, time.min))
+
+    def filter_start_date(self, queryset, name, value):
+        return queryset.filter(changed_at__gte=self._day_start(value))
+
+    def filter_end_date(self, queryset, name, value):
+        # end_date waa inclusive: < maalinta xigta
+        return queryset.filter(changed_at__lt=self._day_start(value + timedelta(days=1)))
+
+    # ---------------- Archived rows ----------------
+    def changed_window(self):
+        """(start, end) of the changed_at range asked for; either side may be None."""
+        data = self.form.cleaned_data
+        starts = [data.get("changed_after")]
+        ends = [data.get("changed_before")]
+        if data.get("start_date"):
+            starts.append(self._day_start(data["start_date"]))
+        if data.get("end_date"):
+            ends.append(self._day_start(data["end_date"] + timedelta(days=1)))
+        starts, ends = [v for v in starts if v], [v for v in ends if v]
+        return (max(starts) if starts else None), (min(ends) if ends else None)
+
+    def row_filters(self):
+        """The exact-match filters asked for, as {attname: value}."""
+        data = self.form.cleaned_data
+        user = data.get("user")
+        wanted = {
+            "table_name": data.get("table_name"),
+            "record_id": data.get("record_id"),
+            "action": data.get("action"),
+            "user_id": user.pk if user else None,
+        }
+        return {attname: value for attname, value in wanted.items() if value not in (None, "")}
+
+    def matches(self, obj):
+        """Same exact-match filters as the queryset, for rows read back from an archive file."""
+        return all(getattr(obj, attname) == value for attname, value in self.row_filters().items())
+
+
 class RecurringBillFilter(df.FilterSet):
     class Meta:
         model = RecurringBill
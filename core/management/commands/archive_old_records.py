@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from core.models import ArchiveKind
+from core.services import archive
+
+
+class Command(BaseCommand):
+    help = "U wareeji audit logs iyo notifications duugoobay gzip NDJSON archives (MEDIA_ROOT/archives)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--months", type=int, help="Archive rows older than this many months (default ARCHIVE_AFTER_MONTHS)")
+        parser.add_argument("--kind", choices=ArchiveKind.values, help="Only this kind (default: all)")
+        parser.add_argument("--dry-run", action="store_true", help="Only count the files that would be written")
+
+    def handle(self, *args, **options):
+        kinds = [options["kind"]] if options["kind"] else ArchiveKind.values
+        for kind in kinds:
+            stats = archive.archive_old_records(kind, options["months"], dry_run=options["dry_run"])
+            self.stdout.write(self.style.SUCCESS(
+                f"📦 {kind}: {stats['files']} file(s), {stats['rows']} row(s) archived (older than {stats['cutoff']})"
+            ))
@@ -0,0 +1,39 @@
+from django.contrib.postgres.search import SearchVector
+from django.core.management.base import BaseCommand
+
+from core.models import Transaction
+from core.services.transaction_search import SEARCH_CONFIG
+
+
+class Command(BaseCommand):
+    help = "Buuxi description_tsv transactions-ka hore (batches, keyset on id)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Recompute every row, not only rows where description_tsv is NULL",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        base = Transaction.objects.all() if options["all"] else Transaction.objects.filter(description_tsv__isnull=True)
+
+        last_id, total = None, 0
+        while True:
+            qs = base.order_by("id")
+            if last_id is not None:
+                qs = qs.filter(id__gt=last_id)
+            ids = list(qs.values_list("id", flat=True)[:batch_size])
+            if not ids:
+                break
+
+            # Batch walba waa UPDATE gooni ah si locks-ku u gaaban yihiin
+            total += Transaction.objects.filter(id__in=ids).update(
+                description_tsv=SearchVector("description", config=SEARCH_CONFIG)
+            )
+            last_id = ids[-1]
+            self.stdout.write(f"... {total} rows")
+
+        self.stdout.write(self.style.SUCCESS(f"✅ description_tsv updated for {total} transaction(s)"))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from core.services import reports
+
+
+class Command(BaseCommand):
+    help = "Dib u dhis DailyCashFlow iyo DailyAccountBalance (reports snapshots) transactions-ka laga soo bilaabo"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Kaliya user-kan (UUID)")
+        parser.add_argument(
+            "--skip-balances",
+            action="store_true",
+            help="Only rebuild the daily cash flow; keep the recorded balance snapshots",
+        )
+
+    def handle(self, *args, **options):
+        user_id = options.get("user")
+
+        rows = reports.rebuild_cash_flow(user_id)
+        self.stdout.write(self.style.SUCCESS(f"Daily cash flow rebuilt: {rows} row(s)"))
+
+        if options["skip_balances"]:
+            return
+        snapshots = reports.rebuild_balances(user_id)
+        self.stdout.write(self.style.SUCCESS(f"Balance snapshots rebuilt: {snapshots} row(s)"))
@@ -0,0 +1,91 @@
+import statistics
+import time
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from core.models import Account, AccountType, AuditLog, Currency, Transaction, TransactionType
+from core.serializers import TransactionSerializer
+
+BENCH_USERNAME = "audit-benchmark"
+MODES = ("sync", "buffered", "celery")
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark-ka audit-ka: samee N transactions TransactionSerializer.create ku socda "
+        "(commit kasta), AUDIT_WRITE_MODE kasta, oo isbarbar dhig latency-ga create-ka"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--creates", type=int, default=500, help="Transactions created per mode")
+        parser.add_argument("--warmup", type=int, default=20, help="Untimed creates before each mode")
+        parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+        parser.add_argument("--keep", action="store_true", help="Keep the benchmark user and its rows")
+
+    def handle(self, *args, **options):
+        # Create kasta waa transaction u gaar ah (sida request-ka): on_commit-ka audit-ka wuu ordaa
+        user, account = self._bench_account()
+        try:
+            results = {mode: self._run(mode, user, account, options) for mode in options["modes"]}
+        finally:
+            if not options["keep"]:
+                self._cleanup(user)
+
+        baseline = results.get("sync")
+        self.stdout.write(f"{'mode':<10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'creates/s':>12}{'vs sync':>10}")
+        for mode, timings in results.items():
+            mean = statistics.fmean(timings)
+            p95 = statistics.quantiles(timings, n=20)[-1]
+            versus = f"{mean / statistics.fmean(baseline):9.2f}x" if baseline else f"{'-':>10}"
+            self.stdout.write(
+                f"{mode:<10}{mean * 1000:10.2f}{statistics.median(timings) * 1000:10.2f}"
+                f"{p95 * 1000:10.2f}{1 / mean:12.1f}{versus}"
+            )
+
+    def _run(self, mode, user, account, options):
+        serializer = TransactionSerializer(context={"request": SimpleNamespace(user=user)})
+        data = {
+            "account": account, "type": TransactionType.INCOME, "amount": Decimal("1.00"),
+            "description": f"Audit benchmark ({mode})", "transaction_date": date.today(),
+        }
+        timings = []
+        with override_settings(AUDIT_WRITE_MODE=mode):
+            for _ in range(options["warmup"]):
+                serializer.create(dict(data))
+            audited = AuditLog.objects.filter(user=user, table_name="transactions").count()
+            for _ in range(options["creates"]):
+                started = time.perf_counter()
+                serializer.create(dict(data))
+                timings.append(time.perf_counter() - started)
+
+        if mode != "celery":
+            # Celery: entries-ka worker-ka ayaa qora, halkan kaliya enqueue-ga ayaa la cabbiray
+            written = AuditLog.objects.filter(user=user, table_name="transactions").count() - audited
+            if written != options["creates"]:
+                raise CommandError(f"{mode}: expected {options['creates']} audit rows, found {written}")
+        self.stdout.write(f"{mode}: {options['creates']} creates in {sum(timings):.2f}s")
+        return timings
+
+    def _bench_account(self):
+        User = get_user_model()
+        currency, _ = Currency.objects.get_or_create(code="USD", defaults={"name": "US Dollar", "symbol": "$"})
+        user, _ = User.objects.get_or_create(
+            username=BENCH_USERNAME,
+            defaults={"email": f"{BENCH_USERNAME}@example.com", "preferred_currency": currency},
+        )
+        account, _ = Account.objects.get_or_create(
+            user=user, name="Benchmark", defaults={"type": AccountType.BANK, "currency": currency},
+        )
+        return user, account
+
+    def _cleanup(self, user):
+        # Transactions-ka marka hore (Account/User waa PROTECT), audit-ka delete-ka ka dhashayna ka dib
+        Transaction.objects.filter(user=user).delete()
+        Account.objects.filter(user=user).delete()
+        AuditLog.objects.filter(user=user).delete()
+        user.delete()
@@ -0,0 +1,109 @@
+import resource
+import time
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction as dbtx
+
+from core.models import Account, AccountType, Currency, Transaction, TransactionType
+from core.services import transaction_export
+
+BENCH_USERNAME = "export-benchmark"
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark-ka export-ka: samee N transactions (user gaar ah), ku socodsii "
+        "transaction_export.stream, oo cabbir memory-ga marka export-ku socdo (waa inuu siman yahay)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000)
+        parser.add_argument("--format", choices=list(transaction_export.FORMATS), default="csv")
+        parser.add_argument("--checkpoints", type=int, default=10, help="How many memory samples to print")
+        parser.add_argument("--keep", action="store_true", help="Commit the seeded rows for the next run")
+        parser.add_argument(
+            "--max-growth-mb",
+            type=float,
+            default=5.0,
+            help="Fail if traced memory at the end exceeds the first checkpoint by more than this",
+        )
+
+    def handle(self, *args, **options):
+        # Hal DB transaction: --keep la'aan wax walba waa rollback (delete 1M rows signals la'aan)
+        with dbtx.atomic():
+            self._run(options)
+            if not options["keep"]:
+                dbtx.set_rollback(True)
+
+    def _run(self, options):
+        user, account = self._bench_account()
+        existing = Transaction.objects.filter(user=user).count()
+        if existing < options["rows"]:
+            self._seed(user, account, options["rows"] - existing)
+
+        queryset = Transaction.objects.filter(user=user, is_deleted=False)
+        every = max(queryset.count() // options["checkpoints"], 1)
+
+        tracemalloc.start()
+        started = time.monotonic()
+        samples, rows_seen, size = [], 0, 0
+        for piece in transaction_export.stream(queryset, options["format"], settings.TRANSACTION_EXPORT_CHUNK_SIZE):
+            size += len(piece)
+            before = rows_seen
+            rows_seen += piece.count("\n")
+            if rows_seen // every != before // every:
+                current, peak = tracemalloc.get_traced_memory()
+                rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+                samples.append((rows_seen, current, peak))
+                self.stdout.write(
+                    f"{rows_seen:>10} rows  traced {current / 2**20:7.2f} MB  "
+                    f"peak {peak / 2**20:7.2f} MB  max RSS {rss:8.1f} MB"
+                )
+        seconds = time.monotonic() - started
+        tracemalloc.stop()
+
+        if not samples:
+            raise CommandError("No rows were exported")
+        growth = (samples[-1][2] - samples[0][2]) / 2**20
+        self.stdout.write(
+            f"Exported {rows_seen} lines ({size / 2**20:.1f} MB of {options['format']}) in {seconds:.1f}s; "
+            f"peak traced memory grew {growth:.2f} MB after the first checkpoint"
+        )
+        if growth > options["max_growth_mb"]:
+            raise CommandError(f"Export memory is not flat: grew {growth:.2f} MB")
+        self.stdout.write(self.style.SUCCESS("✅ Export memory stayed flat"))
+
+    def _bench_account(self):
+        User = get_user_model()
+        currency, _ = Currency.objects.get_or_create(code="USD", defaults={"name": "US Dollar", "symbol": "$"})
+        user, _ = User.objects.get_or_create(
+            username=BENCH_USERNAME,
+            defaults={"email": f"{BENCH_USERNAME}@example.com", "preferred_currency": currency},
+        )
+        account, _ = Account.objects.get_or_create(
+            user=user, name="Benchmark", defaults={"type": AccountType.BANK, "currency": currency},
+        )
+        return user, account
+
+    def _seed(self, user, account, count, batch_size=10_000):
+        # bulk_create: signals-ka (ledger, audit) lama kiciyo - kaliya xog export-ka loogu talagalay
+        self.stdout.write(f"Seeding {count} transactions...")
+        start = date.today() - timedelta(days=3650)
+        for offset in range(0, count, batch_size):
+            Transaction.objects.bulk_create([
+                Transaction(
+                    user=user,
+                    account=account,
+                    type=TransactionType.EXPENSE if i % 3 else TransactionType.INCOME,
+                    amount=Decimal(i % 5000) / 100 + 1,
+                    currency_id=account.currency_id,
+                    description=f"Benchmark row {i}",
+                    transaction_date=start + timedelta(days=i % 3650),
+                )
+                for i in range(offset, min(offset + batch_size, count))
+            ])
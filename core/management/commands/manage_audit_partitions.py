@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from core.services import audit_partitions
+
+
+class Command(BaseCommand):
+    help = "Abuur AuditLog partitions bilaha soo socda oo dabaq retention policy-ga"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ahead", type=int, help="Months to create ahead (default AUDIT_PARTITION_MONTHS_AHEAD)")
+        parser.add_argument("--retention-months", type=int, help="Keep this many months (0 = forever)")
+        parser.add_argument("--retention-action", choices=audit_partitions.RETENTION_ACTIONS)
+        parser.add_argument("--list", action="store_true", help="Only list the attached partitions")
+
+    def handle(self, *args, **options):
+        if options["list"]:
+            for month, name in sorted(audit_partitions.attached_partitions().items()):
+                self.stdout.write(f"{month:%Y-%m}  {name}")
+            return
+
+        created = audit_partitions.ensure_partitions(options["ahead"])
+        for name in created:
+            self.stdout.write(f"➕ Created {name}")
+
+        removed = audit_partitions.apply_retention(options["retention_months"], options["retention_action"])
+        for name in removed:
+            self.stdout.write(f"🗑️ Retention: {name}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Audit partitions OK ({len(created)} created, {len(removed)} removed)"
+        ))
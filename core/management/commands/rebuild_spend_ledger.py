@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from core.services import spend_ledger
+
+
+class Command(BaseCommand):
+    help = "Dib u dhis SpendLedger-ka (per category/month spend) oo hubi drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Kaliya user-kan (UUID)")
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report drift between the ledger and the transactions, do not rewrite",
+        )
+
+    def handle(self, *args, **options):
+        user_id = options.get("user")
+        expected, drift = spend_ledger.find_drift(user_id)
+
+        for row in drift[:50]:
+            user, category, year, month = row["key"]
+            self.stdout.write(
+                f"Drift user={user} category={category} {year}-{month:02d}: "
+                f"stored={row['stored']} expected={row['expected']}"
+            )
+        if len(drift) > 50:
+            self.stdout.write(f"... iyo {len(drift) - 50} kale")
+
+        if options["check"]:
+            if drift:
+                self.stdout.write(self.style.WARNING(f"{len(drift)} ledger row(s) drifted"))
+            else:
+                self.stdout.write(self.style.SUCCESS("Ledger-ku waa sax, drift ma jiro"))
+            return
+
+        count = spend_ledger.rebuild(user_id, expected=expected)
+        self.stdout.write(self.style.SUCCESS(
+            f"Ledger rebuilt: {count} row(s), {len(drift)} drifted row(s) corrected"
+        ))
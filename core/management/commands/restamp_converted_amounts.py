@@ -0,0 +1,24 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from core.services.converted_amounts import restamp
+
+
+class Command(BaseCommand):
+    help = "Dib u xisaabi Transaction.converted_amount (preferred currency-ga user-ka)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Kaliya user-kan (UUID)")
+        parser.add_argument("--since", type=date.fromisoformat, help="Only transactions on/after this date (YYYY-MM-DD)")
+        parser.add_argument("--missing-only", action="store_true", help="Only rows that were never converted")
+        parser.add_argument("--chunk-size", type=int)
+
+    def handle(self, *args, **options):
+        scanned, updated = restamp(
+            user_id=options["user"],
+            since=options["since"],
+            only_missing=options["missing_only"],
+            chunk_size=options["chunk_size"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"✅ {updated} of {scanned} transaction(s) restamped"))
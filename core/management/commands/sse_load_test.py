@@ -0,0 +1,119 @@
+import asyncio
+import os
+import time
+from urllib.parse import urlsplit
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+def _rss_kb(pid):
+    """Resident memory (kB) and open fds of a local process, from /proc."""
+    try:
+        with open(f"/proc/{pid}/status") as fh:
+            rss = next(int(line.split()[1]) for line in fh if line.startswith("VmRSS:"))
+        return rss, len(os.listdir(f"/proc/{pid}/fd"))
+    except (OSError, StopIteration):
+        return None, None
+
+
+class Command(BaseCommand):
+    help = (
+        "Fur N SSE connections oo aamusan (notifications/stream/) oo hay muddo, "
+        "kadibna soo sheeg inta ku xirnayd, heartbeats-ka iyo RSS-ka server process-ka"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8001/api/notifications/stream/")
+        parser.add_argument("--user", required=True, help="Username-ka token-ka loo sameynayo")
+        parser.add_argument("--connections", type=int, default=2000)
+        parser.add_argument("--duration", type=int, default=60, help="Seconds to hold the connections open")
+        parser.add_argument("--ramp", type=int, default=200, help="New connections per second")
+        parser.add_argument(
+            "--server-pid",
+            type=int,
+            help="Uvicorn worker PID (same host) to report its memory and open file descriptors",
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} not found")
+
+        url = urlsplit(options["url"])
+        if url.scheme != "http":
+            raise CommandError("Only plain http:// URLs are supported (run it next to the worker)")
+        token = str(AccessToken.for_user(user))
+        path = f"{url.path}?token={token}"
+
+        stats = asyncio.run(self._run(url.hostname, url.port or 80, path, options))
+
+        self.stdout.write(
+            f"Connections: {stats['connected']}/{options['connections']} open at peak, "
+            f"{stats['failed']} failed, {stats['dropped']} dropped before the end"
+        )
+        self.stdout.write(f"Heartbeats received: {stats['pings']}")
+        if stats["rss_before"] is not None and stats["rss_peak"] is not None:
+            per_conn = (stats["rss_peak"] - stats["rss_before"]) / max(stats["connected"], 1)
+            self.stdout.write(
+                f"Server RSS: {stats['rss_before'] / 1024:.1f} MB -> {stats['rss_peak'] / 1024:.1f} MB "
+                f"(~{per_conn:.1f} kB per connection), open fds: {stats['fds_peak']}"
+            )
+        self.stdout.write(self.style.SUCCESS("SSE load test finished"))
+
+    async def _run(self, host, port, path, options):
+        stats = {"connected": 0, "failed": 0, "dropped": 0, "pings": 0}
+        open_now = 0
+        deadline = time.monotonic() + options["duration"]
+        rss_before, _ = _rss_kb(options["server_pid"]) if options["server_pid"] else (None, None)
+
+        async def client():
+            nonlocal open_now
+            try:
+                reader, writer = await asyncio.open_connection(host, port)
+                writer.write(
+                    f"GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept: text/event-stream\r\n\r\n".encode()
+                )
+                await writer.drain()
+                status = await reader.readline()
+                if b" 200 " not in status:
+                    raise ConnectionError(status.decode(errors="replace").strip())
+            except Exception:
+                stats["failed"] += 1
+                return
+
+            open_now += 1
+            stats["connected"] = max(stats["connected"], open_now)
+            try:
+                while time.monotonic() < deadline:
+                    line = await asyncio.wait_for(reader.readline(), max(deadline - time.monotonic(), 0.1))
+                    if not line:
+                        stats["dropped"] += 1
+                        break
+                    if line.startswith(b": ping"):
+                        stats["pings"] += 1
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                open_now -= 1
+                writer.close()
+
+        tasks = []
+        for i in range(options["connections"]):
+            tasks.append(asyncio.create_task(client()))
+            if (i + 1) % options["ramp"] == 0:
+                await asyncio.sleep(1)
+                self.stdout.write(f"… {open_now} open")
+
+        # Dhammaan marka ay furan yihiin cabbir server-ka
+        rss_peak = fds_peak = None
+        if options["server_pid"]:
+            await asyncio.sleep(min(5, max(deadline - time.monotonic(), 0)))
+            rss_peak, fds_peak = _rss_kb(options["server_pid"])
+
+        await asyncio.gather(*tasks)
+        stats.update(rss_before=rss_before, rss_peak=rss_peak, fds_peak=fds_peak)
+        return stats
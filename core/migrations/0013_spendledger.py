@@ -0,0 +1,77 @@
+# Generated by Django 5.2.5 on 2026-10-17 15:13
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.conf import settings
+from collections import defaultdict
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def populate_ledger(apps, schema_editor):
+    Transaction = apps.get_model("core", "Transaction")
+    TransactionSplit = apps.get_model("core", "TransactionSplit")
+    SpendLedger = apps.get_model("core", "SpendLedger")
+
+    live = Transaction.objects.filter(type="Expense", is_deleted=False)
+    totals = defaultdict(int)
+
+    rows = (
+        live.filter(category__isnull=False)
+        .annotate(y=ExtractYear("transaction_date"), m=ExtractMonth("transaction_date"))
+        .values("user_id", "category_id", "y", "m")
+        .annotate(total=Sum("amount"))
+        .order_by()
+    )
+    for row in rows:
+        totals[(row["user_id"], row["category_id"], row["y"], row["m"])] += row["total"]
+
+    splits = (
+        TransactionSplit.objects.filter(transaction__in=live)
+        .annotate(y=ExtractYear("transaction__transaction_date"), m=ExtractMonth("transaction__transaction_date"))
+        .values("transaction__user_id", "transaction__category_id", "category_id", "y", "m")
+        .annotate(total=Sum("amount"))
+        .order_by()
+    )
+    for row in splits:
+        user_id, period = row["transaction__user_id"], (row["y"], row["m"])
+        if row["transaction__category_id"] is not None:
+            totals[(user_id, row["transaction__category_id"]) + period] -= row["total"]
+        totals[(user_id, row["category_id"]) + period] += row["total"]
+
+    SpendLedger.objects.bulk_create(
+        [
+            SpendLedger(user_id=u, category_id=c, year=y, month=m, amount=amount)
+            for (u, c, y, m), amount in totals.items() if amount
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_user_verification_count_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpendLedger',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField()),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'year', 'month'], name='core_spendl_user_id_b309e5_idx')],
+                'unique_together': {('user', 'category', 'year', 'month')},
+            },
+        ),
+        migrations.RunPython(populate_ledger, migrations.RunPython.noop),
+    ]
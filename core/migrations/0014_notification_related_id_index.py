@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-17 15:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_spendledger'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['related_id', 'sent_at'], name='core_notifi_related_6a713f_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+# Trigger-ku wuxuu description_tsv cusbooneysiiyaa xitaa bulk_create (import, recurring)
+CREATE_TRIGGER = """
+CREATE TRIGGER core_transaction_description_tsv_update
+BEFORE INSERT OR UPDATE OF description ON core_transaction
+FOR EACH ROW EXECUTE FUNCTION
+tsvector_update_trigger(description_tsv, 'pg_catalog.simple', description);
+"""
+
+DROP_TRIGGER = "DROP TRIGGER IF EXISTS core_transaction_description_tsv_update ON core_transaction;"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_transactionimport'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+    ]
@@ -0,0 +1,129 @@
+from django.db import migrations
+
+# AuditLog -> monthly RANGE partitions on changed_at.
+# Postgres wuxuu rabaa in partition key-gu ku jiro primary key-ga: DB-ga PK = (id, changed_at).
+# Model state-ku wuxuu hayaa `id` oo keliya (uuid4 keligiis waa unique; .pk, admin iyo
+# serializers-ku hal column ayey u baahan yihiin), sidaa darteed migration-kani state-ka ma
+# beddelo: SeparateDatabaseAndState, state_operations = [].
+# Magacyada PK/FK/indexes catalog-ka ayaa laga akhriyaa, table-ka cusubna isla magacyadaas ayuu qaataa.
+
+TABLE = "core_auditlog"
+LEGACY = "core_auditlog_legacy"
+
+COLUMNS = "id, table_name, record_id, action, old_data, new_data, changed_at, ip_address, user_id"
+
+COLUMN_DDL = """
+    id uuid NOT NULL,
+    table_name varchar(100) NOT NULL,
+    record_id uuid NOT NULL,
+    action varchar(50) NOT NULL,
+    old_data jsonb NULL,
+    new_data jsonb NULL,
+    changed_at timestamp with time zone NOT NULL,
+    ip_address inet NULL,
+    user_id uuid NULL
+"""
+
+# Partition bil kasta oo xog leh, iyo bishan + 3 bilood oo soo socda
+CREATE_PARTITIONS = f"""
+CREATE TABLE core_auditlog_default PARTITION OF {TABLE} DEFAULT;
+
+DO $$
+DECLARE m date;
+BEGIN
+    FOR m IN
+        SELECT DISTINCT date_trunc('month', changed_at AT TIME ZONE 'UTC')::date FROM {LEGACY}
+        UNION
+        SELECT (date_trunc('month', now() AT TIME ZONE 'UTC') + make_interval(months => i))::date
+        FROM generate_series(0, 3) AS i
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF {TABLE} FOR VALUES FROM (%L) TO (%L)',
+            'core_auditlog_p' || to_char(m, 'YYYYMM'),
+            m::timestamp AT TIME ZONE 'UTC',
+            (m + interval '1 month')::timestamp AT TIME ZONE 'UTC'
+        );
+    END LOOP;
+END $$;
+"""
+
+
+def _catalog(schema_editor, table):
+    """The table's real PK, FK and index names: {"pk", "fk", "fk_target", "indexes": {columns: name}}."""
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+    catalog = {"indexes": {}}
+    for name, info in constraints.items():
+        if info["primary_key"]:
+            catalog["pk"] = name
+        elif info["foreign_key"]:
+            catalog["fk"], catalog["fk_target"] = name, info["foreign_key"]
+        elif info["index"]:
+            catalog["indexes"][tuple(info["columns"])] = name
+    return catalog
+
+
+def _legacy_name(name):
+    return f"{name[:56]}_legacy"
+
+
+def _swap_table(schema_editor, pk_columns, partitioned):
+    """
+    Rename the current table (and its PK/FK/indexes) out of the way, create the
+    new one under the same names, copy the rows and drop the old one.
+    """
+    q = schema_editor.quote_name
+    old = _catalog(schema_editor, TABLE)
+    fk_table, fk_column = old["fk_target"]
+
+    statements = [
+        f"ALTER TABLE {TABLE} RENAME TO {LEGACY}",
+        f"ALTER TABLE {LEGACY} RENAME CONSTRAINT {q(old['pk'])} TO {q(_legacy_name(old['pk']))}",
+        f"ALTER TABLE {LEGACY} RENAME CONSTRAINT {q(old['fk'])} TO {q(_legacy_name(old['fk']))}",
+    ]
+    statements += [f"ALTER INDEX {q(name)} RENAME TO {q(_legacy_name(name))}" for name in old["indexes"].values()]
+    statements.append(f"""
+        CREATE TABLE {TABLE} (
+            {COLUMN_DDL},
+            CONSTRAINT {q(old['pk'])} PRIMARY KEY ({pk_columns}),
+            CONSTRAINT {q(old['fk'])} FOREIGN KEY (user_id)
+                REFERENCES {q(fk_table)} ({q(fk_column)}) DEFERRABLE INITIALLY DEFERRED
+        ){" PARTITION BY RANGE (changed_at)" if partitioned else ""}
+    """)
+    statements += [
+        f"CREATE INDEX {q(name)} ON {TABLE} ({', '.join(q(column) for column in columns)})"
+        for columns, name in old["indexes"].items()
+    ]
+    if partitioned:
+        statements.append(CREATE_PARTITIONS)
+    statements += [
+        f"INSERT INTO {TABLE} ({COLUMNS}) SELECT {COLUMNS} FROM {LEGACY}",
+        # Partitions-ka (haddii ay jiraan) table-ka hore ayey la baxaan
+        f"DROP TABLE {LEGACY} CASCADE",
+    ]
+    for sql in statements:
+        # params=None: DO block-ka %I / %L ha loo qaadan placeholders
+        schema_editor.execute(sql, params=None)
+
+
+def partition_auditlog(apps, schema_editor):
+    _swap_table(schema_editor, "id, changed_at", partitioned=True)
+
+
+def unpartition_auditlog(apps, schema_editor):
+    _swap_table(schema_editor, "id", partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_transaction_description_tsv_trigger'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunPython(partition_auditlog, unpartition_auditlog)],
+            state_operations=[],
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.5 on 2026-10-17 15:26
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_partition_auditlog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedMonth',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('audit_logs', 'Audit logs'), ('notifications', 'Notifications')], max_length=20)),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField()),
+                ('file_path', models.CharField(max_length=512)),
+                ('row_count', models.IntegerField(default=0)),
+                ('size_bytes', models.BigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-year', '-month'],
+                'indexes': [models.Index(fields=['user', 'kind', 'year', 'month'], name='core_archiv_user_id_6aa073_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-17 16:26
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_sent_at(apps, schema_editor):
+    # Notifications-ka hore: sent_at-kii asalka ahaa ayaa ugu dhow waqtiga la abuuray
+    Notification = apps.get_model("core", "Notification")
+    Notification.objects.update(created_at=F("sent_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_user_notification_digest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.RunPython(copy_sent_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='core_notifi_user_id_954cd4_idx'),
+        ),
+    ]
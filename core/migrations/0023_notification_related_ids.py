@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 17:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_notification_created_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='related_ids',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
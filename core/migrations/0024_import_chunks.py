@@ -0,0 +1,30 @@
+# Generated by Django 5.2.5 on 2026-10-17 17:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_notification_related_ids'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='transactionimport',
+            name='file',
+        ),
+        migrations.CreateModel(
+            name='TransactionImportChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.IntegerField()),
+                ('data', models.BinaryField()),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='core.transactionimport')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('job', 'seq'), name='unique_import_chunk_seq')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-17 17:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_import_chunks'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'transaction_date', 'id'], name='core_transa_user_id_99a88c_idx'),
+        ),
+    ]
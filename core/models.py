@@ -89,6 +89,8 @@ class User(AbstractUser):
     phone = models.CharField(max_length=20, blank=True, null=True)
     photo = models.ImageField(upload_to="profile_photos/", blank=True, null=True)
     two_factor_enabled = models.BooleanField(default=False)
+    # Digest: budget alerts iyo recurring bills-ka run kasta hal notification + hal email
+    notification_digest = models.BooleanField(default=False)
     # models.py
     last_verification_sent = models.DateTimeField(null=True, blank=True)
     verification_count = models.IntegerField(default=0)
@@ -97,6 +99,13 @@ class User(AbstractUser):
 
     REQUIRED_FIELDS = ["email", "preferred_currency"]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Haddii preferred_currency la beddelo, converted amounts-ka waa in dib loo xisaabiyaa
+        instance._loaded_preferred_currency_id = instance.__dict__.get("preferred_currency_id")
+        return instance
+
     def __str__(self):
         return self.username
 
@@ -191,6 +200,7 @@ class Transaction(SoftDeleteModel):
     class Meta:
         indexes = [
             models.Index(fields=["user","transaction_date","type"]),
+            models.Index(fields=["user", "transaction_date", "id"]),  # keyset pagination
             models.Index(fields=["account","transaction_date"]),
             models.Index(fields=["category"]),
             GinIndex(fields=["description_tsv"]),
@@ -217,6 +227,25 @@ class Transaction(SoftDeleteModel):
         if self.currency != self.account.currency:
             raise ValidationError("Transaction currency must match the account currency.")
 
+    # ---------------- Ledger snapshot ----------------
+    LEDGER_FIELDS = (
+        "user_id", "category_id", "account_id", "target_account_id",
+        "type", "amount", "transaction_date", "is_deleted",
+    )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Xusuuso qiimaha DB-ga si spend ledger-ka loogu xisaabiyo farqiga marka la save gareeyo
+        instance._ledger_state = instance.ledger_state()
+        return instance
+
+    def ledger_state(self):
+        """Snapshot of the fields the spend ledger / reports depend on (None if any is deferred)."""
+        if any(f not in self.__dict__ for f in self.LEDGER_FIELDS):
+            return None
+        return {f: self.__dict__[f] for f in self.LEDGER_FIELDS}
+
     # ---------------- Save method ----------------
     def save(self, *args, **kwargs):
         # Kaliya validate oo save transaction-ka, balance update ha dhicin halkan
@@ -229,6 +258,48 @@ class Transaction(SoftDeleteModel):
             # Balance rollback hadda waxaa fiican in lagu sameeyo view ama serializer
             super().delete(using=using, keep_parents=keep_parents)
 
+# ----- Transaction imports -----
+class ImportStatus(models.TextChoices):
+    PENDING = "Pending", "Pending"
+    RUNNING = "Running", "Running"
+    COMPLETED = "Completed", "Completed"
+    FAILED = "Failed", "Failed"
+
+class TransactionImport(models.Model):
+    """A bulk CSV / JSON-lines statement import, processed inline or by Celery."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    file_format = models.CharField(max_length=10)
+    status = models.CharField(max_length=10, choices=ImportStatus.choices, default=ImportStatus.PENDING)
+    total_rows = models.IntegerField(default=0)
+    imported_rows = models.IntegerField(default=0)
+    failed_rows = models.IntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"Import {self.id} ({self.status})"
+
+
+class TransactionImportChunk(models.Model):
+    """
+    A queued import's upload, stored in Postgres in ordered pieces so the
+    Celery worker can read it without sharing a disk with the web process.
+    Deleted once the job finishes.
+    """
+    job = models.ForeignKey(TransactionImport, related_name="chunks", on_delete=models.CASCADE)
+    seq = models.IntegerField()
+    data = models.BinaryField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["job", "seq"], name="unique_import_chunk_seq"),
+        ]
+
 # ----- Transaction Splits -----
 class TransactionSplit(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -240,6 +311,19 @@ class TransactionSplit(models.Model):
     class Meta:
         unique_together = (("transaction","category"),)
 
+    LEDGER_FIELDS = ("transaction_id", "category_id", "amount")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._ledger_state = instance.ledger_state()
+        return instance
+
+    def ledger_state(self):
+        if any(f not in self.__dict__ for f in self.LEDGER_FIELDS):
+            return None
+        return {f: self.__dict__[f] for f in self.LEDGER_FIELDS}
+
     def clean(self):
         existing_total = (
             TransactionSplit.objects
@@ -263,15 +347,14 @@ class TransactionSplit(models.Model):
 
             # Update account balance only for new splits
             if is_new:
+                from .services.balance_service import credit, debit
+
                 account = self.transaction.account
+                on_date = self.transaction.transaction_date
                 if self.transaction.type == TransactionType.INCOME:
-                    account.balance = F("balance") + self.amount
+                    credit(account, self.amount, on_date=on_date)
                 elif self.transaction.type == TransactionType.EXPENSE:
-                    if account.balance < self.amount:
-                        raise ValidationError("Insufficient funds for expense.")
-                    account.balance = F("balance") - self.amount
-                account.save(update_fields=["balance"])
-                account.refresh_from_db(fields=["balance"])
+                    debit(account, self.amount, "Insufficient funds for expense.", on_date=on_date)
 
 # ----- Attachments -----
 class Attachment(models.Model):
@@ -307,14 +390,15 @@ class Budget(models.Model):
 
     @property
     def total_spent(self):
-        # Wadar kharashka ku saabsan user, category, month & year
-        total = Transaction.objects.filter(
-            user=self.user,
-            category=self.category,
-            type='Expense',
-            transaction_date__year=self.year,
-            transaction_date__month=self.month
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        # Wadar kharashka ku saabsan user, category, month & year (SpendLedger lookup)
+        if getattr(self, "spent_total", None) is not None:
+            return self.spent_total
+        total = SpendLedger.objects.filter(
+            user_id=self.user_id,
+            category_id=self.category_id,
+            year=self.year,
+            month=self.month,
+        ).values_list("amount", flat=True).first() or 0
         return total
 
     @property
@@ -328,45 +412,121 @@ class Budget(models.Model):
             return 0
         return (self.total_spent / self.amount) * 100
     
-    def check_budget_alerts(self):
-        """Check if budget alerts need to be sent"""
-        from .utils.notifications import create_budget_notification
-        from .models import NotificationType
-        
-        percentage = self.spent_percentage
-        
+    def alert_for(self, spent):
+        """
+        Return (notification_type, subject, message) for the given spent amount,
+        or None if no alert is needed. Pure function - no queries.
+        """
+        spent = spent or 0
+        remaining = self.amount - spent
+        percentage = (spent / self.amount) * 100 if self.amount else 0
+        category_name = self.category.name
+
         if percentage >= 90:
-            create_budget_notification(
-                self.user,
-                f"Your {self.category.name} budget is {percentage:.0f}% spent",
-                f"You've spent ${self.total_spent:.2f} of ${self.amount:.2f}. "
-                f"Only ${self.total_remaining:.2f} remaining.",
-                self.id,
-                NotificationType.BUDGET
+            return (
+                NotificationType.BUDGET,
+                f"Your {category_name} budget is {percentage:.0f}% spent",
+                f"You've spent ${spent:.2f} of ${self.amount:.2f}. "
+                f"Only ${remaining:.2f} remaining.",
             )
-            return True
         elif percentage >= 75:
-            create_budget_notification(
-                self.user,
-                f"Your {self.category.name} budget is {percentage:.0f}% spent",
-                f"You've spent ${self.total_spent:.2f} of ${self.amount:.2f}. "
-                f"${self.total_remaining:.2f} remaining.",
-                self.id,
-                NotificationType.BUDGET
+            return (
+                NotificationType.BUDGET,
+                f"Your {category_name} budget is {percentage:.0f}% spent",
+                f"You've spent ${spent:.2f} of ${self.amount:.2f}. "
+                f"${remaining:.2f} remaining.",
             )
-            return True
-        elif self.total_remaining < 0:
-            create_budget_notification(
-                self.user,
-                f"Your {self.category.name} budget has been exceeded",
-                f"You've exceeded your budget by ${abs(self.total_remaining):.2f}. "
-                f"Total spent: ${self.total_spent:.2f} of ${self.amount:.2f}.",
-                self.id,
-                NotificationType.WARNING
+        elif remaining < 0:
+            return (
+                NotificationType.WARNING,
+                f"Your {category_name} budget has been exceeded",
+                f"You've exceeded your budget by ${abs(remaining):.2f}. "
+                f"Total spent: ${spent:.2f} of ${self.amount:.2f}.",
             )
-            return True
-        
-        return False
+        return None
+
+    def check_budget_alerts(self):
+        """Check if budget alerts need to be sent"""
+        from .utils.notifications import create_budget_notification
+
+        # total_spent hal mar kaliya ayaa la xisaabiyaa
+        alert = self.alert_for(self.total_spent)
+        if alert is None:
+            return False
+
+        notification_type, subject, message = alert
+        create_budget_notification(self.user, subject, message, self.id, notification_type)
+        return True
+
+# ----- Spend ledger -----
+class SpendLedger(models.Model):
+    """
+    Per (user, category, year, month) expense rollup, kept up to date by
+    core.services.spend_ledger whenever transactions or splits change.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    year = models.IntegerField()
+    month = models.IntegerField()
+    amount = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = (("user","category","year","month"),)
+        indexes = [
+            models.Index(fields=["user","year","month"]),
+        ]
+
+    def __str__(self):
+        return f"{self.category_id} {self.year}-{self.month:02d}: {self.amount}"
+
+# ----- Reporting snapshots -----
+class DailyCashFlow(models.Model):
+    """
+    Per (account, day) income / expense / transfer totals in the account's
+    currency, kept up to date by core.services.reports on every transaction write.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    account = models.ForeignKey(Account, on_delete=models.CASCADE)
+    date = models.DateField()
+    income = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    expense = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    transfer_in = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    transfer_out = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = (("account","date"),)
+        indexes = [
+            models.Index(fields=["user","date"]),
+        ]
+
+    def __str__(self):
+        return f"{self.account_id} {self.date}: +{self.income} -{self.expense}"
+
+class DailyAccountBalance(models.Model):
+    """
+    Closing balance of an account on a day. A row exists only for days the
+    balance changed (or the nightly snapshot ran); readers carry the latest
+    row forward.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    account = models.ForeignKey(Account, on_delete=models.CASCADE)
+    date = models.DateField()
+    balance = models.DecimalField(max_digits=15, decimal_places=2)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = (("account","date"),)
+        indexes = [
+            models.Index(fields=["user","date"]),
+        ]
+
+    def __str__(self):
+        return f"{self.account_id} {self.date}: {self.balance}"
 
 # ----- Notifications -----
 class Notification(models.Model):
@@ -377,18 +537,66 @@ class Notification(models.Model):
     is_read = models.BooleanField(default=False)
     sent_at = models.DateTimeField(default=timezone.now)
     related_id = models.UUIDField(null=True, blank=True)
+    # Digest-ka: related_id-yada events-ka uu isku soo ururiyay (dedupe maalinle ah)
+    related_ids = models.JSONField(default=list, blank=True)
     email_sent = models.BooleanField(default=False)
+    # Marna lama beddelo: SSE replay (Last-Event-ID) ayaa ku xiran
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
     
     class Meta:
         ordering = ['-sent_at']
         indexes = [
             models.Index(fields=['user', 'is_read']),
             models.Index(fields=['user', 'sent_at']),
+            models.Index(fields=['related_id', 'sent_at']),
+            models.Index(fields=['user', 'created_at', 'id']),
         ]
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Unread counter-ka: farqiga is_read marka la save gareeyo
+        instance._loaded_is_read = instance.__dict__.get("is_read")
+        return instance
+
     def __str__(self):
         return f"{self.type} for {self.user}: {self.message[:50]}..."
 
+# ----- Email outbox -----
+class EmailStatus(models.TextChoices):
+    PENDING = "Pending", "Pending"
+    SENDING = "Sending", "Sending"
+    SENT = "Sent", "Sent"
+    FAILED = "Failed", "Failed"
+
+class EmailOutbox(models.Model):
+    """
+    One queued email. Written in the same DB transaction as the notification
+    and delivered in batches by core.services.email_outbox on the emails queue.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    subject = models.CharField(max_length=255)
+    message = models.TextField()
+    email_type = models.CharField(max_length=30, default="general")
+    extra_data = models.JSONField(null=True, blank=True)
+    notification_id = models.UUIDField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=EmailStatus.choices, default=EmailStatus.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.status} {self.subject} -> {self.user_id}"
+
 # ----- Exchange rates -----
 class ExchangeRate(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -429,4 +637,30 @@ class AuditLog(models.Model):
         ]
     
     def __str__(self):
-        return f"{self.action} on {self.table_name} by {self.user} at {self.changed_at}"
\ No newline at end of file
+        return f"{self.action} on {self.table_name} by {self.user} at {self.changed_at}"
+
+# ----- Cold-storage archives -----
+class ArchiveKind(models.TextChoices):
+    AUDIT_LOGS = "audit_logs", "Audit logs"
+    NOTIFICATIONS = "notifications", "Notifications"
+
+class ArchivedMonth(models.Model):
+    """One gzip NDJSON file holding a user's archived rows for one month."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=20, choices=ArchiveKind.choices)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.CASCADE)
+    year = models.IntegerField()
+    month = models.IntegerField()
+    file_path = models.CharField(max_length=512)  # ARCHIVE_ROOT ka bilaabo
+    row_count = models.IntegerField(default=0)
+    size_bytes = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["-year", "-month"]
+        indexes = [
+            models.Index(fields=["user", "kind", "year", "month"]),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.user_id} {self.year}-{self.month:02d} ({self.row_count} rows)"
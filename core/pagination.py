@@ -0,0 +1,151 @@
+# core/pagination.py
+import base64
+import json
+from collections import OrderedDict
+from datetime import timedelta
+from itertools import islice
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def keyset_after(queryset, field, value, last_id):
+    """Newest first, strictly after the (field, id) cursor if one is given."""
+    queryset = queryset.order_by(f"-{field}", "-id")
+    if value is None:
+        return queryset
+    return queryset.filter(Q(**{f"{field}__lt": value}) | Q(**{field: value, "id__lt": last_id}))
+
+
+class WithArchivedRows:
+    """
+    A live queryset followed by rows read back from cold storage. Archiving
+    moves whole months, so every archived row is older than the live ones.
+    `archived(end)` yields the (already filtered) archived rows older than
+    `end`, or all of them for None, newest first and opening months lazily;
+    `archived_count()` counts them. Gives Django's Paginator count() and
+    slicing, and KeysetPagination page_after().
+    """
+
+    def __init__(self, queryset, archived, archived_count, cursor_field):
+        self.model = queryset.model
+        self.cursor_field = cursor_field
+        self.queryset = keyset_after(queryset, cursor_field, None, None)
+        self.archived = archived
+        self.archived_count = archived_count
+        self._live_count = None
+        self._count = None
+
+    def live_count(self):
+        if self._live_count is None:
+            self._live_count = self.queryset.count()
+        return self._live_count
+
+    def count(self):
+        if self._count is None:
+            self._count = self.live_count() + self.archived_count()
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop if index.stop is not None else self.count()
+        rows = list(self.queryset[start:stop])
+        if len(rows) < stop - start:
+            offset = max(start - self.live_count(), 0)
+            rows += islice(self.archived(None), offset, offset + stop - start - len(rows))
+        return rows
+
+    def page_after(self, value, last_id, limit):
+        rows = list(keyset_after(self.queryset, self.cursor_field, value, last_id)[:limit])
+        if len(rows) < limit:
+            # Bilaha ka cusub cursor-ka lama furo; kuwa ka duugan marka bogga la buuxiyo ayaa la joojiyaa
+            end = None if value is None else value + timedelta(microseconds=1)
+            key = lambda obj: (getattr(obj, self.cursor_field), obj.pk)
+            older = (obj for obj in self.archived(end) if value is None or key(obj) < (value, last_id))
+            rows += islice(older, limit - len(rows))
+        return rows
+
+
+class KeysetPagination(PageNumberPagination):
+    """
+    Page-number pagination by default (old clients keep working), or keyset
+    pagination when the request asks for it with `?pagination=cursor` / `?cursor=<token>`.
+
+    Keyset mode walks the view's `cursor_field` newest first with `id` as the
+    tie-breaker: WHERE (field, id) < (last_field, last_id) ORDER BY field DESC, id DESC.
+    No COUNT(*) and no OFFSET, so page 10 000 costs the same as page 1.
+    Any ?ordering= is ignored in this mode.
+    """
+
+    cursor_query_param = "cursor"
+    mode_query_param = "pagination"
+
+    def _use_keyset(self, request, view):
+        if not getattr(view, "cursor_field", None):
+            return False
+        return (
+            self.cursor_query_param in request.query_params
+            or request.query_params.get(self.mode_query_param) == "cursor"
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self._use_keyset(request, view)
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.cursor_field = view.cursor_field
+        page_size = self.get_page_size(request)
+
+        token = request.query_params.get(self.cursor_query_param)
+        value, last_id = self.decode_cursor(queryset.model, token) if token else (None, None)
+
+        # Hal row oo dheeri ah ayaa sheegaysa in bog kale jiro
+        if isinstance(queryset, WithArchivedRows):
+            rows = queryset.page_after(value, last_id, page_size + 1)
+        else:
+            rows = list(keyset_after(queryset, self.cursor_field, value, last_id)[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        self.page_rows = rows[:page_size]
+        return self.page_rows
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ("next", self.get_next_link()),
+            ("results", data),
+        ]))
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        last = self.page_rows[-1]
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.mode_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(last))
+
+    # ---------------- Cursor token ----------------
+    def encode_cursor(self, obj):
+        value = getattr(obj, self.cursor_field)
+        payload = json.dumps([value.isoformat(), str(obj.pk)])
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, model, token):
+        try:
+            padded = token + "=" * (-len(token) % 4)
+            raw_value, raw_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            value = model._meta.get_field(self.cursor_field).to_python(raw_value)
+            last_id = model._meta.pk.to_python(raw_id)
+        except Exception:
+            raise NotFound("Cursor-ku sax maaha.")
+        return value, last_id
@@ -3,8 +3,12 @@ from rest_framework import serializers
 from django.conf import settings
 from django.contrib.auth.password_validation import validate_password
 from .models import *
+from datetime import timedelta
 from decimal import Decimal
+from django.utils import timezone
 from .emails import send_verification_email
+from .services.balance_service import InsufficientFunds, post_transaction, repost_transaction
+from .services.converted_amounts import stamp_transactions
 
 
 # ---- User & Auth ----
@@ -112,7 +116,8 @@ class UserSerializer(serializers.ModelSerializer):
         fields = (
             "id", "username", "email", "first_name", "last_name", "phone",
             "preferred_currency", "monthly_income_est", "savings_goal",
-            "photo", "is_active", "is_verified", "date_joined", "two_factor_enabled","last_verification_sent"
+            "photo", "is_active", "is_verified", "date_joined", "two_factor_enabled","last_verification_sent",
+            "notification_digest",
         )
         read_only_fields = ("is_active", "is_verified", "date_joined")
 
@@ -204,36 +209,67 @@ class TransactionSerializer(serializers.ModelSerializer):
         # ✅ currency si toos ah uga qaado account
         validated_data["currency"] = account.currency
 
+        if tx_type == TransactionType.TRANSFER and not target_account:
+            raise serializers.ValidationError("Target account waa in la doortaa.")
+
         with transaction.atomic():
-            # Haddii balance = 0 ama ka yar, kaliya INCOME waa la ogol yahay
-            if account.balance <= 0 and tx_type != TransactionType.INCOME:
-                raise serializers.ValidationError(
-                    "Account-kaagu waa faaruq yahay. Kaliya INCOME ayaa la ogol yahay."
-                )
+            # Balance-ka waxaa lagu beddelaa UPDATE shuruud leh (balance >= amount) hal mar
+            try:
+                post_transaction(account, tx_type, amount, target_account, validated_data.get("transaction_date"))
+            except InsufficientFunds as e:
+                self._insufficient_funds(e)
 
-            if tx_type == TransactionType.INCOME:
-                account.balance += amount
-                account.save(update_fields=["balance"])
+            transaction_obj = Transaction(**validated_data)
+            # Qadarka lagu kaydiyaa preferred currency-ga user-ka (rate-ka maalintaas)
+            stamp_transactions([transaction_obj], {user.pk: user.preferred_currency_id})
+            transaction_obj.save(force_insert=True)
 
-            elif tx_type == TransactionType.EXPENSE:
-                if account.balance < amount:
-                    raise serializers.ValidationError("Insufficient funds for expense.")
-                account.balance -= amount
-                account.save(update_fields=["balance"])
+        return transaction_obj
 
-            elif tx_type == TransactionType.TRANSFER:
-                if not target_account:
-                    raise serializers.ValidationError("Target account waa in la doortaa.")
-                if account.balance < amount:
-                    raise serializers.ValidationError("Insufficient funds for transfer.")
-                account.balance -= amount
-                account.save(update_fields=["balance"])
-                target_account.balance += amount
-                target_account.save(update_fields=["balance"])
+    def update(self, instance, validated_data):
+        if "account" in validated_data:
+            validated_data["currency"] = validated_data["account"].currency
+        old = self._posting(instance)
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        new = self._posting(instance)
+        if instance.type == TransactionType.TRANSFER and not instance.target_account:
+            raise serializers.ValidationError("Target account waa in la doortaa.")
 
-            transaction_obj = Transaction.objects.create(**validated_data)
+        user = self.context["request"].user
+        with transaction.atomic():
+            # Account / type / amount / taariikh isbeddelay: posting-kii hore dib u celi, kan cusub geli
+            if new != old:
+                try:
+                    repost_transaction(old, new)
+                except InsufficientFunds as e:
+                    self._insufficient_funds(e)
+            stamp_transactions([instance], {user.pk: user.preferred_currency_id})
+            instance.save()
+        return instance
+
+    @staticmethod
+    def _posting(tx):
+        return (tx.account, tx.type, Decimal(tx.amount), tx.target_account, tx.transaction_date)
+
+    @staticmethod
+    def _insufficient_funds(error):
+        # Haddii balance = 0 ama ka yar, kaliya INCOME waa la ogol yahay
+        if error.balance is not None and error.balance <= 0:
+            raise serializers.ValidationError(
+                "Account-kaagu waa faaruq yahay. Kaliya INCOME ayaa la ogol yahay."
+            )
+        raise serializers.ValidationError(error.messages[0])
 
-        return transaction_obj
+# ---- Transaction Import ----
+class TransactionImportSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TransactionImport
+        fields = [
+            "id", "file_format", "status", "total_rows", "imported_rows",
+            "failed_rows", "errors", "created_at", "finished_at",
+        ]
+        read_only_fields = fields
 
 # ---- Attachment ----
 class AttachmentSerializer(serializers.ModelSerializer):
@@ -279,15 +315,12 @@ class BudgetSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "created_at", "updated_at", "user", "total_spent", "total_remaining"]
 
     def get_total_spent(self, obj):
-        # Total spent in this category for the month
-        transactions = Transaction.objects.filter(
-            user=obj.user,
-            category=obj.category,
-            transaction_date__year=obj.year,
-            transaction_date__month=obj.month,
-            type="Expense"
-        )
-        return transactions.aggregate(total=Sum("amount"))["total"] or 0
+        # BudgetViewSet wuxuu soo annotate-gareeyaa spent_total; fallback kaliya haddii uu maqan yahay
+        spent = getattr(obj, "spent_total", None)
+        if spent is None:
+            spent = obj.total_spent
+            obj.spent_total = spent
+        return spent
 
     def get_total_remaining(self, obj):
         spent = self.get_total_spent(obj)
@@ -347,6 +380,60 @@ class ExchangeRateSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+class ConvertBatchItemSerializer(serializers.Serializer):
+    amount = serializers.DecimalField(max_digits=20, decimal_places=6)
+    from_currency = serializers.CharField(max_length=3)
+    to_currency = serializers.CharField(max_length=3)
+    date = serializers.DateField(required=False)
+
+class ConvertBatchSerializer(serializers.Serializer):
+    items = ConvertBatchItemSerializer(many=True, allow_empty=False, max_length=1000)
+
+class ConvertBatchResultSerializer(serializers.Serializer):
+    # Decimal-ka waxaa loo celiyaa string si saxnaanta aan float u lumin
+    amount = serializers.DecimalField(max_digits=20, decimal_places=6)
+    from_currency = serializers.CharField()
+    to_currency = serializers.CharField()
+    date = serializers.DateField()
+    converted_amount = serializers.DecimalField(max_digits=28, decimal_places=2, required=False)
+    rate = serializers.DecimalField(max_digits=40, decimal_places=12, required=False)
+    rate_date = serializers.DateField(required=False)
+    path = serializers.ListField(child=serializers.CharField(), required=False)
+    error = serializers.CharField(required=False)
+
+
+# ---- Reports ----
+class ReportQuerySerializer(serializers.Serializer):
+    # Haddii start la waayo: 30 maalmood / 12 toddobaad / 12 bilood oo dib u socda
+    DEFAULT_SPAN = {"day": timedelta(days=29), "week": timedelta(weeks=11), "month": timedelta(days=334)}
+
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    bucket = serializers.ChoiceField(choices=["day", "week", "month"], default="month")
+
+    def validate(self, attrs):
+        today = timezone.now().date()
+        end = min(attrs.get("end") or today, today)
+        start = attrs.get("start") or end - self.DEFAULT_SPAN[attrs["bucket"]]
+        if start > end:
+            raise serializers.ValidationError("start must be on or before end.")
+        if (end - start).days > settings.REPORT_MAX_RANGE_DAYS:
+            raise serializers.ValidationError(f"Range cannot exceed {settings.REPORT_MAX_RANGE_DAYS} days.")
+        return {**attrs, "start": start, "end": end}
+
+class SpendTreeQuerySerializer(serializers.Serializer):
+    # Default: bishan (1-da ilaa maanta)
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        end = attrs.get("end") or timezone.now().date()
+        start = attrs.get("start") or end.replace(day=1)
+        if start > end:
+            raise serializers.ValidationError("start must be on or before end.")
+        return {"start": start, "end": end}
+
+
 # ---- AuditLog ----
 class AuditLogSerializer(serializers.ModelSerializer):
     user = serializers.StringRelatedField()
@@ -0,0 +1,161 @@
+# core/services/audit_partitions.py
+import os
+import re
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction as dbtx
+from django.utils import timezone
+
+from ..models import ArchiveKind, AuditLog
+from . import archive
+
+# Partitions-ka AuditLog (migration 0017): core_auditlog_pYYYYMM + core_auditlog_default
+PARENT = "core_auditlog"
+DEFAULT_PARTITION = f"{PARENT}_default"
+_NAME_RE = re.compile(rf"^{PARENT}_p(\d{{4}})(\d{{2}})$")
+RETENTION_ACTIONS = ("archive", "drop")
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{PARENT}_p{month:%Y%m}"
+
+
+def _bound(month):
+    # Xadka partition-ka waa UTC midnight
+    return datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc)
+
+
+def attached_partitions():
+    """Return {month: table_name} for the monthly partitions currently attached."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s
+            """,
+            [PARENT],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = {}
+    for name in names:
+        match = _NAME_RE.match(name)
+        if match:
+            partitions[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+
+def create_partition(month):
+    """
+    Create the partition for `month`. Rows that already landed in the default
+    partition for that month are moved into it first (ATTACH would fail otherwise).
+    """
+    qn = connection.ops.quote_name
+    name, start, end = partition_name(month), _bound(month), _bound(add_months(month, 1))
+    with dbtx.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT EXISTS (SELECT 1 FROM {qn(DEFAULT_PARTITION)} WHERE changed_at >= %s AND changed_at < %s)",
+            [start, end],
+        )
+        if not cursor.fetchone()[0]:
+            cursor.execute(
+                f"CREATE TABLE {qn(name)} PARTITION OF {qn(PARENT)} FOR VALUES FROM (%s) TO (%s)",
+                [start, end],
+            )
+            return name
+
+        cursor.execute(f"CREATE TABLE {qn(name)} (LIKE {qn(PARENT)} INCLUDING DEFAULTS)")
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {qn(DEFAULT_PARTITION)} WHERE changed_at >= %s AND changed_at < %s RETURNING *) "
+            f"INSERT INTO {qn(name)} SELECT * FROM moved",
+            [start, end],
+        )
+        cursor.execute(
+            f"ALTER TABLE {qn(PARENT)} ATTACH PARTITION {qn(name)} FOR VALUES FROM (%s) TO (%s)",
+            [start, end],
+        )
+    return name
+
+
+def ensure_partitions(months_ahead=None, today=None):
+    """Make sure this month and the next `months_ahead` months have a partition."""
+    months_ahead = settings.AUDIT_PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    current = month_start(today or timezone.now().date())
+    existing = attached_partitions()
+
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if month not in existing:
+            created.append(create_partition(month))
+    return created
+
+
+def drop_partition(month, name, archive_rows=True):
+    """
+    Detach and drop one monthly partition. With `archive_rows` every user's
+    rows are first written to the cold-storage archive (core.services.archive),
+    so the audit log list can still serve them. One DB transaction: a failure
+    keeps the partition and removes the files written so far.
+    """
+    qn = connection.ops.quote_name
+    written = []
+    try:
+        with dbtx.atomic():
+            if archive_rows:
+                start, end = _bound(month), _bound(add_months(month, 1))
+                user_ids = (
+                    AuditLog.objects.filter(changed_at__gte=start, changed_at__lt=end)
+                    .order_by().values_list("user_id", flat=True).distinct()
+                )
+                for user_id in list(user_ids):
+                    # Table-ka waa la tuurayaa: rows-ka DELETE looma baahna
+                    archived = archive.archive_user_month(
+                        ArchiveKind.AUDIT_LOGS, user_id, month.year, month.month, delete_rows=False,
+                    )
+                    if archived:
+                        written.append(archived.file_path)
+            with connection.cursor() as cursor:
+                cursor.execute(f"ALTER TABLE {qn(PARENT)} DETACH PARTITION {qn(name)}")
+                cursor.execute(f"DROP TABLE {qn(name)}")
+    except Exception:
+        for relative in written:
+            path = archive.absolute_path(relative)
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+    return name
+
+
+def apply_retention(retention_months=None, action=None, today=None):
+    """
+    Remove whole partitions older than `retention_months` (0 = keep forever).
+    action "archive" writes their rows to the cold-storage archive before
+    dropping them, "drop" deletes them outright. No row-by-row DELETE is ever issued.
+    """
+    retention_months = settings.AUDIT_RETENTION_MONTHS if retention_months is None else retention_months
+    action = action or settings.AUDIT_RETENTION_ACTION
+    if retention_months <= 0:
+        return []
+    if action not in RETENTION_ACTIONS:
+        raise ValueError(f"Unknown retention action: {action}")
+
+    cutoff = add_months(month_start(today or timezone.now().date()), -retention_months)
+    return [
+        drop_partition(month, name, archive_rows=action == "archive")
+        for month, name in sorted(attached_partitions().items())
+        if month < cutoff
+    ]
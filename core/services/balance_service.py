@@ -0,0 +1,183 @@
+# core/services/balance_service.py
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction as dbtx
+from django.db.models import Case, DecimalField, F, Value, When
+
+from ..models import Account, TransactionType
+from . import reports
+
+
+class InsufficientFunds(ValidationError):
+    """Raised when a conditional debit matched no row; `balance` is the current balance."""
+
+    def __init__(self, message, balance=None):
+        super().__init__(message)
+        self.balance = balance
+
+
+def lock_accounts(account_ids):
+    """
+    SELECT ... FOR UPDATE the accounts in primary-key order, so two transfers
+    touching the same pair of accounts always lock them in the same order.
+    """
+    ids = {pk for pk in account_ids if pk}
+    return list(
+        Account.objects.select_for_update().filter(pk__in=ids).order_by("pk").values_list("pk", flat=True)
+    )
+
+
+def locked_balances(account_ids):
+    """Lock the accounts (pk order) and return {account_id: balance}."""
+    ids = {pk for pk in account_ids if pk}
+    return dict(
+        Account.objects.select_for_update().filter(pk__in=ids).order_by("pk").values_list("pk", "balance")
+    )
+
+
+def _update_balance(account_id, delta, require_funds=False):
+    """
+    One round trip: UPDATE ... SET balance = balance + delta [WHERE balance >= -delta]
+    RETURNING balance. Returns the new balance, or None if the condition failed
+    (an empty account still fails any positive debit).
+    """
+    table = connection.ops.quote_name(Account._meta.db_table)
+    sql = f"UPDATE {table} SET balance = balance + %s WHERE id = %s"
+    params = [delta, str(account_id)]
+    if require_funds:
+        sql += " AND balance >= %s"
+        params.append(-delta)
+    sql += " RETURNING balance"
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _audit_balance(account):
+    from ..audit import create_audit
+    from ..signals import account_audit_data
+
+    create_audit(
+        user_id=account.user_id,
+        table_name="accounts",
+        record_id=account.id,
+        action="UPDATE",
+        new_data=account_audit_data(account),
+    )
+
+
+def _snapshot(accounts, dated=None):
+    """
+    Closing balance-ka maanta (reports / net worth). `dated` is
+    {(account_id, date): delta} for changes that belong to an earlier day.
+    """
+    if dated:
+        owners = {a.pk: a.user_id for a in accounts}
+        reports.shift_balances(
+            [(account_id, owners[account_id], day, delta) for (account_id, day), delta in dated.items()]
+        )
+    reports.record_balances([(a.pk, a.user_id, a.balance) for a in accounts])
+
+
+def credit(account, amount, on_date=None):
+    """Add `amount`; `on_date` is the transaction date when it is not today."""
+    amount = Decimal(amount)
+    new_balance = _update_balance(account.pk, amount)
+    if new_balance is None:
+        raise Account.DoesNotExist(f"Account {account.pk} does not exist.")
+    account.balance = new_balance
+    _audit_balance(account)
+    _snapshot([account], {(account.pk, on_date): amount} if on_date else None)
+    return account.balance
+
+
+def debit(account, amount, message="Insufficient funds.", on_date=None):
+    amount = Decimal(amount)
+    new_balance = _update_balance(account.pk, -amount, require_funds=True)
+    if new_balance is None:
+        current = Account.objects.filter(pk=account.pk).values_list("balance", flat=True).first()
+        if current is None:
+            raise Account.DoesNotExist(f"Account {account.pk} does not exist.")
+        raise InsufficientFunds(message, balance=current)
+    account.balance = new_balance
+    _audit_balance(account)
+    _snapshot([account], {(account.pk, on_date): -amount} if on_date else None)
+    return account.balance
+
+
+def post_transaction(account, tx_type, amount, target_account=None, on_date=None):
+    """
+    Apply the balance effect of an Income/Expense/Transfer dated `on_date`.
+    Runs in its own atomic block so a failed transfer leg rolls back the other.
+    """
+    with dbtx.atomic():
+        if tx_type == TransactionType.INCOME:
+            credit(account, amount, on_date=on_date)
+
+        elif tx_type == TransactionType.EXPENSE:
+            debit(account, amount, "Insufficient funds for expense.", on_date=on_date)
+
+        elif tx_type == TransactionType.TRANSFER:
+            if not target_account:
+                raise ValidationError("Target account waa in la doortaa.")
+            lock_accounts([account.pk, target_account.pk])
+            debit(account, amount, "Insufficient funds for transfer.", on_date=on_date)
+            credit(target_account, amount, on_date=on_date)
+
+
+def _legs(account, tx_type, amount, target_account=None, on_date=None):
+    """[(account, signed amount, on_date), ...]: the balance effect of one transaction."""
+    amount = Decimal(amount)
+    if tx_type == TransactionType.INCOME:
+        return [(account, amount, on_date)]
+    if tx_type == TransactionType.TRANSFER:
+        return [(account, -amount, on_date), (target_account, amount, on_date)]
+    return [(account, -amount, on_date)]
+
+
+def repost_transaction(old, new):
+    """
+    Move the balance effect of an edited transaction: reverse `old` and apply
+    `new`, both (account, tx_type, amount, target_account, on_date), in one
+    atomic block. Credits run before debits, so only a real net shortfall
+    raises InsufficientFunds.
+    """
+    if new[1] == TransactionType.TRANSFER and not new[3]:
+        raise ValidationError("Target account waa in la doortaa.")
+    legs = [(account, -amount, on_date) for account, amount, on_date in _legs(*old)] + _legs(*new)
+    message = f"Insufficient funds for {new[1].lower()}."
+    with dbtx.atomic():
+        lock_accounts([account.pk for account, _, _ in legs])
+        for account, amount, on_date in sorted(legs, key=lambda leg: leg[1] < 0):
+            if amount > 0:
+                credit(account, amount, on_date=on_date)
+            elif amount < 0:
+                debit(account, -amount, message, on_date=on_date)
+
+
+def apply_balance_deltas(deltas, dated=None):
+    """
+    Apply {account_id: net_delta} for many accounts with one UPDATE ... CASE,
+    after locking them in primary-key order. Used by bulk imports, which check
+    funds themselves against `locked_balances`; `dated` splits the same deltas
+    by {(account_id, transaction_date): delta} for the snapshots. Returns the
+    refreshed accounts.
+    """
+    deltas = {pk: Decimal(d) for pk, d in deltas.items() if d}
+    if not deltas:
+        return []
+    with dbtx.atomic():
+        lock_accounts(deltas.keys())
+        amount_field = DecimalField(max_digits=15, decimal_places=2)
+        Account.objects.filter(pk__in=deltas.keys()).update(
+            balance=F("balance") + Case(
+                *[When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()],
+                default=Value(Decimal("0")),
+                output_field=amount_field,
+            )
+        )
+        accounts = list(Account.objects.filter(pk__in=deltas.keys()))
+        _snapshot(accounts, dated)
+        return accounts
@@ -0,0 +1,71 @@
+# core/services/budget_service.py
+from decimal import Decimal
+
+from django.db.models import DecimalField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from ..models import Budget, SpendLedger
+
+
+def get_spend_by_category(user, year, month, category_ids=None):
+    """
+    Return {category_id: total_spent} for a user's expenses in one month.
+    Hal query oo SpendLedger ah ayaa lagu helayaa dhammaan budgets-ka.
+    """
+    qs = SpendLedger.objects.filter(user=user, year=year, month=month)
+    if category_ids is not None:
+        qs = qs.filter(category_id__in=category_ids)
+    return dict(qs.values_list("category_id", "amount"))
+
+
+def with_spent_totals(queryset):
+    """
+    Annotate a Budget queryset with `spent_total` read from the matching
+    SpendLedger row, so list serializers do not run an aggregate per budget.
+    """
+    spent = SpendLedger.objects.filter(
+        user=OuterRef("user"),
+        category=OuterRef("category"),
+        year=OuterRef("year"),
+        month=OuterRef("month"),
+    ).values("amount")[:1]
+    amount_field = DecimalField(max_digits=15, decimal_places=2)
+    return queryset.annotate(
+        spent_total=Coalesce(
+            Subquery(spent, output_field=amount_field),
+            Value(Decimal("0")),
+            output_field=amount_field,
+        )
+    )
+
+
+def get_budget_summary(user, year, month):
+    """
+    Build the budget summary rows for a month.
+    Uses a constant number of queries: budgets (with category) + one ledger lookup.
+    """
+    budgets = list(
+        Budget.objects.filter(user=user, month=month, year=year)
+        .select_related("category")
+        .order_by("category__name")
+    )
+    spent_map = get_spend_by_category(user, year, month, [b.category_id for b in budgets])
+
+    summary = []
+    for budget in budgets:
+        spent = spent_map.get(budget.category_id, Decimal("0"))
+        remaining = budget.amount - spent
+        summary.append({
+            "id": str(budget.id),
+            "category_id": budget.category_id,
+            "category_name": budget.category.name,
+            "budget_amount": float(budget.amount),
+            "total_spent": float(spent),
+            "total_remaining": float(remaining),
+            "currency": budget.currency_id,
+            "rollover_enabled": budget.rollover_enabled,
+            "is_complete": remaining <= 0,
+            "month": budget.month,
+            "year": budget.year,
+        })
+    return summary
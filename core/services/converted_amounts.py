@@ -0,0 +1,80 @@
+# core/services/converted_amounts.py
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from ..models import Transaction
+from . import exchange_rates, spend_tree
+
+CENT = Decimal("0.01")
+STAMP_FIELDS = ["converted_amount", "converted_currency"]
+
+
+def stamp_transactions(transactions, preferred=None):
+    """
+    Set converted_amount / converted_currency on (unsaved or loaded) transactions:
+    the amount in the owner's preferred currency, using the rate graph of the
+    transaction date. Rows without a resolvable rate are left unconverted (None)
+    so a later restamp can fill them. Returns the transactions whose values changed.
+
+    `preferred` is an optional {user_id: currency_code} map (avoids a query).
+    """
+    transactions = list(transactions)
+    if not transactions:
+        return []
+    if preferred is None:
+        preferred = dict(
+            get_user_model().objects.filter(id__in={tx.user_id for tx in transactions})
+            .values_list("id", "preferred_currency_id")
+        )
+    graphs = exchange_rates.get_graphs({tx.transaction_date for tx in transactions})
+
+    changed = []
+    for tx in transactions:
+        target = preferred.get(tx.user_id)
+        amount, currency = None, None
+        if target and tx.currency_id == target:
+            amount, currency = tx.amount, target
+        elif target:
+            quote = graphs[tx.transaction_date].resolve(tx.currency_id, target)
+            if quote:
+                amount = (Decimal(tx.amount) * quote.rate).quantize(CENT, rounding=ROUND_HALF_UP)
+                currency = target
+
+        if (tx.converted_amount, tx.converted_currency_id) != (amount, currency):
+            tx.converted_amount, tx.converted_currency_id = amount, currency
+            changed.append(tx)
+    return changed
+
+
+def restamp(user_id=None, since=None, only_missing=False, chunk_size=None):
+    """
+    Recompute converted amounts in id-ordered chunks, writing only the rows that
+    changed with bulk_update. Run after a preferred-currency change or when
+    exchange rates arrive late. Returns (rows scanned, rows updated).
+    """
+    chunk_size = chunk_size or settings.CONVERSION_RESTAMP_CHUNK_SIZE
+    qs = Transaction.objects.all()
+    if user_id:
+        qs = qs.filter(user_id=user_id)
+    if since:
+        qs = qs.filter(transaction_date__gte=since)
+    if only_missing:
+        qs = qs.filter(converted_amount__isnull=True)
+    qs = qs.only("id", "user_id", "amount", "currency_id", "transaction_date", *STAMP_FIELDS).order_by("id")
+
+    last_id, scanned, updated = None, 0, 0
+    while True:
+        chunk_qs = qs.filter(id__gt=last_id) if last_id else qs
+        chunk = list(chunk_qs[:chunk_size])
+        if not chunk:
+            break
+        changed = stamp_transactions(chunk)
+        if changed:
+            Transaction.objects.bulk_update(changed, STAMP_FIELDS, batch_size=chunk_size)
+            spend_tree.invalidate({tx.user_id for tx in changed})
+        scanned += len(chunk)
+        updated += len(changed)
+        last_id = chunk[-1].id
+    return scanned, updated
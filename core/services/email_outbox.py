@@ -0,0 +1,207 @@
+# core/services/email_outbox.py
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import transaction as dbtx
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import EmailOutbox, EmailStatus, Notification
+from .email_service import build_notification_email, build_notification_emails
+
+logger = logging.getLogger(__name__)
+
+# Outbox: notifications-ka iyo emails-kooda isku DB transaction ayey ku qormaan.
+# drain() (queue-ga "emails") wuxuu qaataa batch (SKIP LOCKED), hal SMTP connection
+# ayuu u furaa batch-ka oo dhan, kuwa fashilmayna backoff ayuu ku celiyaa.
+UPDATE_FIELDS = ["status", "attempts", "next_attempt_at", "locked_at", "last_error", "sent_at"]
+
+
+# ---------------- Enqueue ----------------
+def _kick():
+    from ..tasks import drain_email_outbox_task
+
+    try:
+        drain_email_outbox_task.delay()
+    except Exception as e:
+        # Beat-ka ayaa daqiiqad kasta drain sameeya
+        logger.warning("Could not queue email drain: %s", e)
+
+
+def enqueue(rows):
+    """Insert unsaved EmailOutbox rows and start a drain once the DB transaction commits."""
+    if rows:
+        EmailOutbox.objects.bulk_create(rows, batch_size=500)
+        dbtx.on_commit(_kick)
+    return rows
+
+
+def enqueue_email(user, subject, message, notification_id=None, email_type="general", extra_data=None):
+    return enqueue([EmailOutbox(
+        user=user,
+        subject=subject[:255],
+        message=message,
+        email_type=email_type,
+        extra_data=extra_data,
+        notification_id=notification_id,
+    )])[0]
+
+
+def enqueue_notification_emails(notifications, subjects, email_type="general"):
+    return enqueue([
+        EmailOutbox(
+            user_id=notification.user_id,
+            subject=subjects[notification.id][:255],
+            message=notification.message,
+            email_type=email_type,
+            notification_id=notification.id,
+        )
+        for notification in notifications
+    ])
+
+
+# ---------------- Delivery ----------------
+def backoff(attempts):
+    """Seconds before the next try after `attempts` failures (exponential, capped)."""
+    return min(settings.EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1), settings.EMAIL_RETRY_MAX_SECONDS)
+
+
+def claim_batch(batch_size):
+    """
+    Lock up to `batch_size` due rows (SKIP LOCKED, so drains can run in
+    parallel) and mark them Sending. Rows stuck in Sending after a worker
+    crash are picked up again once EMAIL_SENDING_TIMEOUT has passed.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.EMAIL_SENDING_TIMEOUT)
+    with dbtx.atomic():
+        ids = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=EmailStatus.PENDING, next_attempt_at__lte=now)
+                | Q(status=EmailStatus.SENDING, locked_at__lt=stale)
+            )
+            .order_by("next_attempt_at")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            return []
+        EmailOutbox.objects.filter(id__in=ids).update(status=EmailStatus.SENDING, locked_at=now)
+    return list(EmailOutbox.objects.filter(id__in=ids).select_related("user").order_by("next_attempt_at"))
+
+
+def _failed(row, error, now):
+    row.attempts += 1
+    row.last_error = str(error)[:1000]
+    if row.attempts >= settings.EMAIL_MAX_ATTEMPTS:
+        row.status = EmailStatus.FAILED
+    else:
+        row.status = EmailStatus.PENDING
+        row.next_attempt_at = now + timedelta(seconds=backoff(row.attempts))
+
+
+def _item(row):
+    return {
+        "user": row.user,
+        "subject": row.subject,
+        "message": row.message,
+        "notification_id": row.notification_id,
+        "email_type": row.email_type,
+        "extra_data": row.extra_data,
+    }
+
+
+def send_batch(rows):
+    """Send claimed rows over one backend connection and record each outcome. Returns metrics."""
+    started = time.monotonic()
+    now = timezone.now()
+    sent_notifications = []
+
+    connection = get_connection()
+    connected = True
+    try:
+        connection.open()
+    except Exception as e:
+        logger.error("Email backend unavailable: %s", e)
+        connected = False
+        for row in rows:
+            _failed(row, e, now)
+    else:
+        try:
+            deliverable = []
+            for row in rows:
+                if row.user.email:
+                    deliverable.append(row)
+                else:
+                    # Dib isku dayid waxba ma beddesho
+                    row.status, row.last_error = EmailStatus.FAILED, "user has no email address"
+
+            # Batch-ka oo dhan hal mar ayaa la render gareeyaa; haddii uu fashilo, row-row
+            try:
+                messages = build_notification_emails([_item(row) for row in deliverable], connection)
+            except Exception as e:
+                logger.warning("Batch render failed, rendering one by one: %s", e)
+                messages = [None] * len(deliverable)
+
+            for row, message in zip(deliverable, messages):
+                try:
+                    if message is None:
+                        message = build_notification_email(connection=connection, **_item(row))
+                    if not connection.send_messages([message]):
+                        raise RuntimeError("email backend did not accept the message")
+                except Exception as e:
+                    _failed(row, e, now)
+                    continue
+                row.attempts += 1
+                row.status, row.sent_at, row.last_error = EmailStatus.SENT, now, ""
+                if row.notification_id:
+                    sent_notifications.append(row.notification_id)
+        finally:
+            connection.close()
+
+    for row in rows:
+        row.locked_at = None
+    EmailOutbox.objects.bulk_update(rows, UPDATE_FIELDS, batch_size=500)
+    if sent_notifications:
+        # sent_at waa marka notification-ka la abuuray (cursor / dedupe) - lama beddelo
+        Notification.objects.filter(id__in=sent_notifications).update(email_sent=True)
+
+    stats = {
+        "connected": connected,
+        "claimed": len(rows),
+        "sent": sum(1 for row in rows if row.status == EmailStatus.SENT),
+        "retried": sum(1 for row in rows if row.status == EmailStatus.PENDING),
+        "failed": sum(1 for row in rows if row.status == EmailStatus.FAILED),
+        "seconds": round(time.monotonic() - started, 3),
+    }
+    logger.info(
+        "Email batch: %d/%d sent, %d retrying, %d failed in %ss",
+        stats["sent"], stats["claimed"], stats["retried"], stats["failed"], stats["seconds"],
+    )
+    return stats
+
+
+def drain(batch_size=None, max_batches=None):
+    """
+    Deliver due emails batch by batch. Stops when the outbox is empty, after
+    `max_batches`, or when the mail server is down (no connection, or every row
+    in the batch went back to retry) - backoff waits. Rows that failed for good
+    (e.g. no email address) do not stop the drain.
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    max_batches = max_batches or settings.EMAIL_OUTBOX_MAX_BATCHES
+    totals = {"batches": 0, "claimed": 0, "sent": 0, "retried": 0, "failed": 0}
+    for _ in range(max_batches):
+        rows = claim_batch(batch_size)
+        if not rows:
+            break
+        stats = send_batch(rows)
+        totals["batches"] += 1
+        for key in ("claimed", "sent", "retried", "failed"):
+            totals[key] += stats[key]
+        if not stats["connected"] or stats["retried"] == stats["claimed"]:
+            break
+    return totals
@@ -0,0 +1,75 @@
+# core/services/email_rendering.py
+import threading
+
+from django.template import TemplateDoesNotExist
+from django.template.loader import get_template
+from django.utils.html import strip_tags
+
+# Template kasta hal mar ayaa la load gareeyaa (get_template) oo process-ka ayaa hayn:
+# message kasta wuxuu si toos ah u render gareeyaa Template-kii la cache gareeyay (API public ah,
+# Django internals ma taabanno). Plain-text-ka waxaa laga sameeyaa .txt template
+# ({% autoescape off %}); haddii uusan jirin, HTML-ka ayaa strip_tags la mariyaa.
+HTML_TEMPLATES = {
+    "general": "emails/notification.html",
+    "budget": "emails/budget_notification.html",
+    "transaction": "emails/transaction_notification.html",
+    "bill": "emails/recurring_notification.html",
+    "recurring": "emails/recurring_notification.html",
+    "verify_email": "emails/verify_email.html",
+    "digest": "emails/digest.html",
+}
+DEFAULT_TEMPLATE = HTML_TEMPLATES["general"]
+
+_compiled = {}
+_lock = threading.Lock()
+
+
+class UnknownEmailType(ValueError):
+    """An email_type with no template in HTML_TEMPLATES."""
+
+
+class CompiledEmail:
+    """The cached HTML template plus its text alternative (a .txt template, or the HTML stripped)."""
+
+    def __init__(self, html_name):
+        self.html = get_template(html_name)
+        try:
+            self.text = get_template(html_name[:-len(".html")] + ".txt")
+        except TemplateDoesNotExist:
+            self.text = None
+
+    def render(self, values):
+        html = self.html.render(values)
+        text = self.text.render(values) if self.text is not None else strip_tags(html)
+        return text, html
+
+
+def compiled(email_type):
+    """CompiledEmail for an email_type, built on first use and kept for the process lifetime."""
+    try:
+        name = HTML_TEMPLATES[email_type]
+    except KeyError:
+        raise UnknownEmailType(f"email_type '{email_type}' ma laha template (HTML_TEMPLATES).") from None
+    email = _compiled.get(name)
+    if email is None:
+        with _lock:
+            email = _compiled.get(name) or CompiledEmail(name)
+            _compiled[name] = email
+    return email
+
+
+def render(email_type, values):
+    """Return (text, html) for one message."""
+    return compiled(email_type).render(values)
+
+
+def render_many(email_type, contexts):
+    """Return [(text, html), ...] for many messages of one email_type."""
+    email = compiled(email_type)
+    return [email.render(values) for values in contexts]
+
+
+def clear():
+    """Forget compiled templates (after editing templates in development)."""
+    with _lock:
+        _compiled.clear()
@@ -1,64 +1,89 @@
 # core/services/email_service.py
 from django.conf import settings
 from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
-from django.utils import timezone
+
+from . import email_rendering
+
 FRONTEND_URL = "https://pr-finance.up.railway.app"
 
+# Context-ka aan isbeddelin (hal mar)
+STATIC_CONTEXT = {
+    'unsubscribe_url': f"{FRONTEND_URL}/settings/notifications",
+    'settings_url': f"{FRONTEND_URL}/settings",
+    'support_url': f"{FRONTEND_URL}/support",
+}
+
+
+def notification_context(user, subject, message, notification_id=None, extra_data=None):
+    """Template values for one notification email"""
+    context = {
+        **STATIC_CONTEXT,
+        'subject': subject,
+        'message': message,
+        'action_url': f"https://pr-finance.up.railway.app/notifications/{notification_id}" if notification_id else f"{settings.FRONTEND_URL}/notifications",
+        'user_name': user.get_full_name() or user.username,
+    }
+    # Add extra data if provided
+    if extra_data:
+        context.update(extra_data)
+    return context
+
+
+def _message(user, subject, text_content, html_content, connection=None):
+    email = EmailMultiAlternatives(
+        subject=f"Finance App: {subject}",
+        body=text_content,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[user.email],
+        connection=connection,
+    )
+    email.attach_alternative(html_content, "text/html")
+    return email
+
+
+def build_notification_email(user, subject, message, notification_id=None, email_type="general", extra_data=None, connection=None):
+    """Render the notification template and return an unsent EmailMultiAlternatives"""
+    context = notification_context(user, subject, message, notification_id, extra_data)
+    text_content, html_content = email_rendering.render(email_type, context)
+    return _message(user, subject, text_content, html_content, connection)
+
+
+def build_notification_emails(items, connection=None):
+    """
+    Batch version: items are dicts with user, subject, message and optional
+    notification_id / email_type / extra_data. Each email_type's template is
+    looked up once; returns the messages in input order.
+    """
+    by_type = {}
+    for index, item in enumerate(items):
+        by_type.setdefault(item.get("email_type") or "general", []).append(index)
+
+    messages = [None] * len(items)
+    for email_type, indexes in by_type.items():
+        contexts = [
+            notification_context(
+                items[i]["user"], items[i]["subject"], items[i]["message"],
+                items[i].get("notification_id"), items[i].get("extra_data"),
+            )
+            for i in indexes
+        ]
+        for i, (text_content, html_content) in zip(indexes, email_rendering.render_many(email_type, contexts)):
+            messages[i] = _message(items[i]["user"], items[i]["subject"], text_content, html_content, connection)
+    return messages
+
 
 def send_notification_email(user, subject, message, notification_id=None, email_type="general", extra_data=None):
     """Send an email notification to a user with improved template support"""
     try:
-        # Prepare base context
-        context = {
-            'subject': subject,
-            'message': message,
-            'action_url': f"https://pr-finance.up.railway.app/notifications/{notification_id}" if notification_id else f"{settings.FRONTEND_URL}/notifications",
-            'unsubscribe_url': f"{FRONTEND_URL}/settings/notifications",
-            'settings_url': f"{FRONTEND_URL}/settings",
-            'support_url': f"{FRONTEND_URL}/support",
-            'user_name': user.get_full_name() or user.username,
-        }
-        
-        # Add extra data if provided
-        if extra_data:
-            context.update(extra_data)
-        
-        # Choose template based on email type
-        template_name = 'emails/notification.html'
-        if email_type == "budget":
-            template_name = 'emails/budget_notification.html'
-        elif email_type == "transaction":
-            template_name = 'emails/transaction_notification.html'
-        elif email_type == "bill":
-            template_name = 'emails/recurring_notification.html'
-        
-        # Render email content
-        html_content = render_to_string(template_name, context)
-        text_content = strip_tags(html_content)
-        
         # Create and send email
-        email = EmailMultiAlternatives(
-            subject=f"Finance App: {subject}",
-            body=text_content,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[user.email]
-        )
-        email.attach_alternative(html_content, "text/html")
-        
+        email = build_notification_email(user, subject, message, notification_id, email_type, extra_data)
         result = email.send()
         print(f"📧 Email sent to {user.email}. Result: {result}")
         
         # Update notification if ID provided
         if notification_id:
             from ..models import Notification
-            try:
-                notification = Notification.objects.get(id=notification_id)
-                notification.email_sent = True
-                notification.sent_at = timezone.now()
-                notification.save(update_fields=["email_sent", "sent_at"])
-            except Notification.DoesNotExist:
+            if not Notification.objects.filter(id=notification_id).update(email_sent=True):
                 print(f"⚠️ Notification with ID {notification_id} not found")
         
         return True
@@ -0,0 +1,246 @@
+# core/services/exchange_rates.py
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import date as dt_date
+from decimal import ROUND_HALF_UP, Decimal
+
+from cachetools import TTLCache
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from ..models import ExchangeRate
+
+logger = logging.getLogger(__name__)
+
+# Laba lakab: (1) cachetools LRU+TTL gudaha process-ka, (2) Redis (Django cache, broker-ka Celery).
+# Waxa la cache gareeyo waa rate graph-ka taariikh kasta (hal query oo DISTINCT ON ah).
+# Redis keys-ku waxay leeyihiin version; invalidate() version-ka ayuu kordhiyaa.
+# Processes kale local cache-kooda waxay ku cusbooneysiiyaan EXCHANGE_RATE_LOCAL_TTL gudihiis.
+VERSION_KEY = "fx:version"
+ONE = Decimal("1")
+CENT = Decimal("0.01")
+
+_local = TTLCache(maxsize=settings.EXCHANGE_RATE_LOCAL_CACHE_SIZE, ttl=settings.EXCHANGE_RATE_LOCAL_TTL)
+_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class Quote:
+    rate: Decimal
+    as_of: dt_date  # taariikhda rate-ka ugu duugsan ee la isticmaalay
+    path: tuple     # tusaale ("EUR", "USD", "SOS")
+
+
+class RateGraph:
+    """
+    Latest known rate for every pair on or before one date, with inverse
+    edges added, so direct / inverse / one-hop lookups are dict reads.
+    """
+
+    def __init__(self, rows):
+        self.edges = {}
+        for base, target, rate, rate_date in rows:
+            rate = Decimal(rate)
+            if not rate:
+                continue
+            self.edges[(base, target)] = (rate, rate_date)
+        # Inverse edges: haddii dhanka kale rate toos ah aan loo haysan, ama kii jiray uu ka duugsan yahay
+        for (base, target), (rate, rate_date) in list(self.edges.items()):
+            inverse = self.edges.get((target, base))
+            if inverse is None or inverse[1] < rate_date:
+                self.edges[(target, base)] = (ONE / rate, rate_date)
+
+        self.outgoing, self.incoming = {}, {}
+        for base, target in self.edges:
+            self.outgoing.setdefault(base, set()).add(target)
+            self.incoming.setdefault(target, set()).add(base)
+
+    def resolve(self, base, target):
+        if base == target:
+            return Quote(ONE, None, (base,))
+
+        edge = self.edges.get((base, target))
+        if edge:
+            return Quote(edge[0], edge[1], (base, target))
+
+        # One hop: pivot-ka (USD) marka hore, kadibna currency kasta oo labadaba ku xiran
+        candidates = self.outgoing.get(base, set()) & self.incoming.get(target, set())
+        if not candidates:
+            return None
+        pivot = settings.EXCHANGE_RATE_PIVOT
+        via = pivot if pivot in candidates else sorted(candidates)[0]
+        first, second = self.edges[(base, via)], self.edges[(via, target)]
+        return Quote(first[0] * second[0], min(first[1], second[1]), (base, via, target))
+
+
+# ---------------- Cache plumbing ----------------
+def _cache_call(method, *args, default=None):
+    """Redis haddii uu dhacay, cache-la'aan ku shaqee (DB ayaa la weydiinayaa)."""
+    try:
+        return getattr(cache, method)(*args)
+    except Exception as e:
+        logger.warning("Exchange rate cache unavailable: %s", e)
+        return default
+
+
+def _version():
+    return _cache_call("get", VERSION_KEY, default=None) or 1
+
+
+def _load_rows(on_date):
+    """Latest rate on or before `on_date` per (base, target): one DISTINCT ON query."""
+    return [
+        (base, target, str(rate), rate_date)
+        for base, target, rate, rate_date in (
+            ExchangeRate.objects.filter(date__lte=on_date)
+            .order_by("base_currency_id", "target_currency_id", "-date")
+            .distinct("base_currency_id", "target_currency_id")
+            .values_list("base_currency_id", "target_currency_id", "rate", "date")
+        )
+    ]
+
+
+def _load_rows_many(dates):
+    """
+    Same as _load_rows for several dates with a single query: read every rate up
+    to the latest date once (ascending) and snapshot the latest-per-pair at each date.
+    """
+    dates = sorted(dates)
+    rows = (
+        ExchangeRate.objects.filter(date__lte=dates[-1])
+        .order_by("date")
+        .values_list("base_currency_id", "target_currency_id", "rate", "date")
+        .iterator(chunk_size=2000)
+    )
+    latest, result, pending = {}, {}, iter(dates)
+    current = next(pending)
+    for base, target, rate, rate_date in rows:
+        while rate_date > current:
+            result[current] = list(latest.values())
+            current = next(pending)
+        latest[(base, target)] = (base, target, str(rate), rate_date)
+    result[current] = list(latest.values())
+    for remaining in pending:
+        result[remaining] = list(latest.values())
+    return result
+
+
+def _graph_key(version, on_date):
+    return f"fx:{version}:graph:{on_date.isoformat()}"
+
+
+def get_graphs(dates):
+    """
+    {date: RateGraph} for many dates: process memory, then one Redis get_many,
+    then one database query for whatever is still missing.
+    """
+    graphs, missing = {}, []
+    with _lock:
+        for on_date in set(dates):
+            graph = _local.get(on_date)
+            if graph is None:
+                missing.append(on_date)
+            else:
+                graphs[on_date] = graph
+    if not missing:
+        return graphs
+
+    version = _version()
+    keys = {_graph_key(version, on_date): on_date for on_date in missing}
+    cached = _cache_call("get_many", list(keys), default={}) or {}
+    rows_by_date = {keys[key]: rows for key, rows in cached.items()}
+
+    to_load = [on_date for on_date in missing if on_date not in rows_by_date]
+    if to_load:
+        loaded = _load_rows_many(to_load)
+        rows_by_date.update(loaded)
+        _cache_call(
+            "set_many",
+            {_graph_key(version, on_date): rows for on_date, rows in loaded.items()},
+            settings.EXCHANGE_RATE_CACHE_TIMEOUT,
+        )
+
+    with _lock:
+        for on_date, rows in rows_by_date.items():
+            graphs[on_date] = _local[on_date] = RateGraph(rows)
+    return graphs
+
+
+def get_graph(on_date=None):
+    """RateGraph for `on_date` (default today): process memory -> Redis -> database."""
+    on_date = on_date or timezone.now().date()
+    with _lock:
+        graph = _local.get(on_date)
+    if graph is not None:
+        return graph
+
+    redis_key = _graph_key(_version(), on_date)
+    rows = _cache_call("get", redis_key)
+    if rows is None:
+        rows = _load_rows(on_date)
+        _cache_call("set", redis_key, rows, settings.EXCHANGE_RATE_CACHE_TIMEOUT)
+
+    graph = RateGraph(rows)
+    with _lock:
+        _local[on_date] = graph
+    return graph
+
+
+# ---------------- Public API ----------------
+def quote(base, target, on_date=None):
+    """Quote for base -> target (direct, inverse or via one currency), or None."""
+    return get_graph(on_date).resolve(base.upper(), target.upper())
+
+
+def get_rate(base, target, on_date=None):
+    """Rate for base -> target as a Decimal, or None if it cannot be resolved."""
+    result = quote(base, target, on_date)
+    return result.rate if result else None
+
+
+def convert_many(items):
+    """
+    Convert [{"amount": Decimal, "from_currency", "to_currency", "date"?}, ...]
+    with Decimal arithmetic, loading each distinct date's graph once.
+    Returns one result dict per item (with "error" when no rate is found).
+    """
+    today = timezone.now().date()
+    graphs = get_graphs(item.get("date") or today for item in items)
+
+    results = []
+    for item in items:
+        base, target = item["from_currency"].upper(), item["to_currency"].upper()
+        on_date = item.get("date") or today
+        found = graphs[on_date].resolve(base, target)
+        result = {
+            "amount": item["amount"],
+            "from_currency": base,
+            "to_currency": target,
+            "date": on_date,
+        }
+        if found is None:
+            result["error"] = f"No exchange rate found for {base} to {target}"
+        else:
+            result.update({
+                "converted_amount": (item["amount"] * found.rate).quantize(CENT, rounding=ROUND_HALF_UP),
+                "rate": found.rate,
+                "rate_date": found.as_of or on_date,
+                "path": list(found.path),
+            })
+        results.append(result)
+    return results
+
+
+def invalidate():
+    """Call when exchange rates change (signal on ExchangeRate, fetch tasks)."""
+    with _lock:
+        _local.clear()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # Key-gu ma jiro weli (version 1 waa default-ka)
+        _cache_call("set", VERSION_KEY, 2, None)
+    except Exception as e:
+        logger.warning("Exchange rate cache unavailable: %s", e)
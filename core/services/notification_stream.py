@@ -0,0 +1,235 @@
+# core/services/notification_stream.py
+import asyncio
+import json
+import logging
+import uuid
+import weakref
+from contextlib import asynccontextmanager
+
+import redis
+import redis.asyncio as aioredis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections, transaction as dbtx
+from django.db.models import Q
+
+from ..models import Notification
+
+logger = logging.getLogger(__name__)
+
+# Real-time notifications (SSE): notification kasta oo cusub on_commit ayaa lagu publish
+# gareeyaa channel-ka user-ka (notifications:stream:{user}). Process kasta hal Redis
+# pub/sub connection ayuu leeyahay (Hub) oo u qaybiya clients-ka ku xiran process-kaas.
+# Client-ka dib u xirma wuxuu Last-Event-ID ku helaa wixii uu seegay (DB replay, created_at
+# ayuu ku xiran yahay - sent_at waa la beddeli karaa).
+
+
+def channel(user_id):
+    return f"notifications:stream:{user_id}"
+
+
+def payload(notification):
+    from ..serializers import NotificationSerializer
+
+    return NotificationSerializer(notification).data
+
+
+def format_event(event_id, data):
+    return f"id: {event_id}\nevent: notification\ndata: {data}\n\n"
+
+
+# ---------------- Publish ----------------
+_client = None
+
+
+def _redis():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.NOTIFICATION_STREAM_REDIS_URL)
+    return _client
+
+
+def _send(messages):
+    try:
+        pipe = _redis().pipeline(transaction=False)
+        for name, data in messages:
+            pipe.publish(name, data)
+        pipe.execute()
+    except Exception as e:
+        # Client-yadu Last-Event-ID replay ayey ku helayaan marka ay dib u xirmaan
+        logger.warning("Notification stream publish failed: %s", e)
+
+
+def publish(notifications):
+    """Push new notifications to the users' open streams once the DB transaction commits."""
+    messages = [(channel(n.user_id), json.dumps(payload(n))) for n in notifications]
+    if messages:
+        dbtx.on_commit(lambda: _send(messages))
+
+
+# ---------------- Subscribe ----------------
+class Listener:
+    """One open stream: a bounded queue, closed if the client cannot keep up."""
+
+    def __init__(self):
+        self.queue = asyncio.Queue(maxsize=settings.NOTIFICATION_STREAM_QUEUE_SIZE)
+        self.overflowed = False
+
+    def push(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Stream-ka waa la xiraa; client-ku Last-Event-ID ayuu ku soo laabanayaa
+            self.overflowed = True
+
+
+class Hub:
+    """One Redis pub/sub connection per event loop, fanned out to every local listener."""
+
+    def __init__(self):
+        self.listeners = {}
+        self.lock = asyncio.Lock()
+        self.db_slots = asyncio.Semaphore(settings.NOTIFICATION_STREAM_DB_CONCURRENCY)
+        self.pubsub = None
+        self.reader = None
+
+    async def _connect(self):
+        if self.pubsub is not None:
+            try:
+                await self.pubsub.aclose()
+            except Exception:
+                pass
+        client = aioredis.Redis.from_url(settings.NOTIFICATION_STREAM_REDIS_URL)
+        self.pubsub = client.pubsub(ignore_subscribe_messages=True)
+        if self.listeners:
+            await self.pubsub.subscribe(*self.listeners)
+
+    async def _read(self):
+        while True:
+            if self.pubsub.connection is None:
+                # Weli channel lama subscribe gareyn (reconnect kadib)
+                await asyncio.sleep(1)
+                continue
+            try:
+                message = await self.pubsub.get_message(timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Notification stream Redis error, reconnecting: %s", e)
+                await asyncio.sleep(1)
+                async with self.lock:
+                    await self._connect()
+                continue
+            if message is None:
+                continue
+            listeners = self.listeners.get(message["channel"].decode())
+            if not listeners:
+                continue
+            data = message["data"].decode()
+            event = (json.loads(data)["id"], data)
+            for listener in list(listeners):
+                listener.push(event)
+
+    async def subscribe(self, user_id):
+        listener = Listener()
+        name = channel(user_id)
+        async with self.lock:
+            if self.pubsub is None:
+                await self._connect()
+            if name not in self.listeners:
+                self.listeners[name] = set()
+                await self.pubsub.subscribe(name)
+            self.listeners[name].add(listener)
+            if self.reader is None:
+                self.reader = asyncio.create_task(self._read())
+        return listener
+
+    async def unsubscribe(self, user_id, listener):
+        name = channel(user_id)
+        async with self.lock:
+            listeners = self.listeners.get(name)
+            if listeners is None:
+                return
+            listeners.discard(listener)
+            if not listeners:
+                del self.listeners[name]
+                try:
+                    await self.pubsub.unsubscribe(name)
+                except Exception as e:
+                    logger.warning("Notification stream unsubscribe failed: %s", e)
+
+
+_hubs = weakref.WeakKeyDictionary()
+
+
+def get_hub():
+    """The Hub of the running event loop (uvicorn: one per worker process)."""
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None:
+        hub = _hubs[loop] = Hub()
+    return hub
+
+
+# ---------------- Stream ----------------
+@asynccontextmanager
+async def db_access():
+    """
+    DB work of one stream (auth lookup, replay): at most NOTIFICATION_STREAM_DB_CONCURRENCY
+    at a time per process, and the request's connection is closed afterwards. An idle
+    stream holds no Postgres connection, and a reconnect storm cannot exhaust them.
+    """
+    async with get_hub().db_slots:
+        try:
+            yield
+        finally:
+            await sync_to_async(connections.close_all)()
+
+
+async def replay(user_id, last_event_id):
+    """Notifications created after last_event_id, oldest first (capped), as SSE events."""
+    try:
+        last_id = uuid.UUID(str(last_event_id))
+    except ValueError:
+        return []
+    anchor = await (
+        Notification.objects.filter(user_id=user_id, id=last_id)
+        .values_list("created_at", flat=True).afirst()
+    )
+    if anchor is None:
+        return []
+    rows = (
+        Notification.objects.filter(user_id=user_id)
+        .filter(Q(created_at__gt=anchor) | Q(created_at=anchor, id__gt=last_id))
+        .order_by("created_at", "id")[:settings.NOTIFICATION_STREAM_REPLAY_LIMIT]
+    )
+    return [(str(n.id), json.dumps(payload(n))) async for n in rows]
+
+
+async def events(user_id, last_event_id=None):
+    """SSE body: retry hint, missed events, then live events with heartbeats."""
+    hub = get_hub()
+    # Subscribe marka hore, replay kadib - si aan waxba u seegin labadooda dhexdooda
+    listener = await hub.subscribe(user_id)
+    try:
+        yield f"retry: {settings.NOTIFICATION_STREAM_RETRY_MS}\n\n"
+        replayed = set()
+        if last_event_id:
+            async with db_access():
+                missed = await replay(user_id, last_event_id)
+            for event_id, data in missed:
+                replayed.add(event_id)
+                yield format_event(event_id, data)
+
+        while not listener.overflowed:
+            try:
+                event_id, data = await asyncio.wait_for(
+                    listener.queue.get(), settings.NOTIFICATION_STREAM_HEARTBEAT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if event_id not in replayed:
+                yield format_event(event_id, data)
+    finally:
+        await hub.unsubscribe(user_id, listener)
@@ -0,0 +1,397 @@
+# core/services/reports.py
+from collections import defaultdict
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import IntegrityError, transaction as dbtx
+from django.db.models import DateField, F, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from ..models import Account, DailyAccountBalance, DailyCashFlow, Transaction, TransactionType
+from . import exchange_rates
+from .spend_ledger import diff
+
+# Reports-ku waxay ka akhriyaan snapshots (DailyCashFlow / DailyAccountBalance),
+# marna Transaction ma scan gareeyaan: 5 sano = hal query oo grouped ah.
+ZERO = Decimal("0")
+CENT = Decimal("0.01")
+BUCKETS = ("day", "week", "month")
+FLOW_COLUMNS = ("income", "expense", "transfer_in", "transfer_out")
+TYPE_COLUMNS = {
+    TransactionType.INCOME: "income",
+    TransactionType.EXPENSE: "expense",
+    TransactionType.TRANSFER: "transfer_out",
+}
+
+
+# ---------------- Periods ----------------
+def period_start(value, bucket):
+    if bucket == "week":
+        return value - timedelta(days=value.weekday())
+    if bucket == "month":
+        return value.replace(day=1)
+    return value
+
+
+def _next_period(start, bucket):
+    if bucket == "day":
+        return start + timedelta(days=1)
+    if bucket == "week":
+        return start + timedelta(days=7)
+    return (start + timedelta(days=32)).replace(day=1)
+
+
+def periods(start, end, bucket):
+    """[(first_day, last_day), ...] covering start..end, aligned to the bucket."""
+    spans, current = [], period_start(start, bucket)
+    while current <= end:
+        following = _next_period(current, bucket)
+        spans.append((current, following - timedelta(days=1)))
+        current = following
+    return spans
+
+
+def _convert(amount, currency, target, graph):
+    if currency == target:
+        return amount
+    quote = graph.resolve(currency, target)
+    return None if quote is None else amount * quote.rate
+
+
+def _money(amount):
+    return amount.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+# ---------------- Cash flow writes ----------------
+def flow_allocations(state):
+    """Return {(user_id, account_id, date, column): amount} for one transaction state."""
+    result = defaultdict(lambda: ZERO)
+    if not state or state["is_deleted"]:
+        return result
+
+    amount, tx_date = Decimal(state["amount"]), state["transaction_date"]
+    result[(state["user_id"], state["account_id"], tx_date, TYPE_COLUMNS[state["type"]])] += amount
+    if state["type"] == TransactionType.TRANSFER and state["target_account_id"]:
+        result[(state["user_id"], state["target_account_id"], tx_date, "transfer_in")] += amount
+    return result
+
+
+def _group(deltas):
+    rows = defaultdict(dict)
+    for (user_id, account_id, day, column), amount in deltas.items():
+        rows[(user_id, account_id, day)][column] = amount
+    return rows
+
+
+def apply_flow_deltas(deltas):
+    """Add each delta to its DailyCashFlow row, creating the row for a new (account, day)."""
+    if not deltas:
+        return
+    now = timezone.now()
+    with dbtx.atomic():
+        for (user_id, account_id, day), amounts in sorted(_group(deltas).items(), key=lambda item: str(item[0])):
+            lookup = dict(account_id=account_id, date=day)
+            changes = {column: F(column) + amount for column, amount in amounts.items()}
+            if DailyCashFlow.objects.filter(**lookup).update(updated_at=now, **changes):
+                continue
+            try:
+                # Savepoint: worker kale ayaa laga yaabaa inuu isla markaas abuuray row-ga
+                with dbtx.atomic():
+                    DailyCashFlow.objects.create(user_id=user_id, updated_at=now, **amounts, **lookup)
+            except IntegrityError:
+                DailyCashFlow.objects.filter(**lookup).update(updated_at=now, **changes)
+
+
+def sync_transaction(instance, old_state):
+    """Apply the cash-flow change caused by saving a Transaction (old_state is None for a new one)."""
+    apply_flow_deltas(diff(flow_allocations(old_state), flow_allocations(instance.ledger_state())))
+
+
+def remove_transaction(instance):
+    state = getattr(instance, "_ledger_state", None) or instance.ledger_state()
+    apply_flow_deltas(diff(flow_allocations(state), {}))
+
+
+def record_transactions(transactions):
+    """Cash-flow update for transactions inserted with bulk_create (no signals fire)."""
+    deltas = defaultdict(lambda: ZERO)
+    for tx in transactions:
+        for key, amount in flow_allocations(tx.ledger_state()).items():
+            deltas[key] += amount
+    apply_flow_deltas({key: amount for key, amount in deltas.items() if amount})
+
+
+# ---------------- Balance snapshots ----------------
+def record_balances(balances, on_date=None):
+    """
+    Upsert the closing balance for [(account_id, user_id, balance), ...] on
+    `on_date` (default today) with one INSERT ... ON CONFLICT.
+    """
+    on_date = on_date or timezone.localdate()
+    now = timezone.now()
+    rows = [
+        DailyAccountBalance(account_id=account_id, user_id=user_id, date=on_date, balance=balance, updated_at=now)
+        for account_id, user_id, balance in balances
+        if balance is not None
+    ]
+    if rows:
+        DailyAccountBalance.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=["account", "date"],
+            update_fields=["balance", "updated_at"],
+        )
+
+
+def shift_balances(changes, today=None):
+    """
+    Carry backdated balance changes [(account_id, user_id, date, delta), ...]
+    through the snapshots: every snapshot after `date` moves by delta, and
+    `date` gets its own closing balance (the snapshot before it plus delta; for
+    a date older than the account's history, the first snapshot after it is
+    taken as the opening balance). Dates from today on are left to
+    record_balances. Run it while the accounts are locked.
+    """
+    today = today or timezone.localdate()
+    now = timezone.now()
+    for account_id, user_id, day, delta in changes:
+        if day >= today or not delta:
+            continue
+        snapshots = DailyAccountBalance.objects.filter(account_id=account_id)
+        base = snapshots.filter(date__lte=day).order_by("-date").values_list("balance", flat=True).first()
+        if base is None:
+            base = snapshots.filter(date__gt=day).order_by("date").values_list("balance", flat=True).first()
+        snapshots.filter(date__gt=day).update(balance=F("balance") + delta, updated_at=now)
+        if base is not None:
+            record_balances([(account_id, user_id, base + delta)], day)
+
+
+def _latest_balances(queryset, before=None):
+    """{account_id: balance} of the newest snapshot per account (optionally before a date)."""
+    if before:
+        queryset = queryset.filter(date__lt=before)
+    return dict(
+        queryset.order_by("account_id", "-date").distinct("account_id").values_list("account_id", "balance")
+    )
+
+
+def snapshot_balances(on_date=None, batch_size=1000):
+    """
+    Nightly: write today's snapshot for every account whose balance differs
+    from its latest snapshot (catches edits that bypass balance_service).
+    Deleted accounts close at zero. Returns the number of rows written.
+    """
+    on_date = on_date or timezone.localdate()
+    latest = _latest_balances(DailyAccountBalance.objects.filter(date__lte=on_date))
+
+    pending, written = [], 0
+    accounts = Account.objects.values_list("id", "user_id", "balance", "is_deleted").iterator(chunk_size=2000)
+    for account_id, user_id, balance, is_deleted in accounts:
+        balance = ZERO if is_deleted else balance
+        if latest.get(account_id) != balance:
+            pending.append((account_id, user_id, balance))
+        if len(pending) >= batch_size:
+            record_balances(pending, on_date)
+            written += len(pending)
+            pending = []
+    record_balances(pending, on_date)
+    return written + len(pending)
+
+
+# ---------------- Rebuild ----------------
+def compute_cash_flow(user_id=None):
+    """Recompute {(user_id, account_id, date, column): amount} from live transactions."""
+    live = Transaction.objects.filter(is_deleted=False)
+    if user_id:
+        live = live.filter(user_id=user_id)
+
+    expected = defaultdict(lambda: ZERO)
+    rows = live.values("user_id", "account_id", "transaction_date", "type").annotate(total=Sum("amount")).order_by()
+    for row in rows:
+        expected[(row["user_id"], row["account_id"], row["transaction_date"], TYPE_COLUMNS[row["type"]])] += row["total"]
+
+    incoming = (
+        live.filter(type=TransactionType.TRANSFER, target_account__isnull=False)
+        .values("user_id", "target_account_id", "transaction_date")
+        .annotate(total=Sum("amount"))
+        .order_by()
+    )
+    for row in incoming:
+        expected[(row["user_id"], row["target_account_id"], row["transaction_date"], "transfer_in")] += row["total"]
+    return {key: amount for key, amount in expected.items() if amount}
+
+
+def rebuild_cash_flow(user_id=None):
+    """Replace DailyCashFlow (optionally for one user) with a fresh recomputation."""
+    rows = _group(compute_cash_flow(user_id))
+    now = timezone.now()
+    with dbtx.atomic():
+        stored = DailyCashFlow.objects.all()
+        if user_id:
+            stored = stored.filter(user_id=user_id)
+        stored.delete()
+        DailyCashFlow.objects.bulk_create(
+            [
+                DailyCashFlow(user_id=u, account_id=a, date=d, updated_at=now, **amounts)
+                for (u, a, d), amounts in rows.items()
+            ],
+            batch_size=1000,
+        )
+    return len(rows)
+
+
+def rebuild_balances(user_id=None, today=None):
+    """
+    Reconstruct closing balances by walking back from each account's current
+    balance through DailyCashFlow (rebuild that first). Edits that never
+    produced a transaction are invisible here, so older history is an
+    estimate. Replaces the account's stored snapshots; returns rows written.
+    """
+    today = today or timezone.localdate()
+    net = F("income") - F("expense") + F("transfer_in") - F("transfer_out")
+    accounts = Account.objects.all()
+    if user_id:
+        accounts = accounts.filter(user_id=user_id)
+
+    written = 0
+    for account_id, owner_id, balance, is_deleted, updated_at in accounts.values_list(
+        "id", "user_id", "balance", "is_deleted", "updated_at"
+    ).iterator(chunk_size=500):
+        flows = (
+            DailyCashFlow.objects.filter(account_id=account_id)
+            .annotate(net=net)
+            .order_by("-date")
+            .values_list("date", "net")
+        )
+        # Newest first: closing(day) = balance-ka hadda - net-ka maalmaha ka dambeeya
+        closing, running, oldest = {}, balance, None
+        for day, day_net in flows:
+            if day <= today:
+                closing.setdefault(today, running)
+                closing[day] = running
+            running -= day_net
+            oldest = day
+        closing.setdefault(today, running)
+        if oldest is not None and oldest <= today:
+            # Balance-kii ka horreeyay transaction-kii ugu horreeyay (opening balance)
+            closing[oldest - timedelta(days=1)] = running
+        if is_deleted:
+            closed_on = min(timezone.localtime(updated_at).date(), today)
+            closing = {day: amount for day, amount in closing.items() if day < closed_on}
+            closing[closed_on] = ZERO
+
+        with dbtx.atomic():
+            DailyAccountBalance.objects.filter(account_id=account_id).delete()
+            DailyAccountBalance.objects.bulk_create(
+                [
+                    DailyAccountBalance(account_id=account_id, user_id=owner_id, date=day, balance=amount)
+                    for day, amount in closing.items()
+                ],
+                batch_size=1000,
+            )
+        written += len(closing)
+    return written
+
+
+# ---------------- Reads ----------------
+def cash_flow(user, start, end, bucket, currency=None):
+    """
+    Income / expense / transfers per bucket in `currency` (default the user's
+    preferred currency). Each bucket is converted at the rate of its last day.
+    """
+    target = currency or user.preferred_currency_id
+    today = timezone.localdate()
+    spans = periods(start, end, bucket)
+    graphs = exchange_rates.get_graphs({min(last, today) for _, last in spans})
+
+    rows = (
+        DailyCashFlow.objects.filter(user=user, date__gte=spans[0][0], date__lte=spans[-1][1])
+        .annotate(period=Trunc("date", bucket, output_field=DateField()))
+        .values("period", "account__currency_id")
+        .annotate(**{column: Sum(column) for column in FLOW_COLUMNS})
+        .order_by()
+    )
+    by_period = defaultdict(list)
+    for row in rows:
+        by_period[row["period"]].append(row)
+
+    results, unconverted = [], set()
+    for first, last in spans:
+        totals = dict.fromkeys(FLOW_COLUMNS, ZERO)
+        graph = graphs[min(last, today)]
+        for row in by_period.get(first, ()):
+            currency_id = row["account__currency_id"]
+            for column in FLOW_COLUMNS:
+                converted = _convert(row[column], currency_id, target, graph)
+                if converted is None:
+                    unconverted.add(currency_id)
+                    break
+                totals[column] += converted
+        results.append({
+            "period": first,
+            "start": first,
+            "end": last,
+            **{column: float(_money(amount)) for column, amount in totals.items()},
+            "net": float(_money(totals["income"] - totals["expense"])),
+        })
+    return {"currency": target, "bucket": bucket, "results": results, "unconverted_currencies": sorted(unconverted)}
+
+
+def net_worth(user, start, end, bucket, currency=None):
+    """
+    Assets, liabilities and net worth at the end of every bucket in `currency`
+    (default the preferred currency), carrying each account's latest snapshot
+    forward. The bucket containing today uses live account balances.
+    """
+    target = currency or user.preferred_currency_id
+    today = timezone.localdate()
+    spans = periods(start, end, bucket)
+    graphs = exchange_rates.get_graphs({min(last, today) for _, last in spans})
+
+    accounts = {
+        pk: (currency_id, ZERO if is_deleted else balance)
+        for pk, currency_id, balance, is_deleted in Account.objects.filter(user=user).values_list(
+            "id", "currency_id", "balance", "is_deleted"
+        )
+    }
+    snapshots = DailyAccountBalance.objects.filter(user=user)
+    closing = _latest_balances(snapshots, before=spans[0][0])
+    changes = iter(
+        snapshots.filter(date__gte=spans[0][0], date__lte=min(spans[-1][1], today))
+        .order_by("date")
+        .values_list("account_id", "date", "balance")
+    )
+    pending = next(changes, None)
+
+    results, unconverted = [], set()
+    for first, last in spans:
+        if last >= today:
+            closing = {pk: balance for pk, (_, balance) in accounts.items()}
+        else:
+            while pending and pending[1] <= last:
+                closing[pending[0]] = pending[2]
+                pending = next(changes, None)
+
+        graph = graphs[min(last, today)]
+        assets = liabilities = ZERO
+        for account_id, balance in closing.items():
+            if account_id not in accounts or not balance:
+                continue
+            currency_id = accounts[account_id][0]
+            converted = _convert(balance, currency_id, target, graph)
+            if converted is None:
+                unconverted.add(currency_id)
+            elif converted > 0:
+                assets += converted
+            else:
+                liabilities -= converted
+        results.append({
+            "period": first,
+            "start": first,
+            "end": min(last, today),
+            "assets": float(_money(assets)),
+            "liabilities": float(_money(liabilities)),
+            "net_worth": float(_money(assets - liabilities)),
+        })
+    return {"currency": target, "bucket": bucket, "results": results, "unconverted_currencies": sorted(unconverted)}
@@ -0,0 +1,222 @@
+# core/services/spend_ledger.py
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction as dbtx
+from django.db.models import F, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+from django.utils import timezone
+
+from ..models import SpendLedger, Transaction, TransactionSplit, TransactionType
+
+ZERO = Decimal("0")
+
+
+# ---------------- Allocation helpers ----------------
+def allocations(state, splits=()):
+    """
+    Return {(user_id, category_id, year, month): amount} for one transaction state.
+    Splits-ka waxay lacagta u wareejiyaan category-gooda; inta hartay waxay
+    ku dhacdaa category-ga transaction-ka.
+    """
+    result = defaultdict(lambda: ZERO)
+    if not state or state["is_deleted"] or state["type"] != TransactionType.EXPENSE:
+        return result
+
+    tx_date = state["transaction_date"]
+    period = (tx_date.year, tx_date.month)
+    remainder = Decimal(state["amount"])
+    for category_id, amount in splits:
+        result[(state["user_id"], category_id) + period] += amount
+        remainder -= amount
+
+    if state["category_id"] is not None:
+        result[(state["user_id"], state["category_id"]) + period] += remainder
+    return result
+
+
+def diff(old, new):
+    """Subtract two allocation maps, dropping keys whose delta is zero."""
+    deltas = defaultdict(lambda: ZERO)
+    for key, amount in new.items():
+        deltas[key] += amount
+    for key, amount in old.items():
+        deltas[key] -= amount
+    return {key: amount for key, amount in deltas.items() if amount}
+
+
+def _split_rows(transaction_id):
+    return list(
+        TransactionSplit.objects.filter(transaction_id=transaction_id)
+        .values_list("id", "category_id", "amount")
+    )
+
+
+# ---------------- Writes ----------------
+def apply_deltas(deltas):
+    """
+    Add each delta to its ledger row (UPDATE ... SET amount = amount + x),
+    creating the row the first time a (user, category, month) is seen.
+    """
+    if not deltas:
+        return
+    now = timezone.now()
+    with dbtx.atomic():
+        for (user_id, category_id, year, month), amount in sorted(deltas.items(), key=lambda item: str(item[0])):
+            lookup = dict(user_id=user_id, category_id=category_id, year=year, month=month)
+            updated = SpendLedger.objects.filter(**lookup).update(amount=F("amount") + amount, updated_at=now)
+            if updated:
+                continue
+            try:
+                # Savepoint: haddii worker kale isla markaas abuuray row-ga, dib u update garee
+                with dbtx.atomic():
+                    SpendLedger.objects.create(amount=amount, updated_at=now, **lookup)
+            except IntegrityError:
+                SpendLedger.objects.filter(**lookup).update(amount=F("amount") + amount, updated_at=now)
+
+
+def sync_transaction(instance, old_state, created=False):
+    """Apply the ledger change caused by saving a Transaction (old_state is None for a new one)."""
+    new_state = instance.ledger_state()
+
+    touches_expense = any(
+        s and s["type"] == TransactionType.EXPENSE for s in (old_state, new_state)
+    )
+    if not touches_expense:
+        return
+
+    # Transaction cusub ma laha splits, markaa query looma baahna
+    splits = [] if created else [(c, a) for _, c, a in _split_rows(instance.pk)]
+    apply_deltas(diff(allocations(old_state, splits), allocations(new_state, splits)))
+
+
+def remove_transaction(instance):
+    """Reverse a hard-deleted transaction (its splits are removed first by CASCADE)."""
+    state = getattr(instance, "_ledger_state", None) or instance.ledger_state()
+    apply_deltas(diff(allocations(state), {}))
+
+
+def sync_split(split, created=False, deleted=False):
+    """Apply the ledger change caused by creating, editing or deleting a split."""
+    old_split = None if created else getattr(split, "_ledger_state", None)
+    new_split = None if deleted else split.ledger_state()
+    split._ledger_state = new_split
+
+    tx_state = Transaction.objects.filter(pk=split.transaction_id).values(*Transaction.LEDGER_FIELDS).first()
+    if not tx_state or tx_state["is_deleted"] or tx_state["type"] != TransactionType.EXPENSE:
+        return
+
+    current = [(pk, c, a) for pk, c, a in _split_rows(split.transaction_id) if pk != split.pk]
+    before = [(c, a) for _, c, a in current]
+    after = list(before)
+    if old_split:
+        before.append((old_split["category_id"], old_split["amount"]))
+    if new_split:
+        after.append((new_split["category_id"], new_split["amount"]))
+
+    apply_deltas(diff(allocations(tx_state, before), allocations(tx_state, after)))
+
+
+def record_transactions(transactions):
+    """Ledger update for transactions inserted with bulk_create (no signals fire)."""
+    deltas = defaultdict(lambda: ZERO)
+    for tx in transactions:
+        for key, amount in allocations(tx.ledger_state()).items():
+            deltas[key] += amount
+    apply_deltas({key: amount for key, amount in deltas.items() if amount})
+
+
+# ---------------- Reads ----------------
+def get_spent(user, category_id, year, month):
+    return (
+        SpendLedger.objects.filter(user=user, category_id=category_id, year=year, month=month)
+        .values_list("amount", flat=True)
+        .first()
+    ) or ZERO
+
+
+# ---------------- Rebuild ----------------
+def compute_expected(user_id=None):
+    """
+    Recompute the ledger from Transaction/TransactionSplit with three grouped queries.
+    Returns {(user_id, category_id, year, month): amount}.
+    """
+    live = Transaction.objects.filter(type=TransactionType.EXPENSE, is_deleted=False)
+    if user_id:
+        live = live.filter(user_id=user_id)
+    splits = TransactionSplit.objects.filter(transaction__in=live)
+
+    expected = defaultdict(lambda: ZERO)
+
+    tx_rows = (
+        live.filter(category__isnull=False)
+        .annotate(y=ExtractYear("transaction_date"), m=ExtractMonth("transaction_date"))
+        .values("user_id", "category_id", "y", "m")
+        .annotate(total=Sum("amount"))
+        .order_by()
+    )
+    for row in tx_rows:
+        expected[(row["user_id"], row["category_id"], row["y"], row["m"])] += row["total"]
+
+    # Split-ku wuxuu ka jaraa category-ga transaction-ka ...
+    moved_out = (
+        splits.filter(transaction__category__isnull=False)
+        .annotate(y=ExtractYear("transaction__transaction_date"), m=ExtractMonth("transaction__transaction_date"))
+        .values("transaction__user_id", "transaction__category_id", "y", "m")
+        .annotate(total=Sum("amount"))
+        .order_by()
+    )
+    for row in moved_out:
+        expected[(row["transaction__user_id"], row["transaction__category_id"], row["y"], row["m"])] -= row["total"]
+
+    # ... una geeyaa category-ga split-ka
+    moved_in = (
+        splits
+        .annotate(y=ExtractYear("transaction__transaction_date"), m=ExtractMonth("transaction__transaction_date"))
+        .values("transaction__user_id", "category_id", "y", "m")
+        .annotate(total=Sum("amount"))
+        .order_by()
+    )
+    for row in moved_in:
+        expected[(row["transaction__user_id"], row["category_id"], row["y"], row["m"])] += row["total"]
+
+    return {key: amount for key, amount in expected.items() if amount}
+
+
+def find_drift(user_id=None):
+    """Compare the stored ledger to a fresh recomputation. Returns (expected, drift rows)."""
+    expected = compute_expected(user_id)
+    stored_qs = SpendLedger.objects.all()
+    if user_id:
+        stored_qs = stored_qs.filter(user_id=user_id)
+    stored = {
+        (row["user_id"], row["category_id"], row["year"], row["month"]): row["amount"]
+        for row in stored_qs.values("user_id", "category_id", "year", "month", "amount")
+    }
+
+    drift = []
+    for key in set(expected) | set(stored):
+        want, have = expected.get(key, ZERO), stored.get(key, ZERO)
+        if want != have:
+            drift.append({"key": key, "expected": want, "stored": have})
+    return expected, drift
+
+
+def rebuild(user_id=None, expected=None):
+    """Replace the ledger (optionally for one user) with a fresh recomputation."""
+    if expected is None:
+        expected = compute_expected(user_id)
+    now = timezone.now()
+    with dbtx.atomic():
+        stored_qs = SpendLedger.objects.all()
+        if user_id:
+            stored_qs = stored_qs.filter(user_id=user_id)
+        stored_qs.delete()
+        SpendLedger.objects.bulk_create(
+            [
+                SpendLedger(user_id=u, category_id=c, year=y, month=m, amount=amount, updated_at=now)
+                for (u, c, y, m), amount in expected.items()
+            ],
+            batch_size=1000,
+        )
+    return len(expected)
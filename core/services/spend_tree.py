@@ -0,0 +1,182 @@
+# core/services/spend_tree.py
+import logging
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction as dbtx
+
+from ..models import Category, Transaction, TransactionSplit, TransactionType
+
+logger = logging.getLogger(__name__)
+
+# Spend tree: categories (1 query) + totals per category (1 grouped query, splits ku jiraan),
+# kadibna rollup xagga sare ee geedka gudaha memory-ga. Natiijada waxaa lagu cache gareeyaa
+# Redis; version-ka user-ka waa la kordhiyaa marka transaction/split/category la beddelo.
+ZERO = Decimal("0")
+CENT = Decimal("0.01")
+COLUMNS = {TransactionType.EXPENSE: "expense", TransactionType.INCOME: "income"}
+
+# Lacagta waa converted_amount (preferred currency, user-018). Split-ku wuxuu qaataa
+# qaybtiisa converted_amount-ka, wuxuuna ka wareejiyaa category-ga transaction-ka.
+TOTALS_SQL = """
+SELECT category_id, type, SUM(amount), SUM(missing)
+FROM (
+    SELECT t.category_id, t.type,
+           CASE WHEN t.converted_currency_id = %(currency)s THEN t.converted_amount END AS amount,
+           CASE WHEN t.converted_currency_id = %(currency)s THEN 0 ELSE 1 END AS missing
+    FROM {tx} t
+    WHERE {where}
+    UNION ALL
+    SELECT t.category_id, t.type, -s.amount * t.converted_amount / NULLIF(t.amount, 0), 0
+    FROM {split} s JOIN {tx} t ON t.id = s.transaction_id
+    WHERE {where} AND t.converted_currency_id = %(currency)s
+    UNION ALL
+    SELECT s.category_id, t.type, s.amount * t.converted_amount / NULLIF(t.amount, 0), 0
+    FROM {split} s JOIN {tx} t ON t.id = s.transaction_id
+    WHERE {where} AND t.converted_currency_id = %(currency)s
+) moved
+GROUP BY category_id, type
+"""
+
+WHERE = (
+    "t.user_id = %(user)s AND t.is_deleted = false AND t.type IN (%(expense)s, %(income)s) "
+    "AND t.transaction_date >= %(start)s AND t.transaction_date <= %(end)s"
+)
+
+
+# ---------------- Cache ----------------
+def _version_key(user_id):
+    return f"spend_tree:{user_id}:version"
+
+
+def _cache_call(method, *args, default=None):
+    """Redis haddii uu dhacay, cache-la'aan ku shaqee."""
+    try:
+        return getattr(cache, method)(*args)
+    except Exception as e:
+        logger.warning("Spend tree cache unavailable: %s", e)
+        return default
+
+
+def _bump(user_ids):
+    for user_id in user_ids:
+        try:
+            cache.incr(_version_key(user_id))
+        except ValueError:
+            _cache_call("set", _version_key(user_id), 2, None)
+        except Exception as e:
+            logger.warning("Spend tree cache unavailable: %s", e)
+
+
+def invalidate(user_ids):
+    """Drop the cached trees of these users once the current DB transaction commits."""
+    user_ids = {user_id for user_id in user_ids if user_id}
+    if user_ids:
+        dbtx.on_commit(lambda: _bump(user_ids))
+
+
+# ---------------- Build ----------------
+def load_totals(user, start, end):
+    """
+    Return ({(category_id, column): amount}, unconverted_count) for the user's
+    income/expense in [start, end], split allocations included.
+    """
+    sql = TOTALS_SQL.format(
+        tx=connection.ops.quote_name(Transaction._meta.db_table),
+        split=connection.ops.quote_name(TransactionSplit._meta.db_table),
+        where=WHERE,
+    )
+    params = {
+        "user": user.pk,
+        "currency": user.preferred_currency_id,
+        "expense": TransactionType.EXPENSE.value,
+        "income": TransactionType.INCOME.value,
+        "start": start,
+        "end": end,
+    }
+    totals, unconverted = {}, 0
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        for category_id, tx_type, amount, missing in cursor.fetchall():
+            totals[(category_id, COLUMNS[tx_type])] = amount or ZERO
+            unconverted += missing or 0
+    return totals, unconverted
+
+
+def rollup(categories, totals):
+    """
+    Build the category forest from [{"id", "name", "parent_id"}] and add each
+    node's descendants into total_expense / total_income (iterative post-order).
+    Totals of unknown or deleted categories land in the returned `uncategorized`.
+    """
+    nodes = {
+        row["id"]: {**row, "expense": ZERO, "income": ZERO, "children": []}
+        for row in categories
+    }
+    uncategorized = {"expense": ZERO, "income": ZERO}
+    for (category_id, column), amount in totals.items():
+        nodes.get(category_id, uncategorized)[column] += amount
+
+    roots = []
+    for node in nodes.values():
+        parent = nodes.get(node["parent_id"])
+        (parent["children"] if parent else roots).append(node)
+
+    stack = [(root, False) for root in roots]
+    while stack:
+        node, visited = stack.pop()
+        if not visited:
+            stack.append((node, True))
+            stack.extend((child, False) for child in node["children"])
+            continue
+        node["children"].sort(key=lambda child: (-child["total_expense"], child["name"]))
+        node["total_expense"] = node["expense"] + sum((c["total_expense"] for c in node["children"]), ZERO)
+        node["total_income"] = node["income"] + sum((c["total_income"] for c in node["children"]), ZERO)
+
+    roots.sort(key=lambda root: (-root["total_expense"], root["name"]))
+    return roots, uncategorized
+
+
+def _money(amount):
+    return float(amount.quantize(CENT))
+
+
+def _serialize(node):
+    return {
+        "id": str(node["id"]),
+        "name": node["name"],
+        "parent_id": str(node["parent_id"]) if node["parent_id"] else None,
+        "expense": _money(node["expense"]),
+        "income": _money(node["income"]),
+        "total_expense": _money(node["total_expense"]),
+        "total_income": _money(node["total_income"]),
+        "children": [_serialize(child) for child in node["children"]],
+    }
+
+
+def build_tree(user, start, end):
+    categories = Category.objects.filter(user=user, is_deleted=False).values("id", "name", "parent_id")
+    totals, unconverted = load_totals(user, start, end)
+    roots, uncategorized = rollup(list(categories), totals)
+    return {
+        "currency": user.preferred_currency_id,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "total_expense": _money(sum((root["total_expense"] for root in roots), uncategorized["expense"])),
+        "total_income": _money(sum((root["total_income"] for root in roots), uncategorized["income"])),
+        "uncategorized": {column: _money(amount) for column, amount in uncategorized.items()},
+        "unconverted_transactions": unconverted,
+        "categories": [_serialize(root) for root in roots],
+    }
+
+
+def get_tree(user, start, end):
+    """Cached build_tree: keyed by the user's version, so any write makes it stale."""
+    version = _cache_call("get", _version_key(user.pk)) or 1
+    key = f"spend_tree:{user.pk}:{version}:{user.preferred_currency_id}:{start.isoformat()}:{end.isoformat()}"
+    tree = _cache_call("get", key)
+    if tree is None:
+        tree = build_tree(user, start, end)
+        _cache_call("set", key, tree, settings.SPEND_TREE_CACHE_TIMEOUT)
+    return tree
@@ -0,0 +1,324 @@
+# core/services/transaction_import.py
+import codecs
+import csv
+import json
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction as dbtx
+from django.utils import timezone
+
+from ..models import (
+    Account, AccountType, AuditLog, Category, ImportStatus, Transaction,
+    TransactionImport, TransactionImportChunk, TransactionType,
+)
+from . import balance_service, reports, spend_ledger, spend_tree
+from .converted_amounts import stamp_transactions
+
+ZERO = Decimal("0")
+CENT = Decimal("0.01")
+MAX_STORED_ERRORS = 200
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+FORMATS = ("csv", "jsonl")
+
+
+class ImportFormatError(ValueError):
+    """The uploaded file cannot be parsed at all (bad format, bad encoding)."""
+
+
+# ---------------- Parsing (streaming) ----------------
+def detect_format(filename, requested=None):
+    requested = (requested or "").lower()
+    if requested in ("json", "ndjson"):
+        requested = "jsonl"
+    if requested:
+        if requested not in FORMATS:
+            raise ImportFormatError(f"Format-ka '{requested}' lama taageero. Isticmaal csv ama jsonl.")
+        return requested
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".jsonl", ".ndjson", ".json")):
+        return "jsonl"
+    raise ImportFormatError("Lama garan karo format-ka file-ka. Isticmaal csv ama jsonl.")
+
+
+def iter_rows(fileobj, file_format):
+    """
+    Yield (row_number, dict) one line at a time, so a large upload is never
+    held in memory. Malformed JSON lines are yielded as (row_number, None).
+    """
+    lines = codecs.iterdecode(fileobj, "utf-8-sig")
+    if file_format == "csv":
+        reader = csv.DictReader(lines)
+        for number, row in enumerate(reader, start=2):  # line 1 waa header
+            yield number, {k.strip().lower(): (v or "").strip() for k, v in row.items() if k}
+        return
+
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield number, row if isinstance(row, dict) else None
+
+
+# ---------------- Validation ----------------
+class _Lookups:
+    """User's accounts and categories, loaded once per import and matched by id or name."""
+
+    def __init__(self, user):
+        self.accounts, self.categories = {}, {}
+        for account in Account.objects.filter(user=user, is_deleted=False).select_related("currency"):
+            self.accounts[str(account.id)] = account
+            self.accounts.setdefault(account.name.strip().lower(), account)
+        for category in Category.objects.filter(user=user, is_deleted=False):
+            self.categories[str(category.id)] = category
+            self.categories.setdefault(category.name.strip().lower(), category)
+
+    @staticmethod
+    def _find(mapping, value):
+        value = str(value or "").strip()
+        return mapping.get(value) or mapping.get(value.lower())
+
+    def account(self, value):
+        return self._find(self.accounts, value)
+
+    def category(self, value):
+        return self._find(self.categories, value)
+
+
+def _build_transaction(user, row, lookups):
+    """Return an unsaved Transaction for one row, or raise ValueError with the reason."""
+    tx_type = str(row.get("type") or "").strip().capitalize()
+    if tx_type not in TransactionType.values:
+        raise ValueError(f"type '{row.get('type')}' sax maaha")
+
+    try:
+        amount = Decimal(str(row.get("amount") or "").strip()).quantize(CENT)
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"amount '{row.get('amount')}' sax maaha")
+    if amount <= 0:
+        raise ValueError("amount waa in uu ka weyn yahay 0")
+
+    raw_date = row.get("transaction_date") or row.get("date")
+    try:
+        tx_date = date.fromisoformat(str(raw_date).strip())
+    except (TypeError, ValueError):
+        raise ValueError(f"transaction_date '{raw_date}' sax maaha (YYYY-MM-DD)")
+
+    account = lookups.account(row.get("account"))
+    if not account:
+        raise ValueError(f"account '{row.get('account')}' lama helin")
+
+    target_account = None
+    if tx_type == TransactionType.TRANSFER:
+        target_account = lookups.account(row.get("target_account"))
+        if not target_account:
+            raise ValueError("Target account waa in la doortaa.")
+        if target_account.id == account.id:
+            raise ValueError("account iyo target_account isku mid ma noqon karaan")
+        if account.type == AccountType.SAVINGS and target_account.type == AccountType.SAVINGS:
+            raise ValueError("Cannot transfer from one savings account to another savings account.")
+    elif tx_type == TransactionType.EXPENSE and account.type == AccountType.SAVINGS:
+        raise ValueError("Saving account cannot be used directly for expenses. Transfer required.")
+
+    currency = str(row.get("currency") or "").strip().upper()
+    if currency and currency != account.currency_id:
+        raise ValueError("Transaction currency must match the account currency.")
+
+    category = None
+    if row.get("category"):
+        category = lookups.category(row.get("category"))
+        if not category:
+            raise ValueError(f"category '{row.get('category')}' lama helin")
+
+    return Transaction(
+        user=user,
+        account=account,
+        target_account=target_account,
+        category=category,
+        type=tx_type,
+        amount=amount,
+        currency=account.currency,
+        description=str(row.get("description") or ""),
+        transaction_date=tx_date,
+    )
+
+
+# ---------------- Writes ----------------
+def _write_batch(user, batch, lookups, stats):
+    """
+    Validate and insert one batch in a single DB transaction: lock the touched
+    accounts once, check funds against running balances, bulk insert, then
+    apply one net balance delta per account.
+    """
+    from ..signals import account_audit_data, transaction_audit_data
+
+    built = []
+    for number, row in batch:
+        if row is None:
+            _add_error(stats, number, "line-ka JSON sax maaha")
+            continue
+        try:
+            built.append((number, _build_transaction(user, row, lookups)))
+        except ValueError as e:
+            _add_error(stats, number, str(e))
+
+    if not built:
+        return
+
+    with dbtx.atomic():
+        account_ids = set()
+        for _, tx in built:
+            account_ids.update(pk for pk in (tx.account_id, tx.target_account_id) if pk)
+        balances = balance_service.locked_balances(account_ids)
+
+        accepted, deltas, dated = [], defaultdict(lambda: ZERO), defaultdict(lambda: ZERO)
+        for number, tx in built:
+            if tx.type == TransactionType.INCOME:
+                legs = [(tx.account_id, tx.amount)]
+            else:
+                available = balances[tx.account_id] + deltas[tx.account_id]
+                # Sida API-ga: account faaruq ah lacag lagama jari karo
+                if available <= 0 or available < tx.amount:
+                    _add_error(stats, number, f"Insufficient funds for {tx.type.lower()}.")
+                    continue
+                legs = [(tx.account_id, -tx.amount)]
+                if tx.type == TransactionType.TRANSFER:
+                    legs.append((tx.target_account_id, tx.amount))
+            for account_id, delta in legs:
+                deltas[account_id] += delta
+                dated[(account_id, tx.transaction_date)] += delta
+            accepted.append(tx)
+
+        if not accepted:
+            return
+
+        stamp_transactions(accepted, {user.pk: user.preferred_currency_id})
+        Transaction.objects.bulk_create(accepted, batch_size=500)
+        accounts = balance_service.apply_balance_deltas(deltas, dated)
+        spend_ledger.record_transactions(accepted)
+        reports.record_transactions(accepted)
+        spend_tree.invalidate([user.pk])
+
+        audits = [
+            AuditLog(
+                user_id=user.pk, table_name="transactions", record_id=tx.id,
+                action="CREATE", new_data=transaction_audit_data(tx),
+            )
+            for tx in accepted
+        ]
+        audits += [
+            AuditLog(
+                user_id=user.pk, table_name="accounts", record_id=account.id,
+                action="UPDATE", new_data=account_audit_data(account),
+            )
+            for account in accounts
+        ]
+        AuditLog.objects.bulk_create(audits, batch_size=500)
+
+    stats["imported_rows"] += len(accepted)
+
+
+def _add_error(stats, number, message):
+    stats["failed_rows"] += 1
+    if len(stats["errors"]) < MAX_STORED_ERRORS:
+        stats["errors"].append({"row": number, "error": message})
+
+
+def import_transactions(user, fileobj, file_format, batch_size=None, on_batch=None):
+    """
+    Import a CSV / JSON-lines statement for `user`.
+    Rows are parsed lazily and written `batch_size` at a time; a bad row is
+    reported and skipped, it never aborts the rest of the file.
+    Returns {"total_rows", "imported_rows", "failed_rows", "errors"}.
+    """
+    batch_size = batch_size or settings.TRANSACTION_IMPORT_BATCH_SIZE
+    lookups = _Lookups(user)
+    stats = {"total_rows": 0, "imported_rows": 0, "failed_rows": 0, "errors": []}
+
+    try:
+        batch = []
+        for number, row in iter_rows(fileobj, file_format):
+            stats["total_rows"] += 1
+            batch.append((number, row))
+            if len(batch) >= batch_size:
+                _write_batch(user, batch, lookups, stats)
+                batch = []
+                if on_batch:
+                    on_batch(stats)
+        if batch:
+            _write_batch(user, batch, lookups, stats)
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise ImportFormatError(f"File-ka lama akhrin karo: {e}")
+    return stats
+
+
+# ---------------- Queued imports ----------------
+def queue_import(user, upload, file_format):
+    """
+    Create a pending TransactionImport and copy the upload into
+    TransactionImportChunk rows, one piece at a time: the worker may run on
+    another machine, so nothing is left on the web process's disk.
+    """
+    with dbtx.atomic():
+        job = TransactionImport.objects.create(user=user, file_format=file_format)
+        for seq, data in enumerate(upload.chunks(UPLOAD_CHUNK_BYTES)):
+            TransactionImportChunk.objects.create(job=job, seq=seq, data=data)
+    return job
+
+
+def _stored_lines(job):
+    """The stored upload re-split into lines, like iterating the original file."""
+    pending = b""
+    chunks = job.chunks.order_by("seq").values_list("data", flat=True)
+    for data in chunks.iterator(chunk_size=1):
+        lines = (pending + bytes(data)).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line + b"\n"
+    if pending:
+        yield pending
+
+
+def run_import_job(job_id):
+    """Process a queued TransactionImport (called from the Celery task)."""
+    job = TransactionImport.objects.select_related("user").get(pk=job_id)
+    if job.status != ImportStatus.PENDING:
+        return job
+
+    job.status = ImportStatus.RUNNING
+    job.save(update_fields=["status"])
+
+    def progress(stats):
+        TransactionImport.objects.filter(pk=job.pk).update(
+            total_rows=stats["total_rows"],
+            imported_rows=stats["imported_rows"],
+            failed_rows=stats["failed_rows"],
+        )
+
+    try:
+        stats = import_transactions(job.user, _stored_lines(job), job.file_format, on_batch=progress)
+    except Exception as e:
+        # Batches-kii hore waa la commit gareeyay; hay tirada progress-ka
+        job.refresh_from_db(fields=["total_rows", "imported_rows", "failed_rows"])
+        job.status = ImportStatus.FAILED
+        job.errors = [{"row": None, "error": str(e)}]
+    else:
+        job.status = ImportStatus.COMPLETED
+        job.total_rows = stats["total_rows"]
+        job.imported_rows = stats["imported_rows"]
+        job.failed_rows = stats["failed_rows"]
+        job.errors = stats["errors"]
+
+    job.finished_at = timezone.now()
+    job.save()
+    # Upload-ka lama sii hayo marka la dhammeeyo
+    job.chunks.all().delete()
+    return job
@@ -0,0 +1,33 @@
+# core/services/transaction_search.py
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F
+
+# 'simple': ma jiro stemming, sababtoo ah descriptions-ku waa Somali iyo English isku jira.
+# Waa inuu la mid ahaadaa config-ka trigger-ka (migration 0016).
+SEARCH_CONFIG = "simple"
+_TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+
+def prefix_query(text):
+    """
+    Turn free text into a tsquery where every word is a prefix match:
+    "coffee sho" -> coffee:* & sho:*. Returns None if nothing searchable remains.
+    """
+    tokens = _TOKEN_RE.findall((text or "").lower())
+    if not tokens:
+        return None
+    raw = " & ".join(f"{token}:*" for token in tokens[:10])
+    return SearchQuery(raw, search_type="raw", config=SEARCH_CONFIG)
+
+
+def search(queryset, text):
+    """Filter on the GIN-indexed description_tsv and annotate `rank`."""
+    query = prefix_query(text)
+    if query is None:
+        return queryset.none()
+    return (
+        queryset.filter(description_tsv=query)
+        .annotate(rank=SearchRank(F("description_tsv"), query))
+    )
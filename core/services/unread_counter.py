@@ -0,0 +1,143 @@
+# core/services/unread_counter.py
+import logging
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction as dbtx
+from django.db.models import Count
+
+from ..models import Notification
+
+# Unread badge: tirada notifications-ka aan la akhrin ee user kasta Redis ayey ku jirtaa.
+# Qoraal kasta (create, bulk_create, mark read/unread, delete) on_commit ayuu incr/decr
+# ku sameeyaa; key maqan -> hal COUNT(*) kadibna cache. Beat-ka ayaa table-ka la simaha.
+#
+# incr/decr key maqan waxba kuma sameeyo (counter ma abuuro). Seed-ka get() waa COUNT kadib
+# add: qoraal commit noqda intaas dhexdooda seed marker-ka ayuu tirtiraa, seed-kana lama
+# cache gareeyo. Daaqad yar (marker check -> add) ayaa hadhay; reconcile() ayaa taas sixi doona.
+User = get_user_model()
+logger = logging.getLogger(__name__)
+SEED_TIMEOUT = 60
+
+
+def _key(user_id):
+    return f"notifications:unread:{user_id}"
+
+
+def _seed_key(user_id):
+    return f"notifications:unread:{user_id}:seed"
+
+
+def _cache_call(method, *args, default=None):
+    """Redis haddii uu dhacay, DB-ga ku shaqee."""
+    try:
+        return getattr(cache, method)(*args)
+    except Exception as e:
+        logger.warning("Unread counter unavailable: %s", e)
+        return default
+
+
+# ---------------- Writes ----------------
+def _apply(deltas):
+    for user_id, delta in deltas.items():
+        try:
+            cache.incr(_key(user_id), delta)
+        except ValueError:
+            # Key ma jiro: akhriska xiga ayaa DB-ga ka tirinaya; seed socda ha cache gareyn
+            _cache_call("delete", _seed_key(user_id))
+        except Exception as e:
+            logger.warning("Unread counter unavailable: %s", e)
+
+
+def adjust(deltas):
+    """Add {user_id: delta} to the cached counters once the current DB transaction commits."""
+    deltas = {str(user_id): delta for user_id, delta in deltas.items() if user_id and delta}
+    if deltas:
+        dbtx.on_commit(lambda: _apply(deltas))
+
+
+def created(notifications):
+    """Count freshly inserted notifications (bulk_create does not send post_save)."""
+    adjust(Counter(n.user_id for n in notifications if not n.is_read))
+
+
+def sync_notification(instance, created=False):
+    """post_save: diff is_read against the value loaded from the DB."""
+    if created:
+        before = True
+    else:
+        before = getattr(instance, "_loaded_is_read", None)
+        if before is None:
+            # Qiimihii hore lama yaqaan (deferred) - reconcile ayaa saxaya
+            return
+    adjust({instance.user_id: int(before) - int(instance.is_read)})
+    instance._loaded_is_read = instance.is_read
+
+
+def forget(user_ids):
+    """Drop these users' counters on commit (after bulk deletes); the next read re-counts."""
+    keys = [_key(user_id) for user_id in user_ids if user_id]
+    if keys:
+        dbtx.on_commit(lambda: _cache_call("delete_many", keys))
+
+
+# ---------------- Reads ----------------
+def count_from_db(user_id):
+    return Notification.objects.filter(user_id=user_id, is_read=False).count()
+
+
+def get(user_id):
+    """
+    Unread count for the badge: Redis only, unless the counter is missing.
+    A miss re-counts and seeds the counter, unless a write landed while counting.
+    """
+    count = _cache_call("get", _key(user_id))
+    if count is None:
+        token = uuid.uuid4().hex
+        _cache_call("set", _seed_key(user_id), token, SEED_TIMEOUT)
+        count = count_from_db(user_id)
+        if _cache_call("get", _seed_key(user_id)) == token:
+            _cache_call("add", _key(user_id), count, settings.NOTIFICATION_UNREAD_CACHE_TIMEOUT)
+    return max(count, 0)
+
+
+# ---------------- Reconciliation ----------------
+def reconcile(chunk_size=1000):
+    """
+    Re-count the users whose counter is cached (keyset over users, one
+    get_many + one grouped COUNT per chunk) and overwrite any that drifted.
+    Returns {"checked", "fixed"}.
+    """
+    checked = fixed = 0
+    last_id = None
+    base_qs = User.objects.order_by("id").values_list("id", flat=True)
+    while True:
+        qs = base_qs.filter(id__gt=last_id) if last_id else base_qs
+        user_ids = list(qs[:chunk_size])
+        if not user_ids:
+            break
+        last_id = user_ids[-1]
+
+        keys = {_key(user_id): user_id for user_id in user_ids}
+        cached = _cache_call("get_many", list(keys), default={})
+        if not cached:
+            continue
+        counts = dict(
+            Notification.objects.filter(user_id__in=[keys[key] for key in cached], is_read=False)
+            .values("user_id").annotate(unread=Count("id")).values_list("user_id", "unread")
+        )
+        stale = {
+            key: counts.get(keys[key], 0)
+            for key, value in cached.items()
+            if value != counts.get(keys[key], 0)
+        }
+        if stale:
+            _cache_call("set_many", stale, settings.NOTIFICATION_UNREAD_CACHE_TIMEOUT)
+        checked += len(cached)
+        fixed += len(stale)
+
+    logger.info("Unread counters reconciled: %d/%d fixed", fixed, checked)
+    return {"checked": checked, "fixed": fixed}
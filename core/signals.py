@@ -1,12 +1,17 @@
-from django.db.models.signals import post_save, post_delete
+import logging
+
+from django.db import transaction as dbtx
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
 from django.db.models.expressions import CombinedExpression
 from django.contrib.auth import get_user_model
 
-from .models import Transaction, Account, Category, Budget, RecurringBill
+from .models import Transaction, TransactionSplit, Account, Category, Budget, RecurringBill, ExchangeRate, Notification
 from .audit import create_audit
+from .services import exchange_rates, notification_stream, reports, spend_ledger, spend_tree, unread_counter
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
 # ---------------- Helper ----------------
 def safe_balance(instance):
@@ -20,102 +25,163 @@ def safe_balance(instance):
     return float(instance.balance) if hasattr(instance, 'balance') else None
 
 # ----------------- TRANSACTIONS -----------------
+def transaction_audit_data(instance):
+    """Audit payload for a Transaction (shared with the bulk write paths); FK ids only, no queries."""
+    return {
+        "amount": float(instance.amount),
+        "type": instance.type,
+        "account": str(instance.account_id),
+        "target_account": str(instance.target_account_id) if instance.target_account_id else None,
+        "category": str(instance.category_id) if instance.category_id else None,
+        "description": instance.description,
+        "transaction_date": str(instance.transaction_date),
+    }
+
 @receiver(post_save, sender=Transaction)
 def audit_transaction(sender, instance, created, **kwargs):
-    safe_balance(instance.account)
     action = "CREATE" if created else "UPDATE"
     create_audit(
-        user=instance.user,
+        user_id=instance.user_id,
         table_name="transactions",
         record_id=instance.id,
         action=action,
-        new_data={
-            "amount": float(instance.amount),
-            "type": instance.type,
-            "account": str(instance.account.id),
-            "target_account": str(instance.target_account.id) if instance.target_account else None,
-            "category": str(instance.category.id) if instance.category else None,
-            "description": instance.description,
-            "transaction_date": str(instance.transaction_date),
-        }
+        new_data=transaction_audit_data(instance),
     )
 
 @receiver(post_delete, sender=Transaction)
 def audit_transaction_delete(sender, instance, **kwargs):
-    safe_balance(instance.account)
     create_audit(
-        user=instance.user,
+        user_id=instance.user_id,
         table_name="transactions",
         record_id=instance.id,
         action="DELETE",
-        old_data={
-            "amount": float(instance.amount),
-            "type": instance.type,
-            "account": str(instance.account.id),
-            "target_account": str(instance.target_account.id) if instance.target_account else None,
-            "category": str(instance.category.id) if instance.category else None,
-            "description": instance.description,
-            "transaction_date": str(instance.transaction_date),
-        }
+        old_data=transaction_audit_data(instance),
+    )
+
+# ----------------- SPEND LEDGER -----------------
+LEDGER_TX_FIELDS = {"user", "category", "account", "target_account", "type", "amount", "transaction_date", "is_deleted"}
+
+@receiver(pre_save, sender=Transaction)
+def ledger_snapshot_transaction(sender, instance, **kwargs):
+    # Instance aan DB laga soo akhrin (tusaale .only()) - soo qaado qiimihii hore
+    if instance._state.adding or getattr(instance, "_ledger_state", None) is not None:
+        return
+    instance._ledger_state = (
+        Transaction.objects.filter(pk=instance.pk).values(*Transaction.LEDGER_FIELDS).first()
     )
 
+@receiver(post_save, sender=Transaction)
+def ledger_sync_transaction(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields and not LEDGER_TX_FIELDS & set(update_fields):
+        return
+    # Labada service isla state-kii hore ayey helaan; kadib state-ka cusub ayaa la xasuustaa
+    old_state = None if created else getattr(instance, "_ledger_state", None)
+    reports.sync_transaction(instance, old_state)
+    spend_ledger.sync_transaction(instance, old_state, created=created)
+    instance._ledger_state = instance.ledger_state()
+
+@receiver(post_delete, sender=Transaction)
+def ledger_remove_transaction(sender, instance, **kwargs):
+    spend_ledger.remove_transaction(instance)
+    reports.remove_transaction(instance)
+
+@receiver(post_save, sender=TransactionSplit)
+def ledger_sync_split(sender, instance, created, **kwargs):
+    spend_ledger.sync_split(instance, created=created)
+
+@receiver(post_delete, sender=TransactionSplit)
+def ledger_remove_split(sender, instance, **kwargs):
+    spend_ledger.sync_split(instance, deleted=True)
+
+# Spend tree cache (GET /categories/spend-tree/) - version-ka user-ka kordhi
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_spend_tree(sender, instance, **kwargs):
+    spend_tree.invalidate([instance.user_id])
+
+@receiver(post_save, sender=TransactionSplit)
+@receiver(post_delete, sender=TransactionSplit)
+def invalidate_spend_tree_split(sender, instance, **kwargs):
+    user_id = Transaction.objects.filter(pk=instance.transaction_id).values_list("user_id", flat=True).first()
+    spend_tree.invalidate([user_id])
+
+# ----------------- UNREAD COUNTER -----------------
+# bulk_create / update() / archive deletes waxay si toos ah u wacaan unread_counter
+@receiver(post_save, sender=Notification)
+def count_unread_notification(sender, instance, created, **kwargs):
+    unread_counter.sync_notification(instance, created=created)
+
+# SSE stream (notifications/stream/) - bulk_create-ka save_notifications ayaa publish gareeya
+@receiver(post_save, sender=Notification)
+def publish_notification(sender, instance, created, **kwargs):
+    if created:
+        notification_stream.publish([instance])
+
 # ----------------- ACCOUNTS -----------------
+def account_audit_data(instance):
+    return {
+        "name": instance.name,
+        "type": instance.type,
+        "is_active": instance.is_active,
+        "balance": safe_balance(instance),
+    }
+
 @receiver(post_save, sender=Account)
 def audit_account(sender, instance, created, **kwargs):
     action = "CREATE" if created else "UPDATE"
     create_audit(
-        user=instance.user,
+        user_id=instance.user_id,
         table_name="accounts",
         record_id=instance.id,
         action=action,
-        new_data={
-            "name": instance.name,
-            "type": instance.type,
-            "is_active": instance.is_active,
-            "balance": float(instance.balance) if hasattr(instance, 'balance') else None,
-        }
+        new_data=account_audit_data(instance),
     )
 
 @receiver(post_delete, sender=Account)
 def audit_account_delete(sender, instance, **kwargs):
     create_audit(
-        user=instance.user,
+        user_id=instance.user_id,
         table_name="accounts",
         record_id=instance.id,
         action="DELETE",
-        old_data={
-            "name": instance.name,
-            "type": instance.type,
-            "is_active": instance.is_active,
-            "balance": float(instance.balance) if hasattr(instance, 'balance') else None,
-        }
+        old_data=account_audit_data(instance),
     )
 
+@receiver(post_save, sender=Account)
+def snapshot_account_balance(sender, instance, created, update_fields=None, **kwargs):
+    # Account cusub, balance gacanta lagu beddelay ama la tirtiray -> snapshot-ka maanta
+    if update_fields and not {"balance", "is_deleted"} & set(update_fields):
+        return
+    balance = 0 if instance.is_deleted else instance.balance
+    reports.record_balances([(instance.pk, instance.user_id, balance)])
+
 # ----------------- CATEGORIES -----------------
 @receiver(post_save, sender=Category)
 def audit_category(sender, instance, created, **kwargs):
     action = "CREATE" if created else "UPDATE"
     create_audit(
-        user=instance.user,
+        user_id=instance.user_id,
         table_name="categories",
         record_id=instance.id,
         action=action,
         new_data={
             "name": instance.name,
-            "parent": str(instance.parent.id) if instance.parent else None,
+            "parent": str(instance.parent_id) if instance.parent_id else None,
         }
     )
 
 @receiver(post_delete, sender=Category)
 def audit_category_delete(sender, instance, **kwargs):
     create_audit(
-        user=instance.user,
+        user_id=instance.user_id,
         table_name="categories",
         record_id=instance.id,
         action="DELETE",
         old_data={
             "name": instance.name,
-            "parent": str(instance.parent.id) if instance.parent else None,
+            "parent": str(instance.parent_id) if instance.parent_id else None,
         }
     )
 
@@ -124,12 +190,12 @@ def audit_category_delete(sender, instance, **kwargs):
 def audit_budget(sender, instance, created, **kwargs):
     action = "CREATE" if created else "UPDATE"
     create_audit(
-        user=instance.user,
+        user_id=instance.user_id,
         table_name="budgets",
         record_id=instance.id,
         action=action,
         new_data={
-            "category": str(instance.category.id),
+            "category": str(instance.category_id),
             "month": instance.month,
             "year": instance.year,
             "amount": float(instance.amount),
@@ -140,12 +206,12 @@ def audit_budget(sender, instance, created, **kwargs):
 @receiver(post_delete, sender=Budget)
 def audit_budget_delete(sender, instance, **kwargs):
     create_audit(
-        user=instance.user,
+        user_id=instance.user_id,
         table_name="budgets",
         record_id=instance.id,
         action="DELETE",
         old_data={
-            "category": str(instance.category.id),
+            "category": str(instance.category_id),
             "month": instance.month,
             "year": instance.year,
             "amount": float(instance.amount),
@@ -157,43 +223,62 @@ def audit_budget_delete(sender, instance, **kwargs):
 
 
 # ----------------- RECURRING BILLS -----------------
+def recurring_bill_audit_data(instance):
+    return {
+        "name": instance.name,
+        "amount": float(instance.amount),
+        "currency": instance.currency_id,
+        "type": instance.type,
+        "frequency": instance.frequency,
+        "start_date": str(instance.start_date),
+        "next_due_date": str(instance.next_due_date),
+        "end_date": str(instance.end_date) if instance.end_date else None,
+        "is_active": instance.is_active,
+    }
+
 @receiver(post_save, sender=RecurringBill)
 def audit_recurring_bill(sender, instance, created, **kwargs):
     action = "CREATE" if created else "UPDATE"
     create_audit(
-        user=instance.user,
+        user_id=instance.user_id,
         table_name="recurring_bills",
         record_id=instance.id,
         action=action,
-        new_data={
-            "name": instance.name,
-            "amount": float(instance.amount),
-            "currency": instance.currency.code,
-            "type": instance.type,
-            "frequency": instance.frequency,
-            "start_date": str(instance.start_date),
-            "next_due_date": str(instance.next_due_date),
-            "end_date": str(instance.end_date) if instance.end_date else None,
-            "is_active": instance.is_active,
-        }
+        new_data=recurring_bill_audit_data(instance),
     )
 
 @receiver(post_delete, sender=RecurringBill)
 def audit_recurring_bill_delete(sender, instance, **kwargs):
     create_audit(
-        user=instance.user,
+        user_id=instance.user_id,
         table_name="recurring_bills",
         record_id=instance.id,
         action="DELETE",
-        old_data={
-            "name": instance.name,
-            "amount": float(instance.amount),
-            "currency": instance.currency.code,
-            "type": instance.type,
-            "frequency": instance.frequency,
-            "start_date": str(instance.start_date),
-            "next_due_date": str(instance.next_due_date),
-            "end_date": str(instance.end_date) if instance.end_date else None,
-            "is_active": instance.is_active,
-        }
-    )
\ No newline at end of file
+        old_data=recurring_bill_audit_data(instance),
+    )
+
+
+# ----------------- EXCHANGE RATES -----------------
+@receiver(post_save, sender=ExchangeRate)
+@receiver(post_delete, sender=ExchangeRate)
+def invalidate_exchange_rate_cache(sender, instance, **kwargs):
+    # fetch_exchange_rates / fetch_usd_sos_fixer_rate / admin: cache-ka dib u dhis marka commit la sameeyo
+    dbtx.on_commit(exchange_rates.invalidate)
+
+
+# ----------------- CONVERTED AMOUNTS -----------------
+@receiver(post_save, sender=User)
+def restamp_on_currency_change(sender, instance, created, **kwargs):
+    loaded = getattr(instance, "_loaded_preferred_currency_id", None)
+    if created or loaded is None or loaded == instance.preferred_currency_id:
+        return
+    instance._loaded_preferred_currency_id = instance.preferred_currency_id
+
+    def enqueue():
+        from .tasks import restamp_converted_amounts_task
+        try:
+            restamp_converted_amounts_task.delay(user_id=str(instance.pk))
+        except Exception as e:
+            logger.warning("Could not queue converted amount restamp for %s: %s", instance.pk, e)
+
+    dbtx.on_commit(enqueue)
@@ -1,30 +1,32 @@
 # core/tasks.py - Automation and background jobs
-from celery import shared_task
+import logging
+import time
+from celery import shared_task, chord
 from django.utils import timezone
 from datetime import timedelta, date
 from django.conf import settings
 from django.db import transaction as dbtx
+from django.db.models import Q, F
 import requests
 from django.contrib.auth import get_user_model
 
 # Import models at the top to avoid circular imports
 from .models import (
     RecurringBill, ExchangeRate, Currency, 
-    Budget, Notification, NotificationType,
-    Transaction
+    Notification, NotificationType,
+    Transaction, TransactionType, AccountType, AuditLog
 )
 
 # Import utility functions
 from core.utils.notifications import (
     check_budget_notifications, 
     create_sample_notification, 
-    create_budget_notification
+    create_budget_notification,
+    run_budget_alerts
 )
 
-# Import email service
-from core.services.email_service import send_notification_email
-
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
 # Helper function for next due date calculation (moved to top)
 def _next_due(freq: str, d: date) -> date:
@@ -44,32 +46,22 @@ def _next_due(freq: str, d: date) -> date:
 
 
 @shared_task
-def run_daily_budget_warnings():
+def run_daily_budget_warnings(chunk_size=None):
     """Daily budget warning task - runs only once per day"""
-    today = date.today()
-    print(f"📊 Running daily budget warnings for {today}...")
-    
-    for budget in Budget.objects.all():
-        # Check if notification was already sent today
-        notification_exists = Notification.objects.filter(
-            user=budget.user,
-            type=NotificationType.BUDGET,
-            related_id=budget.id,
-            sent_at__date=today
-        ).exists()
-        
-        if not notification_exists:
-            # Let the budget model handle the alert logic
-            budget.check_budget_alerts()
+    print(f"📊 Running daily budget warnings for {date.today()}...")
+    # Set-based pipeline: chunked budgets, bulk notifications, emails on their own queue
+    return run_budget_alerts(chunk_size)
 
 
 @shared_task
 def send_email_notification_task(user_id, subject, message, notification_id=None, email_type="general", extra_data=None):
-    """Task: Send email notification with improved parameters"""
+    """Task: Queue a notification email in the outbox (delivered by drain_email_outbox_task)"""
+    from .services import email_outbox
+
     try:
         user = User.objects.get(id=user_id)
         
-        result = send_notification_email(
+        row = email_outbox.enqueue_email(
             user=user,
             subject=subject,
             message=message,
@@ -78,11 +70,19 @@ def send_email_notification_task(user_id, subject, message, notification_id=None
             extra_data=extra_data
         )
         
-        return f"Email sent: {result}"
+        return f"Email queued: {row.id}"
         
     except Exception as e:
-        print(f"❌ Error sending email: {str(e)}")
-        return f"Error sending email: {str(e)}"
+        print(f"❌ Error queueing email: {str(e)}")
+        return f"Error queueing email: {str(e)}"
+
+
+@shared_task
+def drain_email_outbox_task(batch_size=None, max_batches=None):
+    """Deliver queued emails in batches over one reused connection (emails queue)"""
+    from .services import email_outbox
+
+    return email_outbox.drain(batch_size, max_batches)
 
 
 @shared_task
@@ -92,113 +92,226 @@ def test_notification_task():
     return "Notification task working correctly"
 
 
-@shared_task
-def generate_due_recurring_transactions_task():
-    """Generate all due recurring transactions efficiently"""
-    print(f"🔍 Checking for due recurring bills on {timezone.now().date()}...")
-    
-    # Get only bills that are due today or earlier
-    bills = RecurringBill.objects.filter(
-        is_active=True, 
-        is_deleted=False, 
-        next_due_date__lte=timezone.now().date()
-    ).select_related('user', 'account', 'category', 'currency')
-    
-    if not bills.exists():
-        print("✅ No due recurring bills found")
-        return "No due bills"
-    
-    print(f"📋 Found {bills.count()} due recurring bill(s)")
-    
-    successful_generations = 0
-    failed_generations = 0
-    
-    for bill in bills:
-        try:
-            result = generate_single_recurring_tx(bill.id)
-            if result:
-                successful_generations += 1
-                print(f"✅ Generated transaction for bill: {bill.name}")
-            else:
-                failed_generations += 1
-                print(f"❌ Failed to generate transaction for bill: {bill.name}")
-        except Exception as e:
-            failed_generations += 1
-            print(f"💥 Error processing bill {bill.name}: {str(e)}")
-    
-    return f"Generated {successful_generations} transactions, {failed_generations} failed"
+# ---------- Recurring transactions ----------
+def _due_bills(today):
+    """Active bills whose next due date has arrived (and is not past end_date)."""
+    return RecurringBill.objects.filter(
+        is_active=True,
+        is_deleted=False,
+        next_due_date__lte=today,
+    ).filter(Q(end_date__isnull=True) | Q(next_due_date__lte=F("end_date")))
 
 
-def generate_single_recurring_tx(bill_id):
-    """Generate a single recurring transaction with improved error handling"""
-    try:
-        with dbtx.atomic():
-            # Lock the bill for processing
-            bill = RecurringBill.objects.select_for_update().get(pk=bill_id)
-            
-            # Double-check conditions
-            if not bill.is_active or bill.is_deleted:
-                print(f"⏭️ Bill {bill.name} is inactive or deleted, skipping")
-                return None
-            
-            # Verify the bill is still due (in case of concurrent processing)
-            if bill.next_due_date > timezone.now().date():
-                print(f"⏭️ Bill {bill.name} is no longer due, skipping")
-                return None
-            
-            # Create the transaction
-            tx = Transaction.objects.create(
-                user=bill.user, 
-                account=bill.account, 
-                category=bill.category, 
-                type=bill.type,
-                amount=bill.amount, 
-                currency=bill.currency, 
-                description=f"[Auto] {bill.name}",
-                transaction_date=bill.next_due_date, 
-                is_recurring_instance=True, 
-                recurring_bill=bill
-            )
-            
-            # Update bill dates
-            original_due_date = bill.next_due_date
-            bill.last_generated_date = bill.next_due_date
-            bill.next_due_date = _next_due(bill.frequency, bill.next_due_date)
-            bill.updated_at = timezone.now()
-            bill.save(update_fields=["last_generated_date", "next_due_date", "updated_at"])
-            
-            # Notify user with more detailed message
-            notification_message = (
-                f"Lacag socda ayaa otomaatig loo abuuray: {bill.name}. "
-                f"Qadarta: ${bill.amount} {bill.currency.code}. "
-                f"Taariikhda: {original_due_date}"
-            )
-            
-            notification = Notification.objects.create(
-                user=bill.user,
-                type=NotificationType.BILL_DUE,
-                message=notification_message,
-                related_id=tx.id
+def _bill_error(bill):
+    """Return why a bill cannot be posted (mirrors Transaction.clean), or None."""
+    if bill.type == TransactionType.TRANSFER:
+        return "recurring transfers need a target account"
+    if bill.currency_id != bill.account.currency_id:
+        return "bill currency does not match the account currency"
+    if bill.type == TransactionType.EXPENSE and bill.account.type == AccountType.SAVINGS:
+        return "savings account cannot be used directly for expenses"
+    return None
+
+
+def _due_periods(bill, today):
+    """All missed due dates up to today, plus the next due date after them."""
+    periods = []
+    due = bill.next_due_date
+    while due <= today and (bill.end_date is None or due <= bill.end_date):
+        periods.append(due)
+        following = _next_due(bill.frequency, due)
+        if following <= due:
+            break
+        due = following
+    return periods, due
+
+
+def generate_recurring_chunk(bill_ids, today=None):
+    """
+    Claim a chunk of due bills (SELECT ... FOR UPDATE SKIP LOCKED), catch up every
+    missed period and write transactions, notifications and audit rows in bulk.
+    """
+    from .signals import transaction_audit_data, recurring_bill_audit_data
+    from .services import reports, spend_ledger, spend_tree
+    from .services.converted_amounts import stamp_transactions
+    from core.utils.notifications import collapse_digests, digest_user_ids, save_notifications
+
+    today = today or timezone.now().date()
+    started = time.monotonic()
+    now = timezone.now()
+    stats = {"bills": 0, "transactions": 0, "failed": 0}
+
+    with dbtx.atomic():
+        bills = list(
+            _due_bills(today)
+            .filter(id__in=bill_ids)
+            .select_related("account", "currency", "category")
+            .select_for_update(skip_locked=True, of=("self",))
+        )
+
+        advanced, transactions, notifications, subjects, audits = [], [], [], {}, []
+        for bill in bills:
+            error = _bill_error(bill)
+            if error:
+                stats["failed"] += 1
+                logger.warning("Skipping recurring bill %s: %s", bill.id, error)
+                continue
+
+            periods, next_due = _due_periods(bill, today)
+            if not periods:
+                continue
+
+            for due_date in periods:
+                tx = Transaction(
+                    user_id=bill.user_id,
+                    account=bill.account,
+                    category=bill.category,
+                    type=bill.type,
+                    amount=bill.amount,
+                    currency=bill.currency,
+                    description=f"[Auto] {bill.name}",
+                    transaction_date=due_date,
+                    is_recurring_instance=True,
+                    recurring_bill=bill,
+                )
+                transactions.append(tx)
+
+                notification_message = (
+                    f"Lacag socda ayaa otomaatig loo abuuray: {bill.name}. "
+                    f"Qadarta: ${bill.amount} {bill.currency_id}. "
+                    f"Taariikhda: {due_date}"
+                )
+                notification = Notification(
+                    user_id=bill.user_id,
+                    type=NotificationType.BILL_DUE,
+                    message=notification_message,
+                    related_id=tx.id,
+                )
+                notifications.append(notification)
+                subjects[notification.id] = f"Lacag socda oo la abuuray: {bill.name}"
+                audits.append(AuditLog(
+                    user_id=bill.user_id, table_name="transactions", record_id=tx.id,
+                    action="CREATE", new_data=transaction_audit_data(tx),
+                ))
+
+            bill.last_generated_date = periods[-1]
+            bill.next_due_date = next_due
+            bill.updated_at = now
+            advanced.append(bill)
+            audits.append(AuditLog(
+                user_id=bill.user_id, table_name="recurring_bills", record_id=bill.id,
+                action="UPDATE", new_data=recurring_bill_audit_data(bill),
+            ))
+
+        if transactions:
+            # Digest mode: user-ka bills-kiisa run-kan hal notification + hal email
+            notifications, digests = collapse_digests(
+                notifications, subjects,
+                digest_user_ids(n.user_id for n in notifications),
+                NotificationType.BILL_DUE, "{count} recurring transactions created",
             )
-            
-            # Send email notification as a separate task
-            send_email_notification_task.delay(
-                user_id=bill.user.id,
-                subject=f"Lacag socda oo la abuuray: {bill.name}",
-                message=notification_message,
-                notification_id=notification.id,
-                email_type="recurring"
+            stamp_transactions(transactions)
+            Transaction.objects.bulk_create(transactions, batch_size=500)
+            save_notifications(notifications, digests, subjects, email_type="recurring")
+            AuditLog.objects.bulk_create(audits, batch_size=500)
+            RecurringBill.objects.bulk_update(
+                advanced,
+                ["last_generated_date", "next_due_date", "updated_at"],
+                batch_size=500,
             )
-            
-            print(f"💰 Generated transaction {tx.id} for bill {bill.name}")
-            return str(tx.id)
-            
-    except RecurringBill.DoesNotExist:
-        print(f"❌ Bill with ID {bill_id} does not exist")
-        return None
-    except Exception as e:
-        print(f"💥 Unexpected error processing bill {bill_id}: {str(e)}")
-        return None
+            spend_ledger.record_transactions(transactions)
+            reports.record_transactions(transactions)
+            spend_tree.invalidate({tx.user_id for tx in transactions})
+
+    stats["bills"] = len(advanced)
+    stats["transactions"] = len(transactions)
+    stats["seconds"] = round(time.monotonic() - started, 3)
+    return stats
+
+
+def _run_recurring_chunk(bill_ids, today):
+    """One chunk; a failure is logged and counted so the other chunks still run."""
+    try:
+        return generate_recurring_chunk(bill_ids, today)
+    except Exception:
+        logger.exception("Recurring chunk of %d bill(s) failed", len(bill_ids))
+        return {"bills": 0, "transactions": 0, "failed": len(bill_ids), "failed_chunks": 1}
+
+
+def _summarize_recurring(results, seconds):
+    summary = {"bills": 0, "transactions": 0, "failed": 0, "failed_chunks": 0}
+    for result in results:
+        for key in summary:
+            summary[key] += result.get(key, 0)
+    summary["chunks"] = len(results)
+    summary["seconds"] = round(seconds, 3)
+    summary["bills_per_sec"] = round(summary["bills"] / seconds, 2) if seconds > 0 else None
+    return summary
+
+
+def _user_chunks(rows, chunk_size):
+    """
+    Split (bill_id, user_id) rows ordered by user into chunks of about chunk_size
+    without splitting a user's bills, so one chunk sees all of a user's events.
+    """
+    chunks, current, last_user = [], [], None
+    for bill_id, user_id in rows:
+        if len(current) >= chunk_size and user_id != last_user:
+            chunks.append(current)
+            current = []
+        current.append(str(bill_id))
+        last_user = user_id
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+@shared_task
+def generate_recurring_chunk_task(bill_ids, today=None):
+    """Celery wrapper so chunks can run on several workers in parallel."""
+    return _run_recurring_chunk(bill_ids, date.fromisoformat(today) if today else None)
+
+
+@shared_task
+def summarize_recurring_chunks(results, started_at):
+    summary = _summarize_recurring(results, time.time() - started_at)
+    logger.info("Recurring generation finished: %s", summary)
+    return summary
+
+
+@shared_task
+def generate_due_recurring_transactions_task(chunk_size=None, fan_out=None):
+    """Generate all due recurring transactions in chunks (optionally fanned out as a chord)"""
+    today = timezone.now().date()
+    chunk_size = chunk_size or settings.RECURRING_CHUNK_SIZE
+    fan_out = settings.RECURRING_FAN_OUT if fan_out is None else fan_out
+    logger.info("Checking for due recurring bills on %s", today)
+
+    rows = list(_due_bills(today).order_by("user_id", "id").values_list("id", "user_id"))
+    if not rows:
+        logger.info("No due recurring bills found")
+        return _summarize_recurring([], 0)
+
+    chunks = _user_chunks(rows, chunk_size)
+    logger.info("Found %d due recurring bill(s) in %d chunk(s)", len(rows), len(chunks))
+
+    if fan_out:
+        chord(
+            generate_recurring_chunk_task.s(chunk, today.isoformat()) for chunk in chunks
+        )(summarize_recurring_chunks.s(time.time()))
+        return {"bills": len(rows), "chunks": len(chunks), "status": "dispatched"}
+
+    started = time.monotonic()
+    results = [_run_recurring_chunk(chunk, today) for chunk in chunks]
+    summary = _summarize_recurring(results, time.monotonic() - started)
+    logger.info("Recurring generation finished: %s", summary)
+    return summary
+
+
+def generate_single_recurring_tx(bill_id):
+    """Generate every due transaction for one bill; returns a summary dict or None."""
+    result = generate_recurring_chunk([bill_id])
+    return result if result["transactions"] else None
 
 
 
@@ -285,4 +398,79 @@ def fetch_exchange_rates(base_currency='USD', target_currencies=None):
             return f"Successfully fetched rates for {base_currency} to {target_currencies}"
         
     except Exception as e:
-        return f"Error fetching exchange rates: {str(e)}"
\ No newline at end of file
+        return f"Error fetching exchange rates: {str(e)}"
+
+
+@shared_task
+def import_transactions_task(job_id):
+    """Process a large transaction import uploaded through /transactions/import/"""
+    from .services.transaction_import import run_import_job
+
+    job = run_import_job(job_id)
+    logger.info("Import %s: %s (%d imported, %d failed)", job.id, job.status, job.imported_rows, job.failed_rows)
+    return {"status": job.status, "imported": job.imported_rows, "failed": job.failed_rows}
+
+
+@shared_task
+def write_audit_logs_task(entries):
+    """Insert audit entries buffered by core.audit (AUDIT_WRITE_MODE="celery")"""
+    AuditLog.objects.bulk_create(
+        [AuditLog(**entry) for entry in entries],
+        batch_size=500,
+        ignore_conflicts=True,  # retry-ga task-ku ha labanlaabin rows
+    )
+    return len(entries)
+
+
+@shared_task
+def maintain_audit_partitions_task():
+    """Create upcoming AuditLog partitions and apply the retention policy"""
+    from .services import audit_partitions
+
+    created = audit_partitions.ensure_partitions()
+    removed = audit_partitions.apply_retention()
+    logger.info("Audit partitions: created=%s removed=%s", created, removed)
+    return {"created": created, "removed": removed}
+
+
+@shared_task
+def archive_old_records_task(months=None):
+    """Move old audit logs and notifications into gzip NDJSON archives"""
+    from .models import ArchiveKind
+    from .services import archive
+
+    results = [archive.archive_old_records(kind, months) for kind in ArchiveKind.values]
+    logger.info("Archive run: %s", results)
+    return results
+
+
+@shared_task
+def restamp_converted_amounts_task(user_id=None, since=None, only_missing=False):
+    """Recompute Transaction.converted_amount (preferred currency change / late rates)"""
+    from .services.converted_amounts import restamp
+
+    scanned, updated = restamp(
+        user_id=user_id,
+        since=date.fromisoformat(since) if since else None,
+        only_missing=only_missing,
+    )
+    logger.info("Restamp converted amounts: %d/%d updated", updated, scanned)
+    return {"scanned": scanned, "updated": updated}
+
+
+@shared_task
+def snapshot_account_balances_task():
+    """Nightly closing-balance snapshot for accounts that changed outside balance_service"""
+    from .services import reports
+
+    written = reports.snapshot_balances()
+    logger.info("Balance snapshots written: %d", written)
+    return {"written": written}
+
+
+@shared_task
+def reconcile_unread_counts_task():
+    """Re-count cached unread notification counters against the table"""
+    from .services import unread_counter
+
+    return unread_counter.reconcile()
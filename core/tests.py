@@ -1,3 +1,1605 @@
-from django.test import TestCase
+import csv
+import json
+import tempfile
+import threading
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from smtplib import SMTPException
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.mail import get_connection
+from django.core.mail.backends import locmem
+from django.db import IntegrityError, connection, transaction as dbtx
+from django.db.models.signals import post_save
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.template.loader import render_to_string
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .audit import create_audit
+from .models import (
+    Account, AccountType, ArchiveKind, ArchivedMonth, AuditLog, Budget, Category, Currency, DailyAccountBalance,
+    DailyCashFlow, EmailOutbox, EmailStatus, ExchangeRate, ImportStatus, Notification, NotificationType, RecurringBill,
+    SpendLedger, Transaction, TransactionImportChunk, TransactionSplit, TransactionType, User,
+)
+from .pagination import KeysetPagination
+from .services import (
+    archive, audit_partitions, converted_amounts, email_outbox, email_rendering, exchange_rates, notification_stream,
+    spend_ledger, spend_tree, transaction_export, transaction_import, transaction_search, unread_counter,
+)
+from .services.archive import archive_user_month, archived_rows
+from .services.balance_service import InsufficientFunds, credit, debit
+from .services.budget_service import get_budget_summary
+from .signals import audit_transaction, transaction_audit_data
+from .tasks import generate_due_recurring_transactions_task, generate_recurring_chunk
+from .utils.notifications import collapse_digests, run_budget_alerts
+
+# Tests-ku Redis uma baahna: cache-ka process-ka gudihiisa
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+def make_user(username="amina"):
+    currency, _ = Currency.objects.get_or_create(code="USD", defaults={"name": "US Dollar", "symbol": "$"})
+    return User.objects.create_user(
+        username=username, email=f"{username}@example.com", password="x", preferred_currency=currency,
+    )
+
+
+# ---------------- Budget summary ----------------
+@override_settings(CACHES=LOCMEM_CACHES)
+class BudgetSummaryQueryTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        today = date.today()
+        self.year, self.month = today.year, today.month
+        self.created = 0
+
+    def add_budgets(self, count):
+        for _ in range(count):
+            category = Category.objects.create(user=self.user, name=f"Category {self.created}")
+            Budget.objects.create(
+                user=self.user, category=category, month=self.month, year=self.year,
+                amount=Decimal("100.00"), currency_id="USD",
+            )
+            SpendLedger.objects.create(
+                user=self.user, category=category, year=self.year, month=self.month, amount=Decimal("40.00"),
+            )
+            self.created += 1
+
+    def test_query_count_does_not_grow_with_budgets(self):
+        # Budgets (category la socda) + hal SpendLedger lookup
+        self.add_budgets(1)
+        with self.assertNumQueries(2):
+            summary = get_budget_summary(self.user, self.year, self.month)
+        self.assertEqual(len(summary), 1)
+
+        self.add_budgets(40)
+        with self.assertNumQueries(2):
+            summary = get_budget_summary(self.user, self.year, self.month)
+        self.assertEqual(len(summary), 41)
+        self.assertTrue(all(row["total_spent"] == 40.0 and row["total_remaining"] == 60.0 for row in summary))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BudgetListSpentTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.created = 0
+
+    def add_budget(self, spent=None, amount="100.00", month=5):
+        category = Category.objects.create(user=self.user, name=f"Category {self.created}")
+        self.created += 1
+        budget = Budget.objects.create(
+            user=self.user, category=category, month=month, year=2024, amount=Decimal(amount), currency_id="USD",
+        )
+        if spent is not None:
+            SpendLedger.objects.create(
+                user=self.user, category=category, year=2024, month=month, amount=Decimal(spent),
+            )
+        return budget
+
+    def list_budgets(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/budgets/")
+        self.assertEqual(response.status_code, 200)
+        rows = response.data["results"] if isinstance(response.data, dict) else response.data
+        return {row["id"]: row for row in rows}, len(queries)
+
+    def test_list_reads_spend_from_the_ledger(self):
+        spent = self.add_budget(spent="40.00")
+        over = self.add_budget(spent="130.00")
+        empty = self.add_budget()
+        # Ledger-ka bil kale ah lagama xisaabiyo
+        SpendLedger.objects.create(user=self.user, category=empty.category, year=2024, month=6, amount=Decimal("9"))
+
+        rows, _ = self.list_budgets()
+        self.assertEqual(Decimal(str(rows[str(spent.pk)]["total_spent"])), Decimal("40.00"))
+        self.assertEqual(Decimal(str(rows[str(spent.pk)]["total_remaining"])), Decimal("60.00"))
+        self.assertEqual(Decimal(str(rows[str(over.pk)]["total_remaining"])), Decimal("0"))
+        self.assertEqual(Decimal(str(rows[str(empty.pk)]["total_spent"])), Decimal("0"))
+
+    def test_query_count_does_not_grow_with_budgets(self):
+        self.add_budget(spent="10.00")
+        _, one = self.list_budgets()
+        for _ in range(15):
+            self.add_budget(spent="10.00")
+        rows, many = self.list_budgets()
+        self.assertEqual(len(rows), 16)
+        self.assertEqual(one, many)
+
+
+# ---------------- Balance posting ----------------
+@override_settings(CACHES=LOCMEM_CACHES)
+class BalanceConcurrencyTests(TransactionTestCase):
+    """Threads hitting one account at once: no lost updates, no overdrafts."""
+
+    THREADS = 16
+
+    def setUp(self):
+        self.user = make_user()
+        self.account = Account.objects.create(
+            user=self.user, name="Main", type=AccountType.BANK, balance=Decimal("100.00"), currency_id="USD",
+        )
+
+    def run_threads(self, post):
+        """Run post(account) in THREADS threads released together; returns (ok, insufficient, errors)."""
+        barrier = threading.Barrier(self.THREADS)
+        results = {"ok": 0, "insufficient": 0, "errors": []}
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                barrier.wait()
+                with dbtx.atomic():
+                    post(Account.objects.get(pk=self.account.pk))
+                outcome = "ok"
+            except InsufficientFunds:
+                outcome = "insufficient"
+            except Exception as e:
+                with lock:
+                    results["errors"].append(e)
+                return
+            finally:
+                connection.close()
+            with lock:
+                results[outcome] += 1
+
+        threads = [threading.Thread(target=worker) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results["ok"], results["insufficient"], results["errors"]
+
+    def test_concurrent_debits_never_overdraw(self):
+        # 16 x 15 = 240 > 100: 6 ayaa gala, 10 InsufficientFunds
+        ok, insufficient, errors = self.run_threads(lambda account: debit(account, "15.00"))
+        self.assertEqual(errors, [])
+        self.assertEqual((ok, insufficient), (6, 10))
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal("10.00"))
+
+    def test_concurrent_credits_are_not_lost(self):
+        ok, insufficient, errors = self.run_threads(lambda account: credit(account, "2.50"))
+        self.assertEqual(errors, [])
+        self.assertEqual((ok, insufficient), (self.THREADS, 0))
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal("100.00") + self.THREADS * Decimal("2.50"))
+
+    def test_zero_debit_on_an_empty_account(self):
+        Account.objects.filter(pk=self.account.pk).update(balance=0)
+        self.assertEqual(debit(self.account, "0.00"), Decimal("0.00"))
+        with self.assertRaises(InsufficientFunds):
+            debit(self.account, "0.01")
+
+    def test_credit_to_missing_account_raises(self):
+        ghost = Account(pk=self.account.pk, user=self.user, currency_id="USD")
+        Account.objects.filter(pk=self.account.pk).delete()
+        with self.assertRaises(Account.DoesNotExist):
+            credit(ghost, "5.00")
+        with self.assertRaises(Account.DoesNotExist):
+            debit(ghost, "5.00")
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TransactionEditBalanceTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.main, self.other = (
+            Account.objects.create(
+                user=self.user, name=name, type=AccountType.BANK, balance=Decimal("100.00"), currency_id="USD",
+            )
+            for name in ("Main", "Other")
+        )
+        response = self.client.post("/api/transactions/", {
+            "account": str(self.main.pk), "type": "Expense", "amount": "40.00", "transaction_date": str(date.today()),
+        })
+        self.assertEqual(response.status_code, 201, response.data)
+        self.tx_id = response.data["id"]
+
+    def edit(self, **changes):
+        return self.client.patch(f"/api/transactions/{self.tx_id}/", changes, format="json")
+
+    def balances(self):
+        return tuple(Account.objects.get(pk=a.pk).balance for a in (self.main, self.other))
+
+    def test_amount_type_and_account_edits_repost_the_balance(self):
+        self.assertEqual(self.balances(), (Decimal("60.00"), Decimal("100.00")))
+        self.assertEqual(self.edit(amount="55.00").status_code, 200)
+        self.assertEqual(self.balances(), (Decimal("45.00"), Decimal("100.00")))
+        self.assertEqual(self.edit(type="Income").status_code, 200)
+        self.assertEqual(self.balances(), (Decimal("155.00"), Decimal("100.00")))
+        self.assertEqual(self.edit(account=str(self.other.pk)).status_code, 200)
+        self.assertEqual(self.balances(), (Decimal("100.00"), Decimal("155.00")))
+        self.assertEqual(self.edit(type="Transfer", target_account=str(self.main.pk)).status_code, 200)
+        self.assertEqual(self.balances(), (Decimal("155.00"), Decimal("45.00")))
+        # Description kaliya: balance-ka lama taabto
+        self.assertEqual(self.edit(description="Rent").status_code, 200)
+        self.assertEqual(self.balances(), (Decimal("155.00"), Decimal("45.00")))
+
+    def test_edit_that_would_overdraw_changes_nothing(self):
+        response = self.edit(amount="150.00")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.balances(), (Decimal("60.00"), Decimal("100.00")))
+        self.assertEqual(Transaction.objects.get(pk=self.tx_id).amount, Decimal("40.00"))
+
+        # 40 -> 100 wuu dhacaa: net-ku waa -60, lacagtuna way jirtaa
+        self.assertEqual(self.edit(amount="100.00").status_code, 200)
+        self.assertEqual(self.balances(), (Decimal("0.00"), Decimal("100.00")))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BackdatedSnapshotTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.account = Account.objects.create(
+            user=self.user, name="Main", type=AccountType.BANK, balance=Decimal("120.00"), currency_id="USD",
+        )
+        self.today = date.today()
+        for days_ago, balance in ((10, "100.00"), (5, "120.00")):
+            DailyAccountBalance.objects.create(
+                account=self.account, user=self.user, date=self.today - timedelta(days=days_ago), balance=balance,
+            )
+
+    def snapshots(self):
+        return {
+            (self.today - day).days: balance
+            for day, balance in DailyAccountBalance.objects.filter(account=self.account).values_list("date", "balance")
+        }
+
+    def test_backdated_debit_is_written_on_its_date_and_carried_forward(self):
+        debit(self.account, "30.00", on_date=self.today - timedelta(days=7))
+        self.assertEqual(self.snapshots(), {
+            10: Decimal("100.00"), 7: Decimal("70.00"), 5: Decimal("90.00"), 0: Decimal("90.00"),
+        })
+
+    def test_credit_before_the_first_snapshot(self):
+        credit(self.account, "5.00", on_date=self.today - timedelta(days=12))
+        self.assertEqual(self.snapshots(), {
+            12: Decimal("105.00"), 10: Decimal("105.00"), 5: Decimal("125.00"), 0: Decimal("125.00"),
+        })
+
+    @override_settings(TIME_ZONE="Pacific/Auckland")
+    def test_snapshot_dates_follow_the_local_day(self):
+        # 20:00 UTC 1 May = 08:00 2 May Auckland: transaction-ka 1 May waa shalay
+        with mock.patch("django.utils.timezone.now", return_value=datetime(2024, 5, 1, 20, tzinfo=dt_timezone.utc)):
+            account = Account.objects.create(
+                user=self.user, name="Wallet", type=AccountType.CASH, balance=Decimal("100.00"), currency_id="USD",
+            )
+            DailyAccountBalance.objects.create(account=account, user=self.user, date=date(2024, 4, 30), balance="100.00")
+            credit(account, "10.00", on_date=date(2024, 5, 1))
+        self.assertEqual(
+            dict(DailyAccountBalance.objects.filter(account=account).values_list("date", "balance")),
+            {date(2024, 4, 30): Decimal("100.00"), date(2024, 5, 1): Decimal("110.00"), date(2024, 5, 2): Decimal("110.00")},
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class LedgerSyncTests(TestCase):
+    def test_editing_a_transaction_moves_both_ledgers(self):
+        user = make_user()
+        account = Account.objects.create(
+            user=user, name="Main", type=AccountType.BANK, balance=Decimal("500.00"), currency_id="USD",
+        )
+        food, rent = (Category.objects.create(user=user, name=name) for name in ("Food", "Rent"))
+        tx = Transaction.objects.create(
+            user=user, account=account, category=food, type=TransactionType.EXPENSE, amount=Decimal("40.00"),
+            currency_id="USD", transaction_date=date(2024, 3, 10),
+        )
+        tx.amount, tx.category, tx.transaction_date = Decimal("25.00"), rent, date(2024, 4, 2)
+        tx.save()
+
+        self.assertEqual(
+            {(row.category.name, row.month): row.amount for row in SpendLedger.objects.filter(user=user)},
+            {("Food", 3): Decimal("0.00"), ("Rent", 4): Decimal("25.00")},
+        )
+        self.assertEqual(
+            dict(DailyCashFlow.objects.filter(account=account).values_list("date", "expense")),
+            {date(2024, 3, 10): Decimal("0.00"), date(2024, 4, 2): Decimal("25.00")},
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SpendLedgerTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.account = Account.objects.create(
+            user=self.user, name="Main", type=AccountType.BANK, balance=Decimal("500.00"), currency_id="USD",
+        )
+        self.food, self.rent = (Category.objects.create(user=self.user, name=name) for name in ("Food", "Rent"))
+
+    def expense(self, amount, category=None, type=TransactionType.EXPENSE):
+        return Transaction.objects.create(
+            user=self.user, account=self.account, category=category or self.food, type=type,
+            amount=Decimal(amount), currency_id="USD", transaction_date=date(2024, 3, 10),
+        )
+
+    def ledger(self):
+        return {
+            row.category.name: row.amount
+            for row in SpendLedger.objects.filter(user=self.user, year=2024, month=3).select_related("category")
+        }
+
+    def test_expenses_add_up_and_income_is_ignored(self):
+        self.expense("40.00")
+        self.expense("15.50")
+        self.expense("99.00", type=TransactionType.INCOME)
+        self.assertEqual(self.ledger(), {"Food": Decimal("55.50")})
+        self.assertEqual(spend_ledger.get_spent(self.user, self.food.pk, 2024, 3), Decimal("55.50"))
+
+    def test_splits_move_spend_between_categories(self):
+        tx = self.expense("100.00")
+        split = TransactionSplit.objects.create(transaction=tx, category=self.rent, amount=Decimal("30.00"))
+        self.assertEqual(self.ledger(), {"Food": Decimal("70.00"), "Rent": Decimal("30.00")})
+
+        split.amount = Decimal("45.00")
+        split.save()
+        self.assertEqual(self.ledger(), {"Food": Decimal("55.00"), "Rent": Decimal("45.00")})
+
+        split.delete()
+        self.assertEqual(self.ledger(), {"Food": Decimal("100.00"), "Rent": Decimal("0.00")})
+
+    def test_soft_and_hard_deletes_reverse_the_spend(self):
+        self.expense("10.00")
+        soft, hard = self.expense("20.00"), self.expense("30.00")
+        soft.is_deleted = True
+        soft.save()
+        self.assertEqual(self.ledger(), {"Food": Decimal("40.00")})
+        hard.delete()
+        self.assertEqual(self.ledger(), {"Food": Decimal("10.00")})
+
+    def test_bulk_created_rows_and_rebuild_match_the_recomputation(self):
+        self.expense("10.00")
+        rows = Transaction.objects.bulk_create([
+            Transaction(
+                user=self.user, account=self.account, category=self.rent, type=TransactionType.EXPENSE,
+                amount=Decimal("25.00"), currency_id="USD", transaction_date=date(2024, 3, day),
+            )
+            for day in (1, 2)
+        ])
+        # bulk_create signals ma kiciyo: drift ayaa jira ilaa record_transactions
+        _, drift = spend_ledger.find_drift(self.user.pk)
+        self.assertEqual(len(drift), 1)
+        spend_ledger.record_transactions(rows)
+        self.assertEqual(spend_ledger.find_drift(self.user.pk)[1], [])
+
+        SpendLedger.objects.filter(user=self.user, category=self.food).update(amount=Decimal("999"))
+        self.assertEqual(len(spend_ledger.find_drift(self.user.pk)[1]), 1)
+        spend_ledger.rebuild(self.user.pk)
+        self.assertEqual(self.ledger(), {"Food": Decimal("10.00"), "Rent": Decimal("50.00")})
+        self.assertEqual(spend_ledger.find_drift(self.user.pk)[1], [])
+
+
+# ---------------- Audit log ----------------
+def audit_inserts(queries):
+    table = connection.ops.quote_name(AuditLog._meta.db_table)
+    return [q["sql"] for q in queries if q["sql"].startswith(f"INSERT INTO {table}")]
+
+
+@override_settings(CACHES=LOCMEM_CACHES, AUDIT_WRITE_MODE="buffered")
+class AuditBatchTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+
+    def record(self, count):
+        for i in range(count):
+            create_audit(
+                user_id=self.user.pk, table_name="accounts", record_id=self.user.pk,
+                action="UPDATE", new_data={"n": i},
+            )
+
+    def test_no_writes_before_commit_and_one_bulk_create_on_commit(self):
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                self.record(5)
+                # Commit ka hor: wax lama qorin
+                self.assertEqual(audit_inserts(queries.captured_queries), [])
+                self.assertFalse(AuditLog.objects.filter(user=self.user).exists())
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(len(audit_inserts(queries.captured_queries)), 1)
+        self.assertEqual(AuditLog.objects.filter(user=self.user).count(), 5)
+
+    def test_entries_from_a_rolled_back_savepoint_are_not_written(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.record(1)
+            try:
+                with dbtx.atomic():
+                    create_audit(
+                        user_id=self.user.pk, table_name="accounts", record_id=self.user.pk,
+                        action="CREATE", new_data={"n": "rolled back"},
+                    )
+                    raise IntegrityError("duplicate key")
+            except IntegrityError:
+                pass
+            with dbtx.atomic():
+                create_audit(
+                    user_id=self.user.pk, table_name="accounts", record_id=self.user.pk,
+                    action="UPDATE", new_data={"n": "released"},
+                )
+
+        written = AuditLog.objects.filter(user=self.user).values_list("new_data", flat=True)
+        self.assertCountEqual(written, [{"n": 0}, {"n": "released"}])
+
+
+@override_settings(CACHES=LOCMEM_CACHES, AUDIT_WRITE_MODE="buffered")
+class AuditRollbackTests(TransactionTestCase):
+    def setUp(self):
+        self.user = make_user()
+
+    def record(self, label):
+        create_audit(
+            user_id=self.user.pk, table_name="accounts", record_id=self.user.pk,
+            action="UPDATE", new_data={"n": label},
+        )
+
+    def test_rolled_back_transaction_writes_nothing_and_leaves_no_stale_batch(self):
+        try:
+            with dbtx.atomic():
+                self.record("rolled back")
+                raise IntegrityError("duplicate key")
+        except IntegrityError:
+            pass
+        self.assertFalse(AuditLog.objects.filter(user=self.user).exists())
+
+        # Transaction-ka xiga batch cusub ayuu helaa (kii hore lama dib u isticmaalo)
+        with dbtx.atomic():
+            self.record("committed")
+            self.assertFalse(AuditLog.objects.filter(user=self.user).exists())
+        self.assertEqual(list(AuditLog.objects.filter(user=self.user).values_list("new_data", flat=True)), [
+            {"n": "committed"},
+        ])
+
+    @override_settings(AUDIT_WRITE_MODE="celery")
+    def test_celery_mode_writes_inline_when_the_broker_is_down(self):
+        with mock.patch("core.tasks.write_audit_logs_task.delay", side_effect=ConnectionError("broker down")), \
+                self.assertLogs("core.audit", "WARNING"):
+            with dbtx.atomic():
+                self.record("inline")
+        self.assertEqual(AuditLog.objects.filter(user=self.user).count(), 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, AUDIT_WRITE_MODE="buffered")
+class TransactionAuditQueryTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.account = Account.objects.create(
+            user=self.user, name="Main", type=AccountType.BANK, balance=Decimal("500.00"), currency_id="USD",
+        )
+        self.category = Category.objects.create(user=self.user, name="Food")
+        # Spend ledger / cash flow rows-ka maanta hore u samee, si save kasta isku qiyaas u yeesho
+        self.new_transaction().save()
+
+    def new_transaction(self):
+        return Transaction(
+            user=self.user, account=self.account, category=self.category, type=TransactionType.EXPENSE,
+            amount=Decimal("12.50"), currency_id="USD", description="Lunch", transaction_date=date.today(),
+        )
+
+    def save_queries(self, tx):
+        with CaptureQueriesContext(connection) as queries:
+            tx.save()
+        return len(queries.captured_queries)
+
+    def create_and_update_queries(self):
+        tx = self.new_transaction()
+        created = self.save_queries(tx)
+        tx = Transaction.objects.get(pk=tx.pk)
+        tx.description = "Dinner"
+        return created, self.save_queries(tx)
+
+    def test_payload_reads_fk_ids_only(self):
+        tx = self.new_transaction()
+        tx.save()
+        fresh = Transaction.objects.get(pk=tx.pk)
+        with self.assertNumQueries(0):
+            data = transaction_audit_data(fresh)
+        self.assertEqual(data["account"], str(self.account.pk))
+        self.assertEqual(data["category"], str(self.category.pk))
+
+    def test_audit_adds_no_queries_to_create_or_update(self):
+        with_audit = self.create_and_update_queries()
+        post_save.disconnect(audit_transaction, sender=Transaction)
+        try:
+            without_audit = self.create_and_update_queries()
+        finally:
+            post_save.connect(audit_transaction, sender=Transaction)
+        self.assertEqual(with_audit, without_audit)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, ARCHIVE_ROOT=tempfile.mkdtemp(), ARCHIVE_AFTER_MONTHS=3)
+class AuditLogArchiveListTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        old = datetime(2020, 3, 10, tzinfo=dt_timezone.utc)
+        for i in range(3):
+            AuditLog.objects.create(
+                user=self.user, table_name="accounts", record_id=uuid.uuid4(), action="UPDATE",
+                changed_at=old.replace(day=10 + i),
+            )
+        archive_user_month(ArchiveKind.AUDIT_LOGS, self.user.pk, 2020, 3)
+        self.live = AuditLog.objects.create(
+            user=self.user, table_name="budgets", record_id=uuid.uuid4(), action="CREATE",
+        )
+
+    def test_list_reads_archived_months_when_the_range_reaches_them(self):
+        self.assertEqual(AuditLog.objects.filter(user=self.user).count(), 1)
+
+        response = self.client.get("/api/audit-logs/", {"start_date": "2020-01-01"})
+        self.assertEqual(response.data["count"], 4)
+        self.assertEqual(response.data["results"][0]["id"], str(self.live.pk))
+        self.assertEqual(
+            [row["changed_at"][:10] for row in response.data["results"][1:]],
+            ["2020-03-12", "2020-03-11", "2020-03-10"],
+        )
+
+        response = self.client.get("/api/audit-logs/", {"start_date": "2020-01-01", "table_name": "accounts"})
+        self.assertEqual(response.data["count"], 3)
+
+        # Range-ku cutoff-ka ma dhaafo: archive lama furo
+        response = self.client.get("/api/audit-logs/")
+        self.assertEqual(response.data["count"], 1)
+
+    def test_keyset_pages_continue_into_the_archive(self):
+        seen, url = [], "/api/audit-logs/?start_date=2020-01-01&pagination=cursor"
+        with mock.patch.object(KeysetPagination, "page_size", 2):
+            while url:
+                response = self.client.get(url)
+                seen += [row["id"] for row in response.data["results"]]
+                url = response.data["next"]
+        self.assertEqual(len(seen), 4)
+        self.assertEqual(len(set(seen)), 4)
+
+    def test_keyset_page_stops_before_older_months(self):
+        for day in (5, 6):
+            AuditLog.objects.create(
+                user=self.user, table_name="accounts", record_id=uuid.uuid4(), action="UPDATE",
+                changed_at=datetime(2020, 2, day, tzinfo=dt_timezone.utc),
+            )
+        archive_user_month(ArchiveKind.AUDIT_LOGS, self.user.pk, 2020, 2)
+
+        opened = []
+        real = archive.iter_archived_lines
+
+        def spy(user, kind, year, month):
+            opened.append((year, month))
+            return real(user, kind, year, month)
+
+        with mock.patch.object(KeysetPagination, "page_size", 2), \
+                mock.patch.object(archive, "iter_archived_lines", spy):
+            first = self.client.get("/api/audit-logs/?start_date=2020-01-01&pagination=cursor")
+            self.assertEqual(opened, [(2020, 3)])
+            # Bogga xiga: cursor-ku March buu ku jiraa, bilo ka cusub lama furo
+            opened.clear()
+            second = self.client.get(first.data["next"])
+        self.assertEqual(opened, [(2020, 3), (2020, 2)])
+        self.assertEqual([row["changed_at"][:10] for row in second.data["results"]], ["2020-03-11", "2020-03-10"])
+
+        # Page-number count-ku bil dhan index-ka ayuu ka qaataa
+        self.assertEqual(archive.count_archived_rows(
+            self.user, ArchiveKind.AUDIT_LOGS, datetime(2020, 1, 1, tzinfo=dt_timezone.utc)
+        ), 5)
+        response = self.client.get("/api/audit-logs/", {"start_date": "2020-01-01"})
+        self.assertEqual(response.data["count"], 6)
+
+    @override_settings(ARCHIVE_AFTER_MONTHS=1200)
+    def test_months_archived_after_the_cutoff_are_still_listed(self):
+        # Retention-ku (AUDIT_RETENTION_MONTHS < ARCHIVE_AFTER_MONTHS) bil cutoff-ka ka cusub ayuu archive gareeyay
+        response = self.client.get("/api/audit-logs/", {"start_date": "2020-01-01"})
+        self.assertEqual(response.data["count"], 4)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, ARCHIVE_ROOT=tempfile.mkdtemp())
+class AuditRetentionTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        for day in (3, 4):
+            AuditLog.objects.create(
+                user=self.user, table_name="accounts", record_id=uuid.uuid4(), action="UPDATE",
+                changed_at=datetime(2020, 3, day, tzinfo=dt_timezone.utc),
+            )
+        self.partition = audit_partitions.create_partition(date(2020, 3, 1))
+
+    def test_archive_writes_the_rows_before_dropping_the_partition(self):
+        removed = audit_partitions.apply_retention(1, "archive", today=date(2020, 5, 20))
+        self.assertEqual(removed, [self.partition])
+        self.assertNotIn(date(2020, 3, 1), audit_partitions.attached_partitions())
+        self.assertFalse(AuditLog.objects.filter(user=self.user).exists())
+
+        archived = ArchivedMonth.objects.get(user=self.user, kind=ArchiveKind.AUDIT_LOGS, year=2020, month=3)
+        self.assertEqual(archived.row_count, 2)
+        rows = archived_rows(self.user, ArchiveKind.AUDIT_LOGS, datetime(2020, 1, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual([row.changed_at.day for row in rows], [4, 3])
+
+    def test_drop_leaves_no_archive(self):
+        audit_partitions.apply_retention(1, "drop", today=date(2020, 5, 20))
+        self.assertNotIn(date(2020, 3, 1), audit_partitions.attached_partitions())
+        self.assertFalse(ArchivedMonth.objects.exists())
+
+
+# ---------------- Notifications ----------------
+@override_settings(CACHES=LOCMEM_CACHES)
+class UnreadCountAuthTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        Notification.objects.create(user=self.user, type=NotificationType.BUDGET, message="Food 90%")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+
+    def test_unread_count_rejects_inactive_users(self):
+        for url in ("/api/notifications/unread_count/", "/api/notifications/count_unread/"):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data["unread_count"], 1)
+
+        # Token-ku wali wuu shaqeeyaa (ma dhicin), laakiin user-ka waa la xannibay
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        for url in ("/api/notifications/unread_count/", "/api/notifications/count_unread/"):
+            self.assertEqual(self.client.get(url).status_code, 401)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class UnreadCounterSeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user()
+        Notification.objects.create(user=self.user, type=NotificationType.BUDGET, message="Food 90%")
+
+    def test_miss_seeds_the_counter_and_writes_keep_it_current(self):
+        self.assertEqual(unread_counter.get(self.user.pk), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.create(user=self.user, type=NotificationType.BUDGET, message="Rent 95%")
+        with self.assertNumQueries(0):
+            self.assertEqual(unread_counter.get(self.user.pk), 2)
+
+    def test_write_during_the_count_is_not_lost(self):
+        real = unread_counter.count_from_db
+
+        def racing_count(user_id):
+            count = real(user_id)
+            # Writer kale ayaa commit gareeyay COUNT-ka kadib, incr-kiisuna key maqan buu helay
+            Notification.objects.create(user=self.user, type=NotificationType.BUDGET, message="Rent 95%")
+            unread_counter._apply({str(user_id): 1})
+            return count
+
+        with mock.patch.object(unread_counter, "count_from_db", side_effect=racing_count):
+            self.assertEqual(unread_counter.get(self.user.pk), 1)
+        # Seed-ka lama cache gareyn: akhriska xiga DB-ga ayuu tirinayaa
+        self.assertIsNone(cache.get(unread_counter._key(self.user.pk)))
+        self.assertEqual(unread_counter.get(self.user.pk), 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class NotificationStreamTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.sent = [
+            Notification.objects.create(user=self.user, type=NotificationType.BUDGET, message=f"Alert {i}")
+            for i in range(3)
+        ]
+
+    async def test_replay_is_anchored_on_created_at(self):
+        # Email-ka oo la diray (ama wax kale) sent_at ha beddelo: replay-gu isma beddelo
+        first = self.sent[0]
+        await Notification.objects.filter(pk=first.pk).aupdate(sent_at=first.sent_at + timedelta(days=1))
+        events = await notification_stream.replay(self.user.pk, str(first.pk))
+        self.assertEqual([event_id for event_id, _ in events], [str(n.pk) for n in self.sent[1:]])
+
+    async def test_stream_rejects_inactive_users(self):
+        token = AccessToken.for_user(self.user)
+        await User.objects.filter(pk=self.user.pk).aupdate(is_active=False)
+        response = await self.async_client.get("/api/notifications/stream/", {"token": str(token)})
+        self.assertEqual(response.status_code, 401)
+
+    async def test_asgi_process_serves_only_the_stream(self):
+        from finance_project.asgi import application
+
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        scope = {"type": "http", "method": "GET", "path": "/api/transactions/export/", "headers": []}
+        await application(scope, receive, send)
+        self.assertEqual(sent[0]["status"], 404)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BudgetAlertDigestTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        User.objects.filter(pk=self.user.pk).update(notification_digest=True)
+        today = date.today()
+        self.budgets = {}
+        for name, spent in (("Food", "95.00"), ("Rent", "10.00")):
+            category = Category.objects.create(user=self.user, name=name)
+            self.budgets[name] = Budget.objects.create(
+                user=self.user, category=category, month=today.month, year=today.year,
+                amount=Decimal("100.00"), currency_id="USD",
+            )
+            SpendLedger.objects.create(
+                user=self.user, category=category, year=today.year, month=today.month, amount=Decimal(spent),
+            )
+
+    def digests(self):
+        return list(
+            Notification.objects.filter(user=self.user, related_id__isnull=True)
+            .order_by("created_at").values_list("related_ids", flat=True)
+        )
+
+    def test_collapse_digests_groups_only_digest_users(self):
+        other = make_user("other")
+        events = [
+            Notification(user_id=self.user.pk, type=NotificationType.BUDGET, message="90%", related_id=uuid.uuid4()),
+            Notification(user_id=other.pk, type=NotificationType.BUDGET, message="80%", related_id=uuid.uuid4()),
+            Notification(user_id=self.user.pk, type=NotificationType.BUDGET, message="100%", related_id=uuid.uuid4()),
+        ]
+        subjects = {event.id: f"Budget {i}" for i, event in enumerate(events)}
+        immediate, digests = collapse_digests(
+            events, subjects, {self.user.pk}, NotificationType.BUDGET, "{count} budget alerts today",
+        )
+        self.assertEqual(immediate, [events[1]])
+        digest, = digests
+        self.assertEqual((digest.user_id, digest.related_id), (self.user.pk, None))
+        self.assertEqual(digest.related_ids, [str(events[0].related_id), str(events[2].related_id)])
+        self.assertEqual(digest.message, "• Budget 0\n  90%\n• Budget 2\n  100%")
+        self.assertEqual(subjects[digest.id], "2 budget alerts today")
+
+    def test_budget_crossing_later_in_the_day_is_still_alerted(self):
+        food, rent = str(self.budgets["Food"].pk), str(self.budgets["Rent"].pk)
+        run_budget_alerts()
+        self.assertEqual(self.digests(), [[food]])
+
+        SpendLedger.objects.filter(category=self.budgets["Rent"].category).update(amount=Decimal("80.00"))
+        run_budget_alerts()
+        self.assertEqual(self.digests(), [[food], [rent]])
+
+        # Labadaba maanta waa la sheegay
+        self.assertEqual(run_budget_alerts()["notifications"], 0)
+        self.assertEqual(len(self.digests()), 2)
+
+
+# ---------------- Emails ----------------
+class EmailRenderingTests(TestCase):
+    def test_cached_templates_match_django_rendering(self):
+        values = {
+            "subject": "Budget <alert>", "message": "Food: 90%\nRent: 100%", "action_url": "https://x/1",
+            "unsubscribe_url": "https://x/u", "settings_url": "https://x/s", "support_url": "https://x/h",
+            "transaction_name": "Rent", "transaction_amount": "10.00", "transaction_currency": "USD",
+        }
+        for email_type, name in email_rendering.HTML_TEMPLATES.items():
+            with self.subTest(email_type=email_type):
+                text, html = email_rendering.render(email_type, values)
+                self.assertEqual(html, render_to_string(name, values))
+                self.assertNotIn("{%", text)
+                self.assertNotIn("&lt;", text)  # plain text lama escape gareeyo
+        self.assertIs(email_rendering.compiled("digest"), email_rendering.compiled("digest"))
+
+    def test_every_email_type_in_use_has_a_template(self):
+        self.assertEqual(
+            email_rendering.compiled("recurring").html.template.name, "emails/recurring_notification.html",
+        )
+        with self.assertRaises(email_rendering.UnknownEmailType):
+            email_rendering.render("payday", {})
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES, EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend", EMAIL_MAX_ATTEMPTS=3,
+)
+class EmailOutboxTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+
+    def queue(self, count):
+        rows = []
+        for i in range(count):
+            notification = Notification.objects.create(
+                user=self.user, type=NotificationType.BUDGET, message=f"Food {90 + i}%",
+                sent_at=datetime(2024, 1, 1, tzinfo=dt_timezone.utc),
+            )
+            rows.append(EmailOutbox.objects.create(
+                user=self.user, subject="Budget alert", message=notification.message,
+                notification_id=notification.id,
+            ))
+        return rows
+
+    def test_each_batch_uses_one_connection(self):
+        self.queue(5)
+        with mock.patch.object(email_outbox, "get_connection", wraps=get_connection) as opened:
+            totals = email_outbox.drain(batch_size=2)
+        self.assertEqual(opened.call_count, 3)
+        self.assertEqual((totals["batches"], totals["sent"]), (3, 5))
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertFalse(EmailOutbox.objects.exclude(status=EmailStatus.SENT).exists())
+
+    def test_sent_email_flags_the_notification_without_touching_sent_at(self):
+        row, = self.queue(1)
+        email_outbox.drain()
+        notification = Notification.objects.get(pk=row.notification_id)
+        self.assertTrue(notification.email_sent)
+        self.assertEqual(notification.sent_at, datetime(2024, 1, 1, tzinfo=dt_timezone.utc))
+
+    def test_undeliverable_batch_does_not_stop_the_drain(self):
+        nobody = make_user("nobody")
+        User.objects.filter(pk=nobody.pk).update(email="")
+        EmailOutbox.objects.create(
+            user=nobody, subject="Budget alert", message="Food 95%", next_attempt_at=timezone.now() - timedelta(minutes=5),
+        )
+        self.queue(1)
+        totals = email_outbox.drain(batch_size=1)
+        self.assertEqual((totals["batches"], totals["failed"], totals["sent"]), (2, 1, 1))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_failed_send_backs_off_then_gives_up(self):
+        row, = self.queue(1)
+        with mock.patch.object(locmem.EmailBackend, "send_messages", side_effect=SMTPException("421 try later")):
+            for attempt in (1, 2):
+                before = timezone.now()
+                email_outbox.drain()
+                row.refresh_from_db()
+                self.assertEqual((row.status, row.attempts), (EmailStatus.PENDING, attempt))
+                self.assertIn("421", row.last_error)
+                delay = timedelta(seconds=email_outbox.backoff(attempt))
+                self.assertTrue(before + delay <= row.next_attempt_at <= timezone.now() + delay)
+                # Backoff-ka ha sugin: row-ka hadda u diyaari
+                EmailOutbox.objects.filter(pk=row.pk).update(next_attempt_at=timezone.now())
+
+            email_outbox.drain()
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.attempts), (EmailStatus.FAILED, 3))
+        self.assertEqual(mail.outbox, [])
+        self.assertFalse(Notification.objects.get(pk=row.notification_id).email_sent)
+
+    @override_settings(EMAIL_RETRY_BASE_SECONDS=60, EMAIL_RETRY_MAX_SECONDS=300)
+    def test_backoff_doubles_up_to_the_cap(self):
+        self.assertEqual([email_outbox.backoff(attempt) for attempt in range(1, 6)], [60, 120, 240, 300, 300])
+
+    @override_settings(EMAIL_SENDING_TIMEOUT=600)
+    def test_claim_takes_due_and_stale_rows_only(self):
+        due, later, stale, sending = self.queue(4)
+        now = timezone.now()
+        EmailOutbox.objects.filter(pk=later.pk).update(next_attempt_at=now + timedelta(minutes=5))
+        EmailOutbox.objects.filter(pk=stale.pk).update(status=EmailStatus.SENDING, locked_at=now - timedelta(minutes=11))
+        EmailOutbox.objects.filter(pk=sending.pk).update(status=EmailStatus.SENDING, locked_at=now - timedelta(minutes=1))
+
+        claimed = email_outbox.claim_batch(10)
+        self.assertCountEqual([row.pk for row in claimed], [due.pk, stale.pk])
+        self.assertTrue(all(row.status == EmailStatus.SENDING and row.locked_at for row in claimed))
+        # Mar labaad: kuwii la qaatay weli waa Sending oo cusub
+        self.assertEqual(email_outbox.claim_batch(10), [])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class EmailOutboxClaimTests(TransactionTestCase):
+    def test_rows_locked_by_another_drain_are_skipped(self):
+        user = make_user()
+        rows = [EmailOutbox.objects.create(user=user, subject="Budget alert", message=f"#{i}") for i in range(4)]
+        locked, release = threading.Event(), threading.Event()
+
+        def other_drain():
+            try:
+                with dbtx.atomic():
+                    list(EmailOutbox.objects.select_for_update().filter(pk__in=[rows[0].pk, rows[1].pk]))
+                    locked.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=other_drain)
+        thread.start()
+        try:
+            self.assertTrue(locked.wait(10))
+            claimed = email_outbox.claim_batch(10)
+        finally:
+            release.set()
+            thread.join()
+        self.assertCountEqual([row.pk for row in claimed], [rows[2].pk, rows[3].pk])
+
+
+# ---------------- Recurring transactions ----------------
+def make_bill(user, account, **fields):
+    fields.setdefault("next_due_date", date(2024, 1, 15))
+    return RecurringBill.objects.create(
+        user=user, account=account, name=fields.pop("name", "Rent"), amount=Decimal("50.00"), currency_id="USD",
+        type=TransactionType.EXPENSE, frequency="Monthly", start_date=date(2024, 1, 15), **fields,
+    )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RecurringGenerationTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.account = Account.objects.create(
+            user=self.user, name="Main", type=AccountType.BANK, balance=Decimal("500.00"), currency_id="USD",
+        )
+
+    def test_missed_periods_are_caught_up(self):
+        bill = make_bill(self.user, self.account)
+        stats = generate_recurring_chunk([str(bill.pk)], today=date(2024, 4, 20))
+        self.assertEqual((stats["bills"], stats["transactions"]), (1, 4))
+        self.assertEqual(
+            list(Transaction.objects.filter(recurring_bill=bill).order_by("transaction_date")
+                 .values_list("transaction_date", flat=True)),
+            [date(2024, 1, 15), date(2024, 2, 15), date(2024, 3, 15), date(2024, 4, 15)],
+        )
+        bill.refresh_from_db()
+        self.assertEqual((bill.last_generated_date, bill.next_due_date), (date(2024, 4, 15), date(2024, 5, 15)))
+
+        # Mar labaad: wax cusub ma jiraan
+        stats = generate_recurring_chunk([str(bill.pk)], today=date(2024, 4, 20))
+        self.assertEqual(stats["transactions"], 0)
+
+    def test_catch_up_stops_at_end_date(self):
+        bill = make_bill(self.user, self.account, end_date=date(2024, 2, 28))
+        stats = generate_recurring_chunk([str(bill.pk)], today=date(2024, 4, 20))
+        self.assertEqual(stats["transactions"], 2)
+
+    @override_settings(RECURRING_FAN_OUT=False)
+    def test_failed_chunk_does_not_stop_the_others(self):
+        other = make_user("other")
+        other_account = Account.objects.create(
+            user=other, name="Main", type=AccountType.BANK, balance=Decimal("500.00"), currency_id="USD",
+        )
+        bills = [make_bill(self.user, self.account), make_bill(other, other_account)]
+        real = generate_recurring_chunk
+        calls = []
+
+        def flaky(bill_ids, today=None):
+            calls.append(bill_ids)
+            if len(calls) == 1:
+                raise IntegrityError("boom")
+            return real(bill_ids, today)
+
+        with mock.patch("core.tasks.generate_recurring_chunk", side_effect=flaky), \
+                self.assertLogs("core.tasks", "ERROR"):
+            summary = generate_due_recurring_transactions_task(chunk_size=1)
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual((summary["chunks"], summary["failed_chunks"], summary["failed"]), (2, 1, 1))
+        self.assertEqual(summary["bills"], 1)
+        self.assertEqual(Transaction.objects.filter(recurring_bill__in=bills).count(), summary["transactions"])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RecurringClaimTests(TransactionTestCase):
+    def test_locked_bill_is_skipped_not_waited_on(self):
+        user = make_user()
+        account = Account.objects.create(user=user, name="Main", type=AccountType.BANK, currency_id="USD")
+        bill = make_bill(user, account)
+        locked, release = threading.Event(), threading.Event()
+
+        def other_worker():
+            # Worker kale ayaa bill-ka haysta
+            try:
+                with dbtx.atomic():
+                    RecurringBill.objects.select_for_update().get(pk=bill.pk)
+                    locked.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=other_worker)
+        thread.start()
+        try:
+            self.assertTrue(locked.wait(10))
+            stats = generate_recurring_chunk([str(bill.pk)], today=date(2024, 1, 20))
+            self.assertEqual((stats["bills"], stats["transactions"]), (0, 0))
+        finally:
+            release.set()
+            thread.join()
+
+        stats = generate_recurring_chunk([str(bill.pk)], today=date(2024, 1, 20))
+        self.assertEqual((stats["bills"], stats["transactions"]), (1, 1))
+
+
+# ---------------- Transaction import ----------------
+IMPORT_CSV = (
+    "type,amount,transaction_date,account,target_account,category\n"
+    "Income,50,2024-03-01,Main,,\n"
+    "Expense,abc,2024-03-02,Main,,\n"
+    "Expense,10,2024-03-02,Nowhere,,\n"
+    "Expense,500,2024-03-03,Main,,Food\n"
+    "Transfer,20,2024-03-04,Main,Savings,\n"
+    "Expense,5,2024-03-05,Savings,,\n"
+    "expense,15.5,2024-03-06,main,,food\n"
+)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TransactionImportTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.main = Account.objects.create(
+            user=self.user, name="Main", type=AccountType.BANK, balance=Decimal("100.00"), currency_id="USD",
+        )
+        self.savings = Account.objects.create(
+            user=self.user, name="Savings", type=AccountType.SAVINGS, currency_id="USD",
+        )
+        Category.objects.create(user=self.user, name="Food")
+
+    def upload(self, text=IMPORT_CSV):
+        return SimpleUploadedFile("statement.csv", text.encode(), content_type="text/csv")
+
+    def assert_balances(self, main, savings):
+        self.main.refresh_from_db()
+        self.savings.refresh_from_db()
+        self.assertEqual((self.main.balance, self.savings.balance), (Decimal(main), Decimal(savings)))
+
+    def test_bad_rows_are_reported_and_good_rows_posted(self):
+        response = self.client.post("/api/transactions/import/", {"file": self.upload()}, format="multipart")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            (response.data["total_rows"], response.data["imported_rows"], response.data["failed_rows"]), (7, 3, 4),
+        )
+        errors = {error["row"]: error["error"] for error in response.data["errors"]}
+        self.assertEqual(sorted(errors), [3, 4, 5, 7])
+        self.assertIn("amount", errors[3])
+        self.assertIn("Nowhere", errors[4])
+        self.assertIn("Insufficient funds", errors[5])
+        self.assertIn("Saving account", errors[7])
+
+        # 100 + 50 - 20 - 15.50; transfer-ku Savings ayuu galay
+        self.assert_balances("114.50", "20.00")
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(
+            DailyAccountBalance.objects.get(account=self.main, date=date(2024, 3, 4)).balance, Decimal("130.00"),
+        )
+
+    def test_queued_import_reads_the_stored_upload_and_deletes_it(self):
+        with mock.patch("core.views.import_transactions_task") as task, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/transactions/import/?async=true", {"file": self.upload()}, format="multipart",
+            )
+        self.assertEqual(response.status_code, 202)
+        task.delay.assert_called_once_with(response.data["id"])
+        self.assertTrue(TransactionImportChunk.objects.filter(job_id=response.data["id"]).exists())
+
+        job = transaction_import.run_import_job(response.data["id"])
+        self.assertEqual(job.status, ImportStatus.COMPLETED)
+        self.assertEqual((job.total_rows, job.imported_rows, job.failed_rows), (7, 3, 4))
+        self.assertEqual(sorted(error["row"] for error in job.errors), [3, 4, 5, 7])
+        self.assertFalse(TransactionImportChunk.objects.exists())
+        self.assert_balances("114.50", "20.00")
+
+    def test_lines_split_across_stored_chunks_are_rejoined(self):
+        with mock.patch.object(transaction_import, "UPLOAD_CHUNK_BYTES", 16):
+            job = transaction_import.queue_import(self.user, ContentFile(IMPORT_CSV.encode()), "csv")
+        self.assertGreater(job.chunks.count(), 10)
+
+        job = transaction_import.run_import_job(job.pk)
+        self.assertEqual((job.total_rows, job.imported_rows, job.failed_rows), (7, 3, 4))
+        self.assert_balances("114.50", "20.00")
+
+
+# ---------------- Transaction export ----------------
+@override_settings(CACHES=LOCMEM_CACHES)
+class TransactionExportTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.account = Account.objects.create(
+            user=self.user, name="Main", type=AccountType.BANK, balance=Decimal("500.00"), currency_id="USD",
+        )
+        self.food = Category.objects.create(user=self.user, name="Food")
+
+    def add(self, day, type=TransactionType.INCOME, amount="1.00", **fields):
+        return Transaction.objects.create(
+            user=self.user, account=self.account, type=type, amount=Decimal(amount), currency_id="USD",
+            transaction_date=date(2024, 5, day), **fields,
+        )
+
+    def export(self, **params):
+        response = self.client.get("/api/transactions/export/", params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content).decode()
+
+    def test_csv_is_ordered_and_skips_deleted_rows(self):
+        late = self.add(9, description='Salary, "May"')
+        early = self.add(2, type=TransactionType.EXPENSE, amount="12.50", category=self.food)
+        self.add(5, is_deleted=True)
+        other = make_user("farah")
+        Transaction.objects.create(
+            user=other, account=Account.objects.create(user=other, name="Other", type=AccountType.BANK, currency_id="USD"),
+            type=TransactionType.INCOME, amount=Decimal("1.00"), currency_id="USD", transaction_date=date(2024, 5, 3),
+        )
+
+        response, body = self.export()
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertIn('filename="transactions-', response["Content-Disposition"])
+        rows = list(csv.DictReader(body.splitlines()))
+        self.assertEqual(list(rows[0]), list(transaction_export.EXPORT_FIELDS))
+        self.assertEqual([row["id"] for row in rows], [str(early.pk), str(late.pk)])
+        self.assertEqual((rows[0]["amount"], rows[0]["category"], rows[0]["account"]), ("12.50", "Food", "Main"))
+        self.assertEqual(rows[1]["description"], 'Salary, "May"')
+
+    def test_ndjson_applies_the_transaction_filters(self):
+        self.add(1)
+        expense = self.add(2, type=TransactionType.EXPENSE, category=self.food)
+        self.add(20, type=TransactionType.EXPENSE)
+
+        response, body = self.export(export_format="ndjson", type=TransactionType.EXPENSE, max_date="2024-05-10")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row["id"] for row in rows], [str(expense.pk)])
+        self.assertEqual((rows[0]["amount"], rows[0]["transaction_date"]), ("1.00", "2024-05-02"))
+
+    def test_rows_are_written_in_batches(self):
+        for day in range(1, 8):
+            self.add(day)
+        with mock.patch.object(transaction_export, "ROWS_PER_WRITE", 3):
+            response = self.client.get("/api/transactions/export/")
+            chunks = list(response.streaming_content)
+        # Header + 7 rows = 8 lines: 3 + 3 + 2
+        self.assertEqual([chunk.count(b"\n") for chunk in chunks], [3, 3, 2])
+
+    def test_unknown_format_is_rejected(self):
+        response = self.client.get("/api/transactions/export/", {"export_format": "xlsx"})
+        self.assertEqual(response.status_code, 400)
+
+
+# ---------------- Transaction search ----------------
+@override_settings(CACHES=LOCMEM_CACHES)
+class TransactionSearchTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.account = Account.objects.create(
+            user=self.user, name="Main", type=AccountType.BANK, balance=Decimal("500.00"), currency_id="USD",
+        )
+
+    def add(self, description, day=1):
+        return Transaction.objects.create(
+            user=self.user, account=self.account, type=TransactionType.INCOME, amount=Decimal("1.00"),
+            currency_id="USD", transaction_date=date(2024, 5, day), description=description,
+        )
+
+    def search(self, q, **params):
+        response = self.client.get("/api/transactions/", {"q": q, **params})
+        self.assertEqual(response.status_code, 200)
+        return [row["id"] for row in response.data["results"]]
+
+    def test_trigger_keeps_the_vector_current(self):
+        tx = self.add("Coffee shop")
+        bulk, = Transaction.objects.bulk_create([Transaction(
+            user=self.user, account=self.account, type=TransactionType.INCOME, amount=Decimal("1.00"),
+            currency_id="USD", transaction_date=date(2024, 5, 2), description="Suuqa hilibka",
+        )])
+        def matches(text):
+            query = transaction_search.prefix_query(text)
+            return list(Transaction.objects.filter(description_tsv=query).values_list("pk", flat=True))
+
+        self.assertEqual(matches("coff"), [tx.pk])
+        self.assertEqual(matches("hilib"), [bulk.pk])
+
+        tx.description = "Bus ticket"
+        tx.save()
+        self.assertEqual(matches("coffee"), [])
+        self.assertEqual(matches("tick"), [tx.pk])
+
+    def test_every_word_is_a_prefix_and_results_are_ranked(self):
+        once = self.add("Coffee and a bagel", day=9)
+        twice = self.add("Coffee beans for the coffee shop", day=1)
+        self.add("Tea shop", day=5)
+        self.assertEqual(self.search("coff"), [str(twice.pk), str(once.pk)])
+        self.assertEqual(self.search("COFFEE sho!"), [str(twice.pk)])
+        # ?ordering= wuxuu ka adkaadaa relevance-ka
+        self.assertEqual(self.search("coff", ordering="-transaction_date"), [str(once.pk), str(twice.pk)])
+
+    def test_text_without_words_matches_nothing(self):
+        self.add("Coffee")
+        self.assertIsNone(transaction_search.prefix_query("&|!:*"))
+        self.assertEqual(self.search("&|!:*"), [])
+
+    def test_backfill_fills_missing_vectors(self):
+        tx = self.add("Rent payment")
+        # description-ka lama beddelin, markaa trigger-ku ma kaco
+        Transaction.objects.filter(pk=tx.pk).update(description_tsv=None)
+        self.assertEqual(self.search("rent"), [])
+        call_command("backfill_description_tsv", batch_size=1, stdout=StringIO())
+        self.assertEqual(self.search("rent"), [str(tx.pk)])
+
+
+# ---------------- Keyset pagination ----------------
+@override_settings(CACHES=LOCMEM_CACHES)
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.account = Account.objects.create(
+            user=self.user, name="Main", type=AccountType.BANK, currency_id="USD",
+        )
+
+    def add_transactions(self, *days):
+        return [
+            Transaction.objects.create(
+                user=self.user, account=self.account, type=TransactionType.INCOME, amount=Decimal("1.00"),
+                currency_id="USD", transaction_date=date(2024, 5, day),
+            )
+            for day in days
+        ]
+
+    def walk(self, url):
+        seen = []
+        with mock.patch.object(KeysetPagination, "page_size", 2):
+            while url:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn("count", response.data)
+                seen += [row["id"] for row in response.data["results"]]
+                url = response.data["next"]
+        return seen
+
+    def test_cursor_round_trip(self):
+        tx, = self.add_transactions(3)
+        paginator = KeysetPagination()
+        paginator.cursor_field = "transaction_date"
+        token = paginator.encode_cursor(tx)
+        self.assertEqual(paginator.decode_cursor(Transaction, token), (date(2024, 5, 3), tx.pk))
+
+        for bad in ("not-a-cursor", token[:-3]):
+            response = self.client.get("/api/transactions/", {"cursor": bad})
+            self.assertEqual(response.status_code, 404)
+
+    def test_equal_dates_are_split_by_id(self):
+        txs = self.add_transactions(1, 2, 2, 2, 2, 3)
+        seen = self.walk("/api/transactions/?pagination=cursor")
+        expected = sorted(txs, key=lambda tx: (tx.transaction_date, tx.pk), reverse=True)
+        self.assertEqual(seen, [str(tx.pk) for tx in expected])
+
+    def test_keyset_mode_is_opt_in(self):
+        self.add_transactions(1, 2, 3)
+        response = self.client.get("/api/transactions/")
+        self.assertEqual(response.data["count"], 3)
+        self.assertIn("previous", response.data)
+
+        response = self.client.get("/api/transactions/", {"pagination": "cursor"})
+        self.assertEqual(set(response.data), {"next", "results"})
+
+    def test_notifications_walk_created_at(self):
+        now = timezone.now()
+        created = []
+        for minutes in (5, 1, 3, 3):
+            notification = Notification.objects.create(
+                # sent_at-ku si ka soo horjeeda ayuu u socdaa: cursor-ku created_at buu raacaa
+                user=self.user, type=NotificationType.INSIGHT, message="hi", sent_at=now + timedelta(minutes=minutes),
+            )
+            Notification.objects.filter(pk=notification.pk).update(created_at=now - timedelta(minutes=minutes))
+            notification.created_at = now - timedelta(minutes=minutes)
+            created.append(notification)
+        seen = self.walk("/api/notifications/?pagination=cursor")
+        expected = sorted(created, key=lambda n: (n.created_at, n.pk), reverse=True)
+        self.assertEqual(seen, [str(n.pk) for n in expected])
+
+
+# ---------------- Exchange rates ----------------
+def add_rate(base, target, rate, on_date):
+    for code in (base, target):
+        Currency.objects.get_or_create(code=code, defaults={"name": code, "symbol": code})
+    return ExchangeRate.objects.create(
+        base_currency_id=base, target_currency_id=target, rate=Decimal(rate), date=on_date,
+    )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ExchangeRateCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        exchange_rates._local.clear()
+        self.addCleanup(exchange_rates._local.clear)
+        with self.captureOnCommitCallbacks(execute=True):
+            add_rate("USD", "SOS", "570", date(2024, 5, 1))
+
+    def test_reads_are_served_from_memory_then_redis(self):
+        day = date(2024, 5, 10)
+        with self.assertNumQueries(1):
+            self.assertEqual(exchange_rates.get_rate("USD", "SOS", day), Decimal("570"))
+        with self.assertNumQueries(0):
+            self.assertEqual(exchange_rates.get_rate("usd", "sos", day), Decimal("570"))
+
+        # Process cusub (local cache madhan): Redis ayaa graph-ka haya
+        exchange_rates._local.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(exchange_rates.get_rate("USD", "SOS", day), Decimal("570"))
+
+    def test_saving_a_rate_invalidates_both_layers(self):
+        day = date(2024, 5, 10)
+        self.assertEqual(exchange_rates.get_rate("USD", "SOS", day), Decimal("570"))
+        with self.captureOnCommitCallbacks(execute=True):
+            add_rate("USD", "SOS", "575", date(2024, 5, 9))
+        self.assertEqual(exchange_rates.get_rate("USD", "SOS", day), Decimal("575"))
+
+        # Version-ka cusub: Redis keys-kii hore lama akhrinayo
+        exchange_rates._local.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(exchange_rates.get_rate("USD", "SOS", day), Decimal("575"))
+
+    def test_many_dates_load_with_one_query(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            add_rate("USD", "SOS", "580", date(2024, 5, 20))
+        days = [date(2024, 4, 30), date(2024, 5, 10), date(2024, 5, 25)]
+        with self.assertNumQueries(1):
+            graphs = exchange_rates.get_graphs(days)
+        quotes = [graphs[day].resolve("USD", "SOS") for day in days]
+        self.assertIsNone(quotes[0])
+        self.assertEqual([q.rate for q in quotes[1:]], [Decimal("570"), Decimal("580")])
+        with self.assertNumQueries(0):
+            exchange_rates.get_graphs(days)
+
+    def test_cache_outage_falls_back_to_the_database(self):
+        with mock.patch.object(exchange_rates.cache, "get", side_effect=ConnectionError("redis down")), \
+                mock.patch.object(exchange_rates.cache, "set", side_effect=ConnectionError("redis down")), \
+                self.assertLogs("core.services.exchange_rates", "WARNING"):
+            self.assertEqual(exchange_rates.get_rate("USD", "SOS", date(2024, 5, 10)), Decimal("570"))
+
+
+class RateGraphTests(TestCase):
+    def graph(self, *rows):
+        return exchange_rates.RateGraph([(b, t, rate, on_date) for b, t, rate, on_date in rows])
+
+    def test_inverse_edges(self):
+        graph = self.graph(("USD", "SOS", "500", date(2024, 5, 1)))
+        self.assertEqual(graph.resolve("SOS", "USD").rate, Decimal("1") / Decimal("500"))
+        self.assertEqual(graph.resolve("SOS", "USD").path, ("SOS", "USD"))
+        self.assertEqual(graph.resolve("USD", "USD").rate, Decimal("1"))
+
+        # Rate toos ah oo cusub ayaa ka adkaada inverse-ka duugsan
+        graph = self.graph(("USD", "SOS", "500", date(2024, 5, 1)), ("SOS", "USD", "0.0025", date(2024, 4, 1)))
+        self.assertEqual(graph.resolve("SOS", "USD").rate, Decimal("1") / Decimal("500"))
+        graph = self.graph(("USD", "SOS", "500", date(2024, 4, 1)), ("SOS", "USD", "0.0025", date(2024, 5, 1)))
+        self.assertEqual(graph.resolve("SOS", "USD").rate, Decimal("0.0025"))
+
+    def test_cross_rates_prefer_the_pivot(self):
+        graph = self.graph(
+            ("USD", "EUR", "0.5", date(2024, 5, 3)),
+            ("USD", "SOS", "500", date(2024, 5, 1)),
+            ("EUR", "KES", "140", date(2024, 5, 2)),
+            ("KES", "SOS", "4", date(2024, 5, 2)),
+        )
+        # EUR -> SOS: USD (pivot) iyo KES labaduba way xiraan, USD ayaa la doortaa
+        found = graph.resolve("EUR", "SOS")
+        self.assertEqual(
+            (found.rate, found.path, found.as_of), (Decimal("1000"), ("EUR", "USD", "SOS"), date(2024, 5, 1)),
+        )
+        with override_settings(EXCHANGE_RATE_PIVOT="GBP"):
+            self.assertEqual(graph.resolve("EUR", "SOS").path, ("EUR", "KES", "SOS"))
+        # Currency aan rate lahayn: None (convert_many ayaa error u celiya)
+        self.assertIsNone(graph.resolve("KES", "GBP"))
+
+    def test_nearest_earlier_rate_is_used(self):
+        add_rate("USD", "SOS", "560", date(2024, 4, 1))
+        add_rate("USD", "SOS", "570", date(2024, 5, 1))
+        add_rate("USD", "SOS", "580", date(2024, 6, 1))
+        days = [date(2024, 3, 31), date(2024, 4, 15), date(2024, 5, 1), date(2024, 7, 4)]
+        expected = [None, Decimal("560"), Decimal("570"), Decimal("580")]
+        many = exchange_rates._load_rows_many(days)
+        for day, rate in zip(days, expected):
+            for rows in (exchange_rates._load_rows(day), many[day]):
+                found = exchange_rates.RateGraph(rows).resolve("USD", "SOS")
+                self.assertEqual(found and found.rate, rate)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ConvertBatchTests(TestCase):
+    URL = "/api/exchange-rates/convert-batch/"
+
+    def setUp(self):
+        cache.clear()
+        exchange_rates._local.clear()
+        self.addCleanup(exchange_rates._local.clear)
+        self.client = APIClient()
+        self.client.force_authenticate(make_user())
+        add_rate("USD", "SOS", "570", date(2024, 5, 1))
+        add_rate("USD", "SOS", "580", date(2024, 6, 1))
+        add_rate("USD", "EUR", "0.9", date(2024, 5, 1))
+
+    def test_items_are_converted_per_date_with_decimal_results(self):
+        items = [
+            {"amount": "10.005", "from_currency": "usd", "to_currency": "SOS", "date": "2024-05-20"},
+            {"amount": "10.005", "from_currency": "USD", "to_currency": "SOS", "date": "2024-06-02"},
+            {"amount": "1140", "from_currency": "SOS", "to_currency": "EUR", "date": "2024-05-20"},
+            {"amount": "5", "from_currency": "USD", "to_currency": "KES", "date": "2024-05-20"},
+        ]
+        with mock.patch.object(exchange_rates, "_load_rows_many", wraps=exchange_rates._load_rows_many) as load:
+            response = self.client.post(self.URL, {"items": items}, format="json")
+        self.assertEqual(response.status_code, 200)
+        # Laba taariikhood oo kala duwan, hal load
+        load.assert_called_once()
+
+        may, june, cross, missing = response.data["results"]
+        self.assertEqual((may["converted_amount"], may["rate_date"]), ("5702.85", "2024-05-01"))
+        self.assertEqual((june["converted_amount"], june["rate_date"]), ("5802.90", "2024-06-01"))
+        self.assertEqual((cross["converted_amount"], cross["path"]), ("1.80", ["SOS", "USD", "EUR"]))
+        self.assertEqual(missing["error"], "No exchange rate found for USD to KES")
+        self.assertNotIn("converted_amount", missing)
+
+    def test_invalid_payloads_are_rejected(self):
+        for payload in ({"items": []}, {"items": [{"amount": "x", "from_currency": "USD", "to_currency": "SOS"}]}):
+            self.assertEqual(self.client.post(self.URL, payload, format="json").status_code, 400)
+
+
+# ---------------- Converted amounts ----------------
+@override_settings(CACHES=LOCMEM_CACHES)
+class ConvertedAmountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        exchange_rates._local.clear()
+        self.addCleanup(exchange_rates._local.clear)
+        self.user = make_user()
+        add_rate("EUR", "USD", "1.10", date(2024, 5, 1))
+        add_rate("EUR", "USD", "1.20", date(2024, 6, 1))
+        self.euros = Account.objects.create(
+            user=self.user, name="Euro", type=AccountType.BANK, balance=Decimal("500.00"), currency_id="EUR",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, amount, on_date, account=None):
+        response = self.client.post("/api/transactions/", {
+            "account": str((account or self.euros).pk), "type": TransactionType.INCOME,
+            "amount": amount, "transaction_date": on_date,
+        }, format="json")
+        self.assertEqual(response.status_code, 201, response.data)
+        return Transaction.objects.get(pk=response.data["id"])
+
+    def stamp(self, tx):
+        tx.refresh_from_db()
+        return tx.converted_amount, tx.converted_currency_id
+
+    def test_writes_are_stamped_with_the_rate_of_their_date(self):
+        tx = self.post("10.05", "2024-05-20")
+        self.assertEqual(self.stamp(tx), (Decimal("11.06"), "USD"))
+
+        response = self.client.patch(f"/api/transactions/{tx.pk}/", {"transaction_date": "2024-06-02"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.stamp(tx), (Decimal("12.06"), "USD"))
+
+        # Rate ma jiro: lama beddelo, restamp-ka dambe ayaa buuxinaya
+        self.assertEqual(self.stamp(self.post("5.00", "2024-04-01")), (None, None))
+        dollars = Account.objects.create(user=self.user, name="Cash", type=AccountType.CASH, currency_id="USD")
+        self.assertEqual(self.stamp(self.post("7.00", "2024-04-01", dollars)), (Decimal("7.00"), "USD"))
+
+    def test_restamp_fills_late_rates_and_skips_unchanged_rows(self):
+        stamped, missing = self.post("10.00", "2024-05-20"), self.post("10.00", "2024-04-01")
+        with self.captureOnCommitCallbacks(execute=True):
+            add_rate("EUR", "USD", "1.05", date(2024, 3, 1))
+
+        self.assertEqual(converted_amounts.restamp(user_id=self.user.pk, only_missing=True), (1, 1))
+        self.assertEqual(self.stamp(missing), (Decimal("10.50"), "USD"))
+        self.assertEqual(converted_amounts.restamp(user_id=self.user.pk, chunk_size=1), (2, 0))
+        self.assertEqual(self.stamp(stamped), (Decimal("11.00"), "USD"))
+
+    def test_changing_preferred_currency_queues_a_restamp(self):
+        tx = self.post("10.00", "2024-05-20")
+        Currency.objects.get_or_create(code="SOS", defaults={"name": "Somali Shilling", "symbol": "Sh"})
+        with self.captureOnCommitCallbacks(execute=True):
+            add_rate("EUR", "SOS", "620", date(2024, 5, 1))
+
+        user = User.objects.get(pk=self.user.pk)
+        with mock.patch("core.tasks.restamp_converted_amounts_task.delay") as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            user.save()  # currency-gu isma beddelin: restamp ma jiro
+            user.preferred_currency_id = "SOS"
+            user.save()
+        delay.assert_called_once_with(user_id=str(user.pk))
+
+        converted_amounts.restamp(user_id=user.pk)
+        self.assertEqual(self.stamp(tx), (Decimal("6200.00"), "SOS"))
+
+
+# ---------------- Spend tree ----------------
+@override_settings(CACHES=LOCMEM_CACHES)
+class SpendTreeTests(TestCase):
+    START, END = date(2024, 5, 1), date(2024, 5, 31)
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user()
+        self.account = Account.objects.create(
+            user=self.user, name="Main", type=AccountType.BANK, balance=Decimal("900.00"), currency_id="USD",
+        )
+        self.food = Category.objects.create(user=self.user, name="Food")
+        self.groceries = Category.objects.create(user=self.user, name="Groceries", parent=self.food)
+        self.produce = Category.objects.create(user=self.user, name="Produce", parent=self.groceries)
+        self.rent = Category.objects.create(user=self.user, name="Rent")
+
+    def add(self, amount, category, type=TransactionType.EXPENSE, on_date=date(2024, 5, 10), converted=True):
+        return Transaction.objects.create(
+            user=self.user, account=self.account, category=category, type=type, amount=Decimal(amount),
+            currency_id="USD", transaction_date=on_date,
+            converted_amount=Decimal(amount) if converted else None, converted_currency_id="USD" if converted else None,
+        )
+
+    def test_rollup_adds_descendants_into_each_parent(self):
+        self.add("10.00", self.food)
+        self.add("20.00", self.groceries)
+        self.add("5.00", self.produce)
+        self.add("300.00", self.rent)
+        self.add("50.00", self.produce, type=TransactionType.INCOME)
+        self.add("7.00", None)
+        self.add("99.00", self.food, converted=False)
+        self.add("1000.00", self.rent, on_date=date(2024, 6, 1))
+
+        tree = spend_tree.build_tree(self.user, self.START, self.END)
+        rent, food = tree["categories"]
+        groceries, = food["children"]
+        produce, = groceries["children"]
+        self.assertEqual((rent["name"], rent["total_expense"]), ("Rent", 300.0))
+        self.assertEqual((food["expense"], food["total_expense"], food["total_income"]), (10.0, 35.0, 50.0))
+        self.assertEqual((groceries["total_expense"], produce["total_expense"]), (25.0, 5.0))
+        self.assertEqual(tree["uncategorized"], {"expense": 7.0, "income": 0.0})
+        self.assertEqual((tree["total_expense"], tree["total_income"]), (342.0, 50.0))
+        self.assertEqual(tree["unconverted_transactions"], 1)
+
+    def test_splits_move_their_share_to_the_split_category(self):
+        tx = self.add("100.00", self.food)
+        tx.converted_amount = Decimal("50.00")  # tusaale: 100 EUR -> 50 preferred
+        tx.save()
+        TransactionSplit.objects.create(transaction=tx, category=self.rent, amount=Decimal("40.00"))
+
+        tree = spend_tree.build_tree(self.user, self.START, self.END)
+        totals = {node["name"]: node["total_expense"] for node in tree["categories"]}
+        self.assertEqual(totals, {"Food": 30.0, "Rent": 20.0})
+
+    def test_cached_tree_is_dropped_after_a_write(self):
+        self.add("10.00", self.food)
+        self.assertEqual(spend_tree.get_tree(self.user, self.START, self.END)["total_expense"], 10.0)
+        with self.assertNumQueries(0):
+            spend_tree.get_tree(self.user, self.START, self.END)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add("5.00", self.produce)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get("/api/categories/spend-tree/", {"start": "2024-05-01", "end": "2024-05-31"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["total_expense"], 15.0)
+
+    def test_deep_trees_do_not_recurse(self):
+        categories = [{"id": i, "name": f"c{i}", "parent_id": i - 1 if i else None} for i in range(5000)]
+        totals = {(4999, "expense"): Decimal("1"), ("deleted", "income"): Decimal("2")}
+        roots, uncategorized = spend_tree.rollup(categories, totals)
+        self.assertEqual((roots[0]["total_expense"], uncategorized["income"]), (Decimal("1"), Decimal("2")))
@@ -14,6 +14,7 @@ router.register(r"budgets", BudgetViewSet, basename="budget")
 router.register(r"notifications", NotificationViewSet, basename="notification")
 router.register(r"exchange-rates", ExchangeRateViewSet, basename="exchangerate")
 router.register(r"audit-logs", AuditLogViewSet, basename="auditlog")
+router.register(r"reports", ReportViewSet, basename="report")
 
 # nested routes
 split_router = NestedSimpleRouter(router, r"transactions", lookup="transaction")
@@ -45,6 +46,9 @@ auth_urls = [
 
 
 urlpatterns = [
+    # Router-ka ka hor: haddii kale notifications/<pk>/ ayaa "stream" qabanaya.
+    # Production: proxy-ga path-kan wuxuu u diraa process-ka ASGI (stream.sh), ma aha gunicorn
+    path("notifications/stream/", notification_events, name="notification-stream"),
     path("", include(router.urls)),
     path("", include(split_router.urls)),
     *auth_urls
@@ -1,54 +1,182 @@
 # core/utils/notifications.py
+import logging
+
 from celery import shared_task
+from django.conf import settings
 from django.utils import timezone
 from django.contrib.auth import get_user_model
-from ..models import Notification, NotificationType, Budget, RecurringBill, Transaction
-from core.services.email_service import send_notification_email
+from ..models import Notification, NotificationType, Budget
+from core.services import email_outbox, notification_stream, unread_counter
 from django.db import transaction as dbtx 
 from datetime import timedelta, date
 from dateutil.relativedelta import relativedelta
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
 def create_budget_notification(user, subject, message, related_id=None, notification_type=NotificationType.BUDGET):
     """Create in-app and email notification for budget alerts."""
-    notification = Notification.objects.create(
-        user=user,
-        type=notification_type,
-        message=message,
-        related_id=related_id
-    )
+    with dbtx.atomic():
+        notification = Notification.objects.create(
+            user=user,
+            type=notification_type,
+            message=message,
+            related_id=related_id
+        )
+        # Email-ka outbox-ka ayaa la geliyaa; queue-ga emails ayaa diraya
+        email_outbox.enqueue_email(
+            user=user,
+            subject=subject,
+            message=message,
+            notification_id=notification.id,
+        )
     print(f"✅ Budget notification created: {notification.message}")
-    # Send email
-    send_notification_email(
-        user=user,
-        subject=subject,
-        message=message,
-        notification_id=notification.id
-    )
     return notification.id
 
 
+def dispatch_notification_emails(notifications, subjects, email_type="general"):
+    """Queue one outbox email per notification (same DB transaction); the emails queue drains them."""
+    email_outbox.enqueue_notification_emails(notifications, subjects, email_type)
+
+
+# ---------------- Digest ----------------
+def digest_user_ids(user_ids):
+    """The users among user_ids who want one digest notification per run."""
+    return set(
+        User.objects.filter(id__in=set(user_ids), notification_digest=True).values_list("id", flat=True)
+    )
+
+
+def collapse_digests(notifications, subjects, digest_users, notification_type, title):
+    """
+    Replace the unsaved notifications of digest_users with one Notification per
+    user listing every event (related_id stays NULL, related_ids lists the
+    events' related_id). `title` is formatted with the event count for the
+    digest subject. Returns (notifications, digests); subjects gets the digests'
+    subjects added.
+    """
+    immediate, grouped = [], {}
+    for notification in notifications:
+        if notification.user_id in digest_users:
+            grouped.setdefault(notification.user_id, []).append(notification)
+        else:
+            immediate.append(notification)
+
+    digests = []
+    for user_id, events in grouped.items():
+        digest = Notification(
+            user_id=user_id,
+            type=notification_type,
+            message="\n".join(f"• {subjects[event.id]}\n  {event.message}" for event in events),
+            related_id=None,
+            related_ids=[str(event.related_id) for event in events if event.related_id],
+        )
+        digests.append(digest)
+        subjects[digest.id] = title.format(count=len(events))
+    return immediate, digests
+
+
+def save_notifications(notifications, digests, subjects, email_type="general"):
+    """bulk_create both lists, queue their emails (digests use the digest template) and push them to open streams."""
+    Notification.objects.bulk_create(notifications + digests, batch_size=500)
+    unread_counter.created(notifications + digests)
+    notification_stream.publish(notifications + digests)
+    dispatch_notification_emails(notifications, subjects, email_type)
+    dispatch_notification_emails(digests, subjects, email_type="digest")
+
+
+def _process_budget_alert_chunk(budgets, day_start, day_end):
+    """
+    Alert one chunk of budgets: already-sent lookups (2 queries) + bulk_create (1 query).
+    Budgets must carry the spent_total annotation. Users in digest mode get one
+    notification per run for the budgets not yet alerted today (alone or in a digest).
+    """
+    already_sent = {
+        str(related_id)
+        for related_id in Notification.objects.filter(
+            related_id__in=[b.id for b in budgets],
+            type__in=[NotificationType.BUDGET, NotificationType.WARNING],
+            sent_at__gte=day_start,
+            sent_at__lt=day_end,
+        ).values_list("related_id", flat=True)
+    }
+    digest_users = digest_user_ids(b.user_id for b in budgets)
+    if digest_users:
+        # Digest-yada maanta: budgets-ka ay ku jireen mar kale lama sheego
+        for related_ids in Notification.objects.filter(
+            user_id__in=digest_users,
+            related_id__isnull=True,
+            type__in=[NotificationType.BUDGET, NotificationType.WARNING],
+            sent_at__gte=day_start,
+            sent_at__lt=day_end,
+        ).values_list("related_ids", flat=True):
+            already_sent.update(related_ids)
+
+    notifications, subjects = [], {}
+    for budget in budgets:
+        if str(budget.id) in already_sent:
+            continue
+        alert = budget.alert_for(budget.spent_total)
+        if alert is None:
+            continue
+        notification_type, subject, message = alert
+        notification = Notification(
+            user_id=budget.user_id,
+            type=notification_type,
+            message=message,
+            related_id=budget.id,
+        )
+        notifications.append(notification)
+        subjects[notification.id] = subject
+
+    notifications, digests = collapse_digests(
+        notifications, subjects, digest_users, NotificationType.BUDGET, "{count} budget alerts today",
+    )
+    if notifications or digests:
+        with dbtx.atomic():
+            save_notifications(notifications, digests, subjects)
+    return len(notifications) + len(digests)
+
+
+def run_budget_alerts(chunk_size=None):
+    """
+    Set-based daily budget alerts. Budgets are walked in keyset-paginated
+    chunks (ORDER BY user_id, id; user_id > last_user) with their spend annotated
+    from SpendLedger. A user's budgets never straddle two chunks, so a digest
+    covers all of them.
+    """
+    from core.services.budget_service import with_spent_totals
+
+    chunk_size = chunk_size or settings.BUDGET_ALERT_CHUNK_SIZE
+    day_start = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    day_end = day_start + timedelta(days=1)
+
+    base_qs = with_spent_totals(Budget.objects.select_related("category")).order_by("user_id", "id")
+    last_user = None
+    processed = created = 0
+    while True:
+        qs = base_qs.filter(user_id__gt=last_user) if last_user else base_qs
+        chunk = list(qs[:chunk_size])
+        if not chunk:
+            break
+        last = chunk[-1]
+        if len(chunk) == chunk_size:
+            # Budgets-ka user-ka ugu dambeeya ee chunk-ka ka baxay isla chunk-kan ha galaan
+            chunk += list(base_qs.filter(user_id=last.user_id, id__gt=last.id))
+        last_user = last.user_id
+        processed += len(chunk)
+        created += _process_budget_alert_chunk(chunk, day_start, day_end)
+
+    logger.info("Budget alerts: %d budgets checked, %d notifications created", processed, created)
+    return {"budgets": processed, "notifications": created}
+
+
 @shared_task
-def check_budget_notifications():
+def check_budget_notifications(chunk_size=None):
     """Check all budgets and send notifications if needed"""
     print("🚀 Checking budget notifications...")
     try:
-        today = timezone.now().date()
-        
-        for budget in Budget.objects.all():
-            # Check if notification was already sent today using sent_at field
-            notification_exists = Notification.objects.filter(
-                user=budget.user,
-                type=NotificationType.BUDGET,
-                related_id=budget.id,
-                sent_at__date=today  # ← Use sent_at instead of created_at
-            ).exists()
-            
-            # Use check_budget_alerts() instead of is_over_budget()
-            if not notification_exists:
-                budget.check_budget_alerts()  # This handles the notification logic
-                    
+        return run_budget_alerts(chunk_size)
     except Exception as e:
         print(f"❌ Error in check_budget_notifications: {e}")
 
@@ -102,20 +230,21 @@ def create_recurring_bill_notification(user, bill, transaction):
     try:
         message = f"Recurring bill '{bill.name}' of {bill.amount} {bill.currency.code} has been processed."
         
-        notification = Notification.objects.create(
-            user=user,
-            type=NotificationType.RECURRING_BILL,
-            message=message,
-            related_id=transaction.id
-        )
-        
-        # Send email notification
-        send_notification_email(
-            user=user,
-            subject=f"Recurring Bill Processed: {bill.name}",
-            message=message,
-            notification_id=notification.id
-        )
+        with dbtx.atomic():
+            notification = Notification.objects.create(
+                user=user,
+                type=NotificationType.RECURRING_BILL,
+                message=message,
+                related_id=transaction.id
+            )
+
+            # Email notification -> outbox
+            email_outbox.enqueue_email(
+                user=user,
+                subject=f"Recurring Bill Processed: {bill.name}",
+                message=message,
+                notification_id=notification.id,
+            )
         
         print(f"✅ Recurring bill notification created for {bill.name}")
         return notification.id
@@ -127,82 +256,12 @@ def create_recurring_bill_notification(user, bill, transaction):
 
 @shared_task
 def generate_due_recurring_transactions_task():
-    """Find due recurring bills and generate transactions."""
-    today = timezone.now().date()
-    print(f"🔍 Checking for due recurring bills on {today}...")
-    bills = RecurringBill.objects.filter(
-        is_active=True,
-        is_deleted=False,
-        next_due_date__lte=today
-    ).select_related("user", "account", "category", "currency")
-
-    if not bills.exists():
-        print("✅ No due recurring bills found")
-        return "No due bills"
-
-    print(f"📋 Found {bills.count()} due recurring bill(s)")
-    success = 0
-    failed = 0
-    for bill in bills:
-        try:
-            res = generate_single_recurring_tx(bill.id)
-            if res:
-                success += 1
-            else:
-                failed += 1
-        except Exception as e:
-            failed += 1
-            print(f"💥 Error processing bill {bill.id} ({bill.name}): {e}")
-
-    return f"Generated {success} transactions, {failed} failed"
+    """Find due recurring bills and generate transactions (see core.tasks)."""
+    from core.tasks import generate_due_recurring_transactions_task as generate_due
+    return generate_due()
 
 
 def generate_single_recurring_tx(bill_id):
-    """Create a single transaction for a due recurring bill and notify the user."""
-    try:
-        with dbtx.atomic():
-            bill = RecurringBill.objects.select_for_update().get(pk=bill_id)
-
-            # skip if inactive/deleted or no longer due
-            if not bill.is_active or bill.is_deleted:
-                print(f"⏭️ Bill {bill.name} inactive/deleted, skipping")
-                return None
-
-            today = timezone.now().date()
-            if bill.next_due_date is None or bill.next_due_date > today:
-                print(f"⏭️ Bill {bill.name} not due (next_due_date={bill.next_due_date}), skipping")
-                return None
-
-            original_due_date = bill.next_due_date
-
-            tx = Transaction.objects.create(
-                user=bill.user,
-                account=bill.account,
-                category=bill.category,
-                type=bill.type,
-                amount=bill.amount,
-                currency=bill.currency,
-                description=f"[Auto] {bill.name}",
-                transaction_date=original_due_date,
-                is_recurring_instance=True,
-                recurring_bill=bill
-            )
-
-            # update bill dates
-            bill.last_generated_date = original_due_date
-            bill.next_due_date = _next_due(bill.frequency, original_due_date)
-            bill.updated_at = timezone.now()
-            bill.save(update_fields=["last_generated_date", "next_due_date", "updated_at"])
-
-            # create notification + email via reusable helper
-            create_recurring_bill_notification(bill.user, bill, tx)
-
-            print(f"💰 Generated transaction {tx.id} for bill {bill.name}")
-            return str(tx.id)
-
-    except RecurringBill.DoesNotExist:
-        print(f"❌ Bill with ID {bill_id} does not exist")
-        return None
-    except Exception as e:
-        print(f"💥 Unexpected error processing bill {bill_id}: {e}")
-        return None
\ No newline at end of file
+    """Create every due transaction for one recurring bill and notify the user."""
+    from core.tasks import generate_single_recurring_tx as generate_single
+    return generate_single(bill_id)
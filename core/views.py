@@ -1,13 +1,19 @@
 # core/views.py
 from django.shortcuts import render
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
 from django.db.models import Sum, OuterRef, Subquery, F, Value
 from django.db.models.functions import Coalesce
 from django.utils.timezone import now
 from django.db import models
+from django.db import transaction as db_transaction
 from rest_framework import viewsets, mixins, permissions, status
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 from django.contrib.postgres.search import SearchQuery, SearchRank
 # Ku bedel kani:
 from core.tasks import send_email_notification_task, test_notification_task  # ✅ KORRECT
@@ -16,7 +22,7 @@ from django.utils import timezone
 from google.oauth2 import id_token as google_id_token
 from google.auth.transport import requests as google_requests
 from django.contrib.auth import authenticate
-from datetime import timedelta
+from datetime import date as dt_date, timedelta
 from django.shortcuts import get_object_or_404
 
 from django_filters.rest_framework import DjangoFilterBackend
@@ -29,8 +35,12 @@ from .models import *
 from .serializers import *
 from .filters import *
 from .permissions import IsOwner
+from .pagination import KeysetPagination, WithArchivedRows
 from .signals import create_audit
-from .tasks import send_email_notification_task, generate_due_recurring_transactions_task
+from .tasks import send_email_notification_task, generate_due_recurring_transactions_task, import_transactions_task
+from .services.balance_service import InsufficientFunds, debit
+from .services.budget_service import get_budget_summary, get_spend_by_category, with_spent_totals
+from .services import archive, exchange_rates, notification_stream, reports, spend_tree, transaction_export, transaction_import, transaction_search, unread_counter
 from django.conf import settings
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
 from django.contrib.auth import get_user_model
@@ -617,6 +627,16 @@ class CategoryViewSet(OwnedModelViewSet):
     serializer_class = CategorySerializer
     filterset_fields = ["parent"]
 
+    @action(detail=False, methods=["get"], url_path="spend-tree")
+    def spend_tree(self, request):
+        """
+        Expense / income per category with totals rolled up the parent tree,
+        in the preferred currency: ?start=YYYY-MM-DD&end=YYYY-MM-DD (default this month).
+        """
+        query = SpendTreeQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        return Response(spend_tree.get_tree(request.user, query.validated_data["start"], query.validated_data["end"]))
+
 # -------- Accounts --------  
 class AccountViewSet(viewsets.ModelViewSet):
     serializer_class = AccountSerializer
@@ -646,6 +666,8 @@ class TransactionViewSet(viewsets.ModelViewSet):
     ordering_fields = ["transaction_date", "amount"]
     ordering = ["-transaction_date"]
     search_fields = ["description"]
+    pagination_class = KeysetPagination
+    cursor_field = "transaction_date"
 
     def get_queryset(self):
         return Transaction.objects.filter(
@@ -668,8 +690,83 @@ class TransactionViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         show_deleted = self.request.query_params.get('deleted', 'false').lower() == 'true'
         if show_deleted:
-            return Transaction.objects.filter(user=self.request.user, is_deleted=True)
-        return Transaction.objects.filter(user=self.request.user, is_deleted=False)
+            queryset = Transaction.objects.filter(user=self.request.user, is_deleted=True)
+        else:
+            queryset = Transaction.objects.filter(user=self.request.user, is_deleted=False)
+
+        # ?q= : full-text search (GIN index on description_tsv, prefix match)
+        q = self.request.query_params.get("q")
+        if q and self.action == "list":
+            queryset = transaction_search.search(queryset, q)
+        return queryset
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        # Natiijada ?q= waxaa lagu kala horreysiiyaa relevance, haddii ?ordering= la bixin
+        if "rank" in queryset.query.annotations and not self.request.query_params.get("ordering"):
+            queryset = queryset.order_by("-rank", "-transaction_date", "-id")
+        return queryset
+
+    # ---------------- Streaming export ----------------
+    @action(detail=False, methods=["get"], url_path="export")
+    def export(self, request):
+        """
+        Stream every matching transaction as CSV or NDJSON (?export_format=ndjson).
+        Supports the TransactionFilter params (type, account, category, min_date, max_date).
+        """
+        export_format = request.query_params.get("export_format", "csv").lower()
+        if export_format not in transaction_export.FORMATS:
+            return Response(
+                {"detail": "export_format waa in uu noqdaa csv ama ndjson."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        queryset = Transaction.objects.filter(user=request.user, is_deleted=False)
+        filterset = TransactionFilter(request.query_params, queryset=queryset)
+        if not filterset.is_valid():
+            return Response(filterset.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        content_type, extension = transaction_export.FORMATS[export_format]
+        response = StreamingHttpResponse(
+            transaction_export.stream(filterset.qs, export_format, settings.TRANSACTION_EXPORT_CHUNK_SIZE),
+            content_type=content_type,
+        )
+        filename = f"transactions-{timezone.now():%Y%m%d}.{extension}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+    # ---------------- Bulk import ----------------
+    @action(detail=False, methods=["post"], url_path="import", parser_classes=[MultiPartParser, FormParser])
+    def import_transactions(self, request):
+        """
+        Upload a CSV or JSON-lines file (field `file`). Small files are imported
+        immediately; large ones (or ?async=true) are queued and can be polled.
+        """
+        upload = request.FILES.get("file")
+        if not upload:
+            return Response({"detail": "File-ka (file) waa la rabaa."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            file_format = transaction_import.detect_format(upload.name, request.data.get("file_format"))
+        except transaction_import.ImportFormatError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        run_async = request.query_params.get("async", "false").lower() == "true"
+        if run_async or upload.size > settings.TRANSACTION_IMPORT_ASYNC_BYTES:
+            job = transaction_import.queue_import(request.user, upload, file_format)
+            db_transaction.on_commit(lambda: import_transactions_task.delay(str(job.id)))
+            return Response(TransactionImportSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+        try:
+            stats = transaction_import.import_transactions(request.user, upload, file_format)
+        except transaction_import.ImportFormatError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(stats, status=status.HTTP_201_CREATED if stats["imported_rows"] else status.HTTP_200_OK)
+
+    @action(detail=False, methods=["get"], url_path=r"import/(?P<job_id>[0-9a-f-]+)")
+    def import_status(self, request, job_id=None):
+        job = get_object_or_404(TransactionImport, pk=job_id, user=request.user)
+        return Response(TransactionImportSerializer(job).data)
 
 
 
@@ -742,25 +839,18 @@ class RecurringBillViewSet(viewsets.ModelViewSet):
         if bill.is_paid:
             return Response({"detail": "Bill already paid"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # 1️⃣ Check if account is empty first
-        if bill.account.balance <= 0:
-            return Response(
-                {"detail": "Account-kaagu waa faaruq yahay. Fadlan lacag ku shubo si aad biilka u bixiso."},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        # 2️⃣ Check if balance is enough for the bill
-        if bill.account.balance < bill.amount:
-            return Response(
-                {"detail": "Lacagta account-ka kuma filna bixinta biilka."},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
         try:
             with db_transaction.atomic():
-                # Deduct from account
-                bill.account.balance -= Decimal(bill.amount)
-                bill.account.save(update_fields=["balance"])
+                # Deduct from account: check + write hal UPDATE ah (balance >= amount)
+                try:
+                    debit(bill.account, bill.amount)
+                except InsufficientFunds as e:
+                    # 1️⃣ Account faaruq ah  2️⃣ Lacag kuma filna
+                    if e.balance is not None and e.balance <= 0:
+                        detail = "Account-kaagu waa faaruq yahay. Fadlan lacag ku shubo si aad biilka u bixiso."
+                    else:
+                        detail = "Lacagta account-ka kuma filna bixinta biilka."
+                    return Response({"detail": detail}, status=status.HTTP_400_BAD_REQUEST)
 
                 # Mark bill as paid
                 bill.is_paid = True
@@ -822,7 +912,8 @@ class BudgetViewSet(viewsets.ModelViewSet):
     ordering = ["-year", "-month"]
 
     def get_queryset(self):
-        return Budget.objects.filter(user=self.request.user)
+        # spent_total waxaa lagu xisaabiyaa isla query-ga list-ka (ma jiro 2N+1)
+        return with_spent_totals(Budget.objects.filter(user=self.request.user))
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -842,15 +933,11 @@ class BudgetViewSet(viewsets.ModelViewSet):
             year=today.year,
             rollover_enabled=True
         )
+        budgets = list(budgets.select_related("category"))
+        spent_map = get_spend_by_category(user, today.year, today.month, [b.category_id for b in budgets])
         rolled_over = []
         for budget in budgets:
-            spent = Transaction.objects.filter(
-                user=user,
-                category=budget.category,
-                transaction_date__year=budget.year,
-                transaction_date__month=budget.month,
-                type="Expense"
-            ).aggregate(total=Sum("amount"))["total"] or 0
+            spent = spent_map.get(budget.category_id, 0)
 
             remaining = budget.amount - spent
             if remaining > 0:
@@ -866,7 +953,7 @@ class BudgetViewSet(viewsets.ModelViewSet):
                     category=budget.category,
                     month=next_month,
                     year=next_year,
-                    defaults={"amount": remaining, "currency": budget.currency, "rollover_enabled": True}
+                    defaults={"amount": remaining, "currency_id": budget.currency_id, "rollover_enabled": True}
                 )
                 rolled_over.append({"category": budget.category.name, "remaining": remaining})
         return Response({"rolled_over": rolled_over})
@@ -885,34 +972,8 @@ class BudgetViewSet(viewsets.ModelViewSet):
         month = int(request.query_params.get("month") or date.today().month)
         year = int(request.query_params.get("year") or date.today().year)
 
-        budgets = Budget.objects.filter(user=user, month=month, year=year)
-        summary = []
-
-        for budget in budgets:
-            spent = (
-                Transaction.objects.filter(
-                    user=user,
-                    category=budget.category,
-                    transaction_date__year=budget.year,
-                    transaction_date__month=budget.month,
-                    type="Expense"  # ama TransactionType.EXPENSE haddii Enum la isticmaalayo
-                )
-                .aggregate(total=Sum("amount"))["total"] or 0
-            )
-            remaining = budget.amount - spent
-            summary.append({
-                "id": str(budget.id),
-                "category_id": budget.category.id,
-                "category_name": budget.category.name,
-                "budget_amount": float(budget.amount),
-                "total_spent": float(spent),
-                "total_remaining": float(remaining),
-                "currency": budget.currency.code,
-                "rollover_enabled": budget.rollover_enabled,
-                "is_complete": remaining <= 0,
-                "month": budget.month,
-                "year": budget.year,
-            })
+        # Hal grouped query ayaa xisaabisa spent-ka dhammaan budgets-ka
+        summary = get_budget_summary(user, year, month)
 
         return Response({
             "month": month,
@@ -924,6 +985,8 @@ class BudgetViewSet(viewsets.ModelViewSet):
 class NotificationViewSet(viewsets.ModelViewSet):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    cursor_field = "created_at"  # (user, created_at, id) index-ka
     
     def get_queryset(self):
         # Users can only see their own notifications
@@ -946,16 +1009,18 @@ class NotificationViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(unread_notifications, many=True)
         return Response(serializer.data)
     
+    # Badge polling: tirada Redis ayey ka timaadaa (COUNT(*) ma jiro). Authentication-ku waa
+    # JWTAuthentication caadi ah si user la tirtiray ama la xannibay (is_active=False) loo diido.
     @action(detail=False, methods=['get'])
     def count_unread(self, request):
         """Count unread notifications for the current user"""
-        count = self.get_queryset().filter(is_read=False).count()
-        return Response({'unread_count': count})
+        return Response({'unread_count': unread_counter.get(request.user.id)})
     
     @action(detail=False, methods=['post'])
     def mark_all_read(self, request):
         """Mark all notifications as read for the current user"""
         updated = self.get_queryset().filter(is_read=False).update(is_read=True)
+        unread_counter.adjust({request.user.pk: -updated})
         return Response({'status': f'{updated} notifications marked as read'})
     
     @action(detail=True, methods=['post'])
@@ -976,8 +1041,12 @@ class NotificationViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], url_path='unread_count')
     
     def unread_count(self, request):
-        count = self.get_queryset().filter(is_read=False).count()
-        return Response({'unread_count': count})
+        return Response({'unread_count': unread_counter.get(request.user.id)})
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        if not instance.is_read:
+            unread_counter.adjust({instance.user_id: -1})
 
     
     @action(detail=False, methods=['get'])
@@ -996,6 +1065,32 @@ class NotificationViewSet(viewsets.ModelViewSet):
         
         serializer = self.get_serializer(notifications, many=True)
         return Response(serializer.data)
+
+
+# Server-Sent Events (ASGI): notifications cusub si toos ah. EventSource header ma diri
+# karo, sidaas darteed access token-ka ?token= ayaa lagu soo diraa.
+@require_GET
+async def notification_events(request):
+    """GET /api/notifications/stream/?token=<access> - live notifications as text/event-stream"""
+    token = request.GET.get("token") or request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+    try:
+        user_id = AccessToken(token)[jwt_settings.USER_ID_CLAIM]
+    except (TokenError, KeyError):
+        return JsonResponse({"detail": "Token-ka waa khalad ama wuu maqan yahay"}, status=401)
+    # Hal lookup connection kasta: user la tirtiray / la xannibay stream ma furan karo
+    async with notification_stream.db_access():
+        active = await User.objects.filter(pk=user_id, is_active=True).aexists()
+    if not active:
+        return JsonResponse({"detail": "User-ka lama helin ama waa la xannibay"}, status=401)
+
+    last_event_id = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+    response = StreamingHttpResponse(
+        notification_stream.events(user_id, last_event_id),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
     
 # -------- Exchange Rates --------  aqris-only + get rate for given date.
 
@@ -1055,32 +1150,65 @@ class ExchangeRateViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            if from_currency == to_currency:
-                converted_amount = amount
-            else:
-                # Try to find direct rate
-                rate_obj = ExchangeRate.objects.filter(
-                    base_currency__code=from_currency,
-                    target_currency__code=to_currency,
-                    date=date if date else timezone.now().date()
-                ).latest('date')
-                
-                converted_amount = amount * float(rate_obj.rate)
-            
-            return Response({
-                "amount": amount,
-                "from_currency": from_currency,
-                "to_currency": to_currency,
-                "converted_amount": converted_amount,
-                "rate": float(rate_obj.rate) if from_currency != to_currency else 1.0,
-                "date": rate_obj.date if from_currency != to_currency else timezone.now().date()
-            })
-            
-        except ExchangeRate.DoesNotExist:
+            rate_date = dt_date.fromisoformat(date) if date else timezone.now().date()
+        except ValueError:
+            return Response({"error": "date must be YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Rate graph-ka taariikhdaas (cache: process -> Redis): direct, inverse ama via USD,
+        # rate-kii ugu dambeeyay ee ka horreeyay taariikhda haddii maanta la waayo
+        quote = exchange_rates.quote(from_currency, to_currency, rate_date)
+        if quote is None:
             return Response(
                 {"error": f"No exchange rate found for {from_currency} to {to_currency}"},
                 status=status.HTTP_404_NOT_FOUND
             )
+
+        return Response({
+            "amount": amount,
+            "from_currency": from_currency,
+            "to_currency": to_currency,
+            "converted_amount": amount * float(quote.rate),
+            "rate": float(quote.rate),
+            "date": quote.as_of or rate_date,
+            "path": list(quote.path),
+        })
+
+    @action(detail=False, methods=['post'], url_path='convert-batch')
+    def convert_batch(self, request):
+        """
+        Convert many amounts in one call: {"items": [{"amount", "from_currency", "to_currency", "date"?}]}.
+        Rates are loaded once per distinct date; amounts stay Decimal (returned as strings).
+        """
+        serializer = ConvertBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = exchange_rates.convert_many(serializer.validated_data["items"])
+        return Response({"results": ConvertBatchResultSerializer(results, many=True).data})
+
+# -------- Reports --------  Cash flow + net worth (snapshots, preferred currency)
+class ReportViewSet(viewsets.ViewSet):
+    """
+    Reports read from DailyCashFlow / DailyAccountBalance, never from Transaction.
+    Query params: start, end (YYYY-MM-DD), bucket=day|week|month.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def _query(self, request):
+        serializer = ReportQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    @action(detail=False, methods=["get"], url_path="cash-flow")
+    def cash_flow(self, request):
+        query = self._query(request)
+        data = reports.cash_flow(request.user, query["start"], query["end"], query["bucket"])
+        return Response({"start": query["start"], "end": query["end"], **data})
+
+    @action(detail=False, methods=["get"], url_path="net-worth")
+    def net_worth(self, request):
+        query = self._query(request)
+        data = reports.net_worth(request.user, query["start"], query["end"], query["bucket"])
+        return Response({"start": query["start"], "end": query["end"], **data})
+
 # -------- Audit Logs --------  Read-only audit logs for the user
 class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -1089,7 +1217,9 @@ class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = AuditLog.objects.all()
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['table_name', 'record_id', 'action', 'user']
+    filterset_class = AuditLogViewFilter
+    pagination_class = KeysetPagination
+    cursor_field = "changed_at"
     
     def get_serializer_class(self):
         if self.action == 'retrieve':
@@ -1100,3 +1230,59 @@ class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
         # Users can only see their own audit logs
         return AuditLog.objects.filter(user=self.request.user)
 
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+
+        # Date filter-ku wuxuu dhaafay cutoff-ka: bilaha la archive gareeyay sidoo kale ka akhri
+        filterset = self.filterset_class(request.query_params, queryset=queryset, request=request)
+        filterset.is_valid()
+        start, end = filterset.changed_window()
+        kind = ArchiveKind.AUDIT_LOGS
+        # ArchivedMonth-ka ayaa go'aamiya (cutoff-ka settings-ka maaha): retention-ku bilo kale ayuu archive gareyn karaa
+        if start is not None and archive.archived_months(request.user, kind, start, end):
+            predicate = filterset.matches if filterset.row_filters() else None
+
+            def archived(before):
+                until = min((value for value in (end, before) if value), default=None)
+                return archive.iter_archived_rows(request.user, kind, start, until, predicate)
+
+            def archived_count():
+                return archive.count_archived_rows(request.user, kind, start, end, predicate)
+
+            queryset = WithArchivedRows(queryset, archived, archived_count, self.cursor_field)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(queryset, many=True).data)
+
+    @action(detail=False, methods=["get"], url_path="archives")
+    def archives(self, request):
+        """Bilaha la archive gareeyay (xogtoodu hadda kuma jirto database-ka)"""
+        months = (
+            ArchivedMonth.objects.filter(user=request.user, kind=ArchiveKind.AUDIT_LOGS)
+            .values("year", "month")
+            .annotate(row_count=Sum("row_count"))
+            .order_by("-year", "-month")
+        )
+        return Response(list(months))
+
+    @action(detail=False, methods=["get"], url_path="archived")
+    def archived(self, request):
+        """Stream an archived month as NDJSON: ?year=2024&month=3"""
+        try:
+            year, month = int(request.query_params["year"]), int(request.query_params["month"])
+        except (KeyError, ValueError):
+            return Response({"detail": "year iyo month waa la rabaa."}, status=status.HTTP_400_BAD_REQUEST)
+
+        exists = ArchivedMonth.objects.filter(
+            user=request.user, kind=ArchiveKind.AUDIT_LOGS, year=year, month=month
+        ).exists()
+        if not exists:
+            return Response({"detail": "Bishan archive looma hayo."}, status=status.HTTP_404_NOT_FOUND)
+
+        return StreamingHttpResponse(
+            archive.iter_archived_lines(request.user, ArchiveKind.AUDIT_LOGS, year, month),
+            content_type="application/x-ndjson",
+        )
+
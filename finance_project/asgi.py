@@ -13,4 +13,17 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'finance_project.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Process-kan (stream.sh) kaliya SSE stream-ka ayuu u adeegaa. API-ga intiisa kale waa
+# gunicorn (WSGI): StreamingHttpResponse sync ah (exports, archives) ASGI hoostiisa
+# memory-ga ayuu ku buuxsamaa.
+STREAM_PATHS = {"/api/notifications/stream/"}
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "http" and scope["path"] not in STREAM_PATHS:
+        await send({"type": "http.response.start", "status": 404, "headers": [(b"content-type", b"text/plain")]})
+        await send({"type": "http.response.body", "body": b"Not found: only the notifications stream is served here"})
+        return
+    await django_application(scope, receive, send)
@@ -245,6 +245,104 @@ CELERY_BROKER_URL = config("CELERY_BROKER_URL")
 CELERY_RESULT_BACKEND = config("CELERY_RESULT_BACKEND")
 CELERY_TIMEZONE = config("CELERY_TIMEZONE", default="Africa/Mogadishu")
 
+# Cache: Redis-ka broker-ka ayaa dib loo isticmaalaa (CACHE_URL haddii kale la rabo)
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": config("CACHE_URL", default=CELERY_BROKER_URL),
+        "KEY_PREFIX": "finance",
+    }
+}
+
+# Exchange rates cache: process LRU (size/TTL seconds) + Redis timeout
+EXCHANGE_RATE_LOCAL_CACHE_SIZE = config("EXCHANGE_RATE_LOCAL_CACHE_SIZE", default=1024, cast=int)
+EXCHANGE_RATE_LOCAL_TTL = config("EXCHANGE_RATE_LOCAL_TTL", default=60, cast=int)
+EXCHANGE_RATE_CACHE_TIMEOUT = config("EXCHANGE_RATE_CACHE_TIMEOUT", default=60 * 60 * 24, cast=int)
+# Currency-ga dhexe ee triangulation (EUR -> USD -> SOS)
+EXCHANGE_RATE_PIVOT = config("EXCHANGE_RATE_PIVOT", default="USD")
+
+# Transaction.converted_amount restamp: rows per chunk (bulk_update)
+CONVERSION_RESTAMP_CHUNK_SIZE = config("CONVERSION_RESTAMP_CHUNK_SIZE", default=1000, cast=int)
+
+# Spend tree (categories/spend-tree): ilbiriqsiyada cache-ka Redis (write kasta wuu baabi'iyaa)
+SPEND_TREE_CACHE_TIMEOUT = config("SPEND_TREE_CACHE_TIMEOUT", default=60 * 60, cast=int)
+
+# Unread notifications badge: counter-ka Redis (ilbiriqsi); beat-ka ayaa 15-kii daqiiqo la simaha
+NOTIFICATION_UNREAD_CACHE_TIMEOUT = config("NOTIFICATION_UNREAD_CACHE_TIMEOUT", default=60 * 60 * 24, cast=int)
+
+# Notifications SSE stream (ASGI): Redis pub/sub, heartbeat (ilbiriqsi), reconnect (ms),
+# inta Last-Event-ID replay ugu badan, iyo queue-ga client kasta (ka buuxsamo -> dib u xiriir)
+NOTIFICATION_STREAM_REDIS_URL = config("NOTIFICATION_STREAM_REDIS_URL", default=CELERY_BROKER_URL)
+NOTIFICATION_STREAM_HEARTBEAT_SECONDS = config("NOTIFICATION_STREAM_HEARTBEAT_SECONDS", default=15, cast=int)
+NOTIFICATION_STREAM_RETRY_MS = config("NOTIFICATION_STREAM_RETRY_MS", default=5000, cast=int)
+NOTIFICATION_STREAM_REPLAY_LIMIT = config("NOTIFICATION_STREAM_REPLAY_LIMIT", default=100, cast=int)
+NOTIFICATION_STREAM_QUEUE_SIZE = config("NOTIFICATION_STREAM_QUEUE_SIZE", default=100, cast=int)
+# Stream-yada hal mar DB isticmaali kara (process kasta); kadib connection-ka waa la xiraa
+NOTIFICATION_STREAM_DB_CONCURRENCY = config("NOTIFICATION_STREAM_DB_CONCURRENCY", default=10, cast=int)
+
+# Emails-ka waxay leeyihiin queue u gaar ah si alert jobs aysan u sugin SMTP
+CELERY_TASK_ROUTES = {
+    "core.tasks.send_email_notification_task": {"queue": "emails"},
+    "core.tasks.drain_email_outbox_task": {"queue": "emails"},
+}
+
+# Email outbox: backend-ka (tests: locmem / console), batch size, retries iyo backoff
+EMAIL_BACKEND = config("EMAIL_BACKEND", default="django.core.mail.backends.smtp.EmailBackend")
+EMAIL_OUTBOX_BATCH_SIZE = config("EMAIL_OUTBOX_BATCH_SIZE", default=100, cast=int)
+EMAIL_OUTBOX_MAX_BATCHES = config("EMAIL_OUTBOX_MAX_BATCHES", default=20, cast=int)
+EMAIL_MAX_ATTEMPTS = config("EMAIL_MAX_ATTEMPTS", default=5, cast=int)
+EMAIL_RETRY_BASE_SECONDS = config("EMAIL_RETRY_BASE_SECONDS", default=60, cast=int)
+EMAIL_RETRY_MAX_SECONDS = config("EMAIL_RETRY_MAX_SECONDS", default=60 * 60, cast=int)
+EMAIL_SENDING_TIMEOUT = config("EMAIL_SENDING_TIMEOUT", default=10 * 60, cast=int)
+
+# Budget alert job: inta budget ee hal chunk lagu farsameeyo
+BUDGET_ALERT_CHUNK_SIZE = config("BUDGET_ALERT_CHUNK_SIZE", default=500, cast=int)
+
+# Recurring bills: chunk size iyo haddii chunks-ka loo qaybiyo workers badan (chord)
+RECURRING_CHUNK_SIZE = config("RECURRING_CHUNK_SIZE", default=200, cast=int)
+RECURRING_FAN_OUT = config("RECURRING_FAN_OUT", default=False, cast=bool)
+
+# Transaction import: rows per DB batch, iyo file-ka ka weyn tan waxaa loo diraa Celery
+TRANSACTION_IMPORT_BATCH_SIZE = config("TRANSACTION_IMPORT_BATCH_SIZE", default=1000, cast=int)
+TRANSACTION_IMPORT_ASYNC_BYTES = config("TRANSACTION_IMPORT_ASYNC_BYTES", default=1024 * 1024, cast=int)
+
+# Transaction export: rows-ka server-side cursor-ku hal mar keeno
+TRANSACTION_EXPORT_CHUNK_SIZE = config("TRANSACTION_EXPORT_CHUNK_SIZE", default=2000, cast=int)
+
+# Audit logs: "buffered" (hal bulk insert marka transaction-ku commit noqdo),
+# "celery" (buffer-ka waxaa loo diraa write_audit_logs_task), ama "sync" (sidii hore)
+AUDIT_WRITE_MODE = config("AUDIT_WRITE_MODE", default="buffered")
+
+# AuditLog waa monthly partitions: inta bilood ee hore loo abuuro, iyo retention
+# (0 = weligaa hay; "archive" rows-ka waxaa loo qoraa ARCHIVE_ROOT ka dibna table-ka waa la tuuraa, "drop" waa la tirtiraa)
+AUDIT_PARTITION_MONTHS_AHEAD = config("AUDIT_PARTITION_MONTHS_AHEAD", default=3, cast=int)
+AUDIT_RETENTION_MONTHS = config("AUDIT_RETENTION_MONTHS", default=0, cast=int)
+AUDIT_RETENTION_ACTION = config("AUDIT_RETENTION_ACTION", default="archive")
+
+# Cold storage: audit logs iyo notifications ka duugoobay ARCHIVE_AFTER_MONTHS
+# waxaa loo wareejiyaa gzip NDJSON files (user/bil kasta file)
+ARCHIVE_ROOT = os.path.join(MEDIA_ROOT, "archives")
+ARCHIVE_AFTER_MONTHS = config("ARCHIVE_AFTER_MONTHS", default=12, cast=int)
+ARCHIVE_DELETE_BATCH_SIZE = config("ARCHIVE_DELETE_BATCH_SIZE", default=1000, cast=int)
+
+# Reports (cash flow / net worth): muddada ugu dheer ee hal request (maalmo)
+REPORT_MAX_RANGE_DAYS = config("REPORT_MAX_RANGE_DAYS", default=3660, cast=int)
+
+# Logging: core.* (services, tasks, signals) console-ka ayey u qoraan (web iyo Celery worker)
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "simple": {"format": "%(asctime)s %(levelname)s %(name)s: %(message)s"},
+    },
+    "handlers": {
+        "console": {"class": "logging.StreamHandler", "formatter": "simple"},
+    },
+    "loggers": {
+        "core": {"handlers": ["console"], "level": config("CORE_LOG_LEVEL", default="INFO"), "propagate": False},
+    },
+}
+
 # Celery Beat Schedule (dhammaan jadwalka hal meel)
 CELERY_BEAT_SCHEDULE = {
     # "check-daily-notifications": {
@@ -265,6 +363,26 @@ CELERY_BEAT_SCHEDULE = {
         "schedule": crontab(hour=8, minute=0),
         "args": ("USD", ["SOS"]),
     },
+    "maintain-audit-partitions": {
+        "task": "core.tasks.maintain_audit_partitions_task",
+        "schedule": crontab(hour=2, minute=0),
+    },
+    "archive-old-records": {
+        "task": "core.tasks.archive_old_records_task",
+        "schedule": crontab(hour=3, minute=0, day_of_month=1),
+    },
+    "drain-email-outbox": {
+        "task": "core.tasks.drain_email_outbox_task",
+        "schedule": crontab(minute="*"),
+    },
+    "snapshot-account-balances": {
+        "task": "core.tasks.snapshot_account_balances_task",
+        "schedule": crontab(hour=23, minute=55),
+    },
+    "reconcile-unread-counts": {
+        "task": "core.tasks.reconcile_unread_counts_task",
+        "schedule": crontab(minute="*/15"),
+    },
     # "hourly-usd-sos-fixer-rate": {
     #     "task": "core.tasks.fetch_usd_sos_fixer_rate",
     #     "schedule": crontab(houminute=0),
@@ -0,0 +1,7 @@
+#!/bin/bash
+set -e
+
+# Process gaar ah oo ASGI ah: kaliya /api/notifications/stream/ (SSE). Proxy-ga ayaa path-kaas
+# halkan u soo diraya; API-ga intiisa kale waa gunicorn (start.sh).
+echo "Starting Uvicorn (notifications SSE stream)..."
+exec uvicorn finance_project.asgi:application --host 0.0.0.0 --port $PORT --workers 3
@@ -3,5 +3,5 @@ set -e
 
 echo "Starting Celery worker..."
 celery -A finance_project beat --loglevel=info
-celery -A finance_project worker --loglevel=info --pool=solo
+celery -A finance_project worker --loglevel=info --pool=solo -Q celery,emails
 